@@ -6,12 +6,22 @@ __author__ = "Orhan Ors"
 __email__ = "o.ors@uq.net.au"
 __date__ = "25/05/2023"
 
+import math
+import sys
 import tkinter as tk
-from tkinter import filedialog 
+from tkinter import filedialog, messagebox
 from typing import Callable, Union, Optional
+from PIL import Image, ImageTk
 from a3_support import *
 from model import *
 from constants import *
+from worker import SimulationWorker
+from telemetry import Telemetry
+from weather import Weather
+from items import ITEM_REGISTRY, ItemRegistry
+from world import FarmWorld
+from overview import ChunkOverview
+from tiles import TileRows
 
 
 class InfoBar(AbstractGrid):
@@ -48,176 +58,498 @@ class InfoBar(AbstractGrid):
         self.pack(side=tk.BOTTOM, fill= tk.BOTH, expand=True)
 
 
+class SparklinePanel(tk.Canvas):
+    """ A view class
+        Displays a small line chart of the recent history of each series of a
+        game's telemetry, with its latest value
+    """
+    LABEL_WIDTH = 70
+    VALUE_WIDTH = 70
+
+    def __init__(self, master: tk.Tk | tk.Frame, names: list[str]) -> None:
+        super().__init__(master, width=FARM_WIDTH + INVENTORY_WIDTH,
+                         height=SPARKLINE_HEIGHT * len(names),
+                         highlightthickness=0)
+        self._width = FARM_WIDTH + INVENTORY_WIDTH
+        self.pack(side=tk.BOTTOM)
+
+    def redraw(self, sparklines: Optional[dict[str, 'np.ndarray']]) -> None:
+        self.delete(tk.ALL)
+        if sparklines is None:
+            return
+        left = self.LABEL_WIDTH
+        right = self._width - self.VALUE_WIDTH
+        for index, (name, values) in enumerate(sparklines.items()):
+            top = index * SPARKLINE_HEIGHT
+            middle = top + SPARKLINE_HEIGHT // 2
+            self.create_text(4, middle, text=name, anchor=tk.W)
+            if not len(values):
+                continue
+            latest = values[-1]
+            self.create_text(self._width - 4, middle, anchor=tk.E,
+                             text=f'{latest:.1f}' if values.dtype.kind == 'f'
+                             else str(latest))
+            if len(values) < 2:
+                continue
+            # Scale the series to fill the row, leaving a small margin
+            low, high = float(values.min()), float(values.max())
+            span = high - low or 1.0
+            step = (right - left) / (len(values) - 1)
+            points = []
+            for i, value in enumerate(values.tolist()):
+                points.append(left + i * step)
+                points.append(top + SPARKLINE_HEIGHT - 3
+                              - (value - low) / span * (SPARKLINE_HEIGHT - 6))
+            self.create_line(*points)
+
+
 class FarmView(AbstractGrid):
     """ A view class
         Displays a grid containing the farm map, player, and plants
+
+        The view can be zoomed in from showing the whole farm, and panned by
+        dragging. While few enough cells are in view, they are drawn with
+        sprites; otherwise the farm is drawn as one image, taken from the
+        overview's downsampled chunk images
     """
     def __init__(self, master: tk.Tk | tk.Frame, dimensions: tuple[int, int],
-                 size: tuple[int, int], **kwargs) -> None:
+                 size: tuple[int, int], overview: ChunkOverview,
+                 view_command: Callable[[tuple[int, int, int, int]],
+                                        None] = None,
+                 **kwargs) -> None:
 
+        self._zoom = 0
         super().__init__(master, dimensions, size, **kwargs)
 
         self._size = size
-        self.set_dimensions(dimensions)
+        self._overview = overview
+        self._view_command = view_command
+        # The top left cell in view, as fractional (row, col)
+        self._origin = (0.0, 0.0)
+        self._drag = None
+        self._state = None
+        # Sprites of each cell size, and the image drawn while zoomed out
+        self._caches = {}
         self.cache = {}
+        self._image = None
+        self.bind('<ButtonPress-1>', self._on_press)
+        self.bind('<B1-Motion>', self._on_drag)
+        self.bind('<MouseWheel>',
+                  lambda event: self.zoom(1 if event.delta > 0 else -1))
+        self.bind('<Button-4>', lambda event: self.zoom(1))
+        self.bind('<Button-5>', lambda event: self.zoom(-1))
         self.pack(side=tk.LEFT)
 
-    def redraw(self, ground: list[str], plants: dict[tuple[int, int], 'Plant'],
+    def set_dimensions(self, dimensions: tuple[int, int]) -> None:
+        # A farm of another size starts fully zoomed out
+        if dimensions != getattr(self, '_dimensions', None):
+            self._zoom = 0
+            self._origin = (0.0, 0.0)
+            self._player = None
+        super().set_dimensions(dimensions)
+
+    def get_cell_size(self) -> tuple[int, int]:
+        # Fully zoomed out, cells fill the view as they always have
+        if self._zoom == 0:
+            return super().get_cell_size()
+        cell = int(self.get_scale())
+        return cell, cell
+
+    def get_scale(self) -> float:
+        """ Returns the pixels per cell side at the current zoom. Below one
+            pixel per cell, it is a whole level of the overview.
+        """
+        rows, cols = self._dimensions
+        scale = min(self._size[0] / cols, self._size[1] / rows) \
+            * 2 ** self._zoom
+        if scale >= 1:
+            return float(int(scale))
+        level = min(math.ceil(math.log2(1 / scale)),
+                    self._overview.get_max_level())
+        return 2.0 ** -level
+
+    def get_view(self) -> tuple[int, int, int, int]:
+        """ Returns the (top, left, bottom, right) cells in view, with
+            exclusive ends.
+        """
+        scale = self.get_scale()
+        rows, cols = self._dimensions
+        top, left = int(self._origin[0]), int(self._origin[1])
+        return (top, left, min(rows, top + math.ceil(self._size[1] / scale)),
+                min(cols, left + math.ceil(self._size[0] / scale)))
+
+    def zoom(self, step: int) -> None:
+        """ Zooms in (positive step) or out by factors of two, keeping the
+            middle of the view where it is.
+        """
+        rows, cols = self._dimensions
+        fit = min(self._size[0] / cols, self._size[1] / rows)
+        most = max(0, math.floor(math.log2(ZOOM_MAX_CELL / fit)))
+        zoom = min(max(self._zoom + step, 0), most)
+        if zoom == self._zoom:
+            return
+        scale = self.get_scale()
+        middle = (self._origin[0] + self._size[1] / scale / 2,
+                  self._origin[1] + self._size[0] / scale / 2)
+        self._zoom = zoom
+        scale = self.get_scale()
+        self._move_to(middle[0] - self._size[1] / scale / 2,
+                      middle[1] - self._size[0] / scale / 2)
+
+    def pan(self, rows: float, cols: float) -> None:
+        """ Moves the view by the given number of cells. """
+        self._move_to(self._origin[0] + rows, self._origin[1] + cols)
+
+    def _move_to(self, top: float, left: float) -> None:
+        """ Moves the top left of the view to a cell, keeping the view on the
+            farm, and redraws.
+        """
+        scale = self.get_scale()
+        rows, cols = self._dimensions
+        top = min(max(top, 0.0), max(rows - self._size[1] / scale, 0.0))
+        left = min(max(left, 0.0), max(cols - self._size[0] / scale, 0.0))
+        self._origin = (top, left)
+        if self._state is not None:
+            self._render()
+
+    def _on_press(self, event: tk.Event) -> None:
+        self._drag = (event.x, event.y)
+
+    def _on_drag(self, event: tk.Event) -> None:
+        if self._drag is None:
+            return
+        scale = self.get_scale()
+        self.pan((self._drag[1] - event.y) / scale,
+                 (self._drag[0] - event.x) / scale)
+        self._drag = (event.x, event.y)
+
+    def redraw(self, ground: TileRows, plants: dict[tuple[int, int], 'Plant'],
                player_position: tuple[int, int], player_direction: str) -> None:
 
+        self._state = (ground, plants, player_position, player_direction)
+        # Keep the player in the middle of the view when they move
+        if player_position != self._player:
+            self._player = player_position
+            scale = self.get_scale()
+            self._move_to(player_position[0] - self._size[1] / scale / 2,
+                          player_position[1] - self._size[0] / scale / 2)
+        else:
+            self._render()
+
+    def _render(self) -> None:
         # Prevent duplicating visuals
         self.clear()
+        top, left, bottom, right = self.get_view()
+        if min(self.get_cell_size()) >= 1 \
+                and (bottom - top) * (right - left) <= SPRITE_MAX_CELLS:
+            self._draw_sprites((top, left, bottom, right))
+        else:
+            self._draw_overview((top, left, bottom, right))
+        if self._view_command is not None:
+            self._view_command((top, left, bottom, right))
 
-        # Generate the map
+    def _draw_sprites(self, view: tuple[int, int, int, int]) -> None:
+        ground, plants, player_position, player_direction = self._state
         image_size = self.get_cell_size()
-        for row in range(len(ground)):
-            for col in range(len(ground[row])):
-                # Select tile 
-                floor = ground[row][col]
-                image_name = IMAGES[floor]
-                image_path = 'images/{}'.format(image_name)
-                tile = get_image(image_path, image_size, self.cache)
-                self.cache[image_name] = tile  
-                # Place tile
-                tile_position = self.get_midpoint((row, col))
-                self.create_image(tile_position[0], tile_position[1],
-                                  image=tile)
-                # Place plants on map
-                for plant in plants.keys():
-                    if row == plant[0] and col == plant[1]:
-                        plant_type = plants[plant]
-                        plant_name = get_plant_image_name(plant_type)
-                        image_location = f"images/{plant_name}"
-                        plant_image = get_image(image_location,
-                                                image_size, self.cache)
-                        self.cache[image_location] = plant_image 
-
-                        plant_position = self.get_midpoint(plant)
-                        self.create_image(plant_position[0], plant_position[1],
-                                          image=plant_image)
-                # Place player on map
-                if row == player_position[0] and col == player_position[1]:
-                    image_location = 'images/{}'.format(IMAGES[player_direction])
-                    player_image = get_image(image_location, image_size,
-                                           self.cache)
-
-                    position = self.get_midpoint(player_position)
-                    self.create_image(position[0], position[1],
-                                      image=player_image)
-
-
-class ItemView(tk.Frame):
+        self.cache = self._caches.setdefault(image_size, {})
+        top, left, bottom, right = view
+        for row in range(top, bottom):
+            # Place each run of equal tiles as one item
+            for start, stop, floor in ground.get_runs(row, left, right):
+                image_path = 'images/{}'.format(IMAGES[floor])
+                tile = get_run_image(image_path, image_size, stop - start,
+                                     self.cache)
+                tile_position = self.get_midpoint((row - top, start - left))
+                self.create_image(tile_position[0] - image_size[0] / 2,
+                                  tile_position[1], image=tile, anchor=tk.W)
+            for col in range(left, right):
+                # Place plant on map
+                plant_type = plants.get((row, col))
+                if plant_type is not None:
+                    tile_position = self.get_midpoint((row - top, col - left))
+                    plant_name = get_plant_image_name(plant_type)
+                    image_location = f"images/{plant_name}"
+                    plant_image = get_image(image_location,
+                                            image_size, self.cache)
+                    self.create_image(tile_position[0], tile_position[1],
+                                      image=plant_image)
+        # Place player on map
+        row, col = player_position
+        if top <= row < bottom and left <= col < right:
+            image_location = 'images/{}'.format(IMAGES[player_direction])
+            player_image = get_image(image_location, image_size, self.cache)
+            position = self.get_midpoint((row - top, col - left))
+            self.create_image(position[0], position[1], image=player_image)
+
+    def _draw_overview(self, view: tuple[int, int, int, int]) -> None:
+        scale = self.get_scale()
+        if scale >= 1:
+            level, magnify = 0, int(scale)
+        else:
+            level, magnify = round(math.log2(1 / scale)), 1
+        pixels = self._overview.get_image(level, view)
+        image = Image.fromarray(pixels)
+        if magnify > 1:
+            image = image.resize((image.width * magnify,
+                                  image.height * magnify), Image.NEAREST)
+        self._image = ImageTk.PhotoImage(image.crop(
+            (0, 0, min(image.width, self._size[0]),
+             min(image.height, self._size[1]))))
+        self.create_image(0, 0, image=self._image, anchor=tk.NW)
+        # Mark the player, however small their cell is
+        top, left = view[0] >> level << level, view[1] >> level << level
+        row, col = self._state[2]
+        x, y = (col - left) * scale, (row - top) * scale
+        size = max(scale, 3)
+        self.create_rectangle(x, y, x + size, y + size,
+                              outline=MINIMAP_PLAYER_COLOUR)
+
+
+class Minimap(tk.Canvas):
     """ A view class
-        Displays the relevant information and buttons for each of the 6 items
-        available in the game
+        Displays the whole farm in miniature, with the player's position and
+        the part of the farm in view. Only the chunks of the overview rebuilt
+        since the last redraw are repainted, and dirty chunks are rebuilt a
+        few at a time between the window's other events
     """
-    def __init__(self, master: tk.Frame, item_name: str, amount: int,
-                 select_command: Optional[Callable[[str], None]] = None,
-                 sell_command: Optional[Callable[[str], None]] = None,
-                 buy_command: Optional[Callable[[str], None]] = None) -> None:
-
-        super().__init__(master)
-
-        self._item_name = item_name
-        
-        try:
-            self._buy_price = BUY_PRICES[item_name]
-        except KeyError:
-            self._buy_price = 'N/A'
-            
-        if item_name in SELL_PRICES:
-            self._sell_price = SELL_PRICES[item_name]
-        else:
-            self._sell_price = 'N/A'
-        item = item_name
-        # Set background colour based on available stock
-        if amount > 0:
-            self.config(bg=INVENTORY_COLOUR, padx=10)
+    def __init__(self, master: tk.Tk | tk.Frame, overview: ChunkOverview,
+                 size: int = MINIMAP_SIZE) -> None:
+        super().__init__(master, width=size, height=size,
+                         highlightthickness=0)
+        self._overview = overview
+        self._size = size
+        self._dimensions = None
+        self._level = 0
+        self._magnify = 1
+        self._image = None
+        # The idle callback that carries on rebuilding, if one is waiting
+        self._pending = None
+        self._view = self.create_rectangle(0, 0, 0, 0,
+                                           outline=MINIMAP_VIEW_COLOUR)
+        self._player = self.create_rectangle(0, 0, 0, 0,
+                                             outline=MINIMAP_PLAYER_COLOUR)
+        self.pack()
+
+    def redraw(self, player_position: tuple[int, int]) -> None:
+        self._build_some()
+        # Move the player's marker
+        scale = self._magnify / (1 << self._level)
+        row, col = player_position
+        self.coords(self._player, col * scale - 1, row * scale - 1,
+                    (col + 1) * scale + 1, (row + 1) * scale + 1)
+
+    def _build_some(self) -> None:
+        """ Rebuilds a few of the overview's dirty chunks and repaints the
+            chunks rebuilt since last time. While chunks remain dirty this is
+            repeated when the window is next idle, so that a change to much of
+            the farm never holds up the window for long.
+        """
+        overview = self._overview
+        more = overview.build_some(MINIMAP_BUILD_CHUNKS)
+        rebuilt = overview.take_rebuilt()
+        chunks = math.prod(overview.get_level_size(overview.get_max_level()))
+        # Repaint everything at once if much of the farm has changed
+        if overview.get_dimensions() != self._dimensions or rebuilt is None \
+                or len(rebuilt) * 4 > chunks:
+            self._paint_all()
         else:
-            self.config(bg=INVENTORY_EMPTY_COLOUR, padx=10)
-        # ItemView layout
-        if item_name in SEEDS: # start with seeds
-            # display relevant item text
-            self._item_name_label = tk.Label(self, padx=10, pady=20, text='{}: {}\n Sell price: ${}\n Buy price: ${}'.format(item_name, amount, SELL_PRICES[item_name], BUY_PRICES[item_name]), borderwidth=0, highlightthickness=0)
-            self._item_name_label.pack(side=tk.LEFT)
-            # create buy button
-            self._buy_btn = tk.Button(self, text="Buy", padx=10)
-            self._buy_btn.pack(side=tk.LEFT)
-            # create sell button
-            self._sell_btn = tk.Button(self, text="Sell", padx=10)
-            self._sell_btn.pack(side=tk.LEFT)
-            # bind mouse click for buying and selling
-            self._item_name_label.bind('<Button-1>', lambda event, item=self._item_name: select_command(item))
-            self._sell_btn.bind('<Button-1>', lambda event, item=self._item_name: sell_command(item))
-            self._buy_btn.bind('<Button-1>', lambda event, item=self._item_name: buy_command(item))
-            self._item_name_label.pack()
-        else: # then all non-seeds
-            self._item_name_label = tk.Label(self, padx=34, pady=18, text='{}: {}\n Sell price: ${}\n Buy price: $N/A'.format(item_name, amount, SELL_PRICES[item_name]), borderwidth=0, highlightthickness=0)
-            self._item_name_label.pack(side=tk.LEFT)
-            # create sell button
-            self._sell_btn = tk.Button(self, text="Sell", padx=5)
-            self._sell_btn.pack(side=tk.RIGHT)
-            # bind mouse click for selling
-            self._item_name_label.bind('<Button-1>', lambda event, item=item: select_command(item))
-            self._sell_btn.bind('<Button-1>', lambda event, item=item: sell_command(item))
-
-
-    def update(self, amount: int, selected: bool = False) -> None:
-        amount_update = amount
-
-        if self._item_name in SEEDS and self._item_name in ITEMS:
-            if amount_update > 0:
-                if selected:
-                    self.config(bg=INVENTORY_SELECTED_COLOUR)
-                    self._item_name_label.config(
-                        bg=INVENTORY_SELECTED_COLOUR,
-                        text='{}: {}\n Sell price: ${}\n Buy price: ${}'.format(
-                            self._item_name, amount_update, self._sell_price, self._buy_price if self._buy_price != 'N/A' else 'N/A'
-                        ),
-                    )
-                else:
-                    self.config(bg=INVENTORY_COLOUR)
-                    self._item_name_label.config(
-                        bg=INVENTORY_COLOUR,
-                        text='{}: {}\n Sell price: ${}\n Buy price: ${}'.format(
-                            self._item_name, amount_update, self._sell_price, self._buy_price
-                        ),
-                    )
-            else:
-                self.config(bg=INVENTORY_EMPTY_COLOUR)
-                self._item_name_label.config(
-                    bg=INVENTORY_EMPTY_COLOUR,
-                    text='{}: {}\n Sell price: ${}\n Buy price: ${}'.format(
-                        self._item_name, amount_update, self._sell_price, self._buy_price
-                    ),
-                )
-        elif self._item_name not in SEEDS and self._item_name in ITEMS:
-            if amount_update > 0:
-                if selected:
-                    self.config(bg=INVENTORY_SELECTED_COLOUR)
-                    self._item_name_label.config(
-                        bg=INVENTORY_SELECTED_COLOUR,
-                        text='{}: {}\n Sell price: ${}\n Buy price: $N/A'.format(
-                            self._item_name, amount_update, self._sell_price
-                        ),
-                    )
-                else:
-                    self.config(bg=INVENTORY_COLOUR)
-                    self._item_name_label.config(
-                        bg=INVENTORY_COLOUR,
-                        text='{}: {}\n Sell price: ${}\n Buy price: $N/A'.format(
-                            self._item_name, amount_update, self._sell_price
-                        ),
-                    )
-            else:
-                self.config(bg=INVENTORY_EMPTY_COLOUR)
-                self._item_name_label.config(
-                    bg=INVENTORY_EMPTY_COLOUR,
-                    text='{}: {}\n Sell price: ${}\n Buy price: $N/A'.format(
-                        self._item_name, amount_update, self._sell_price
-                    ),
-                )
+            span = 1 << self._level
+            chunk = OVERVIEW_CHUNK
+            for chunk_row, chunk_col in rebuilt:
+                top, left = chunk_row * chunk, chunk_col * chunk
+                self._paint(top // span, left // span, overview.get_image(
+                    self._level, (top, left, top + chunk, left + chunk)))
+        if more and self._pending is None:
+            self._pending = self.after_idle(self._continue_build)
+
+    def _continue_build(self) -> None:
+        """ Carries on rebuilding the dirty chunks once the window is idle.
+        """
+        self._pending = None
+        self._build_some()
+
+    def show_view(self, view: tuple[int, int, int, int]) -> None:
+        """ Moves the outline of the part of the farm in view, given as
+            (top, left, bottom, right) cells.
+        """
+        scale = self._magnify / (1 << self._level)
+        top, left, bottom, right = view
+        self.coords(self._view, left * scale, top * scale,
+                    right * scale, bottom * scale)
+
+    def _paint_all(self) -> None:
+        """ Picks the level that best fits the farm and paints all of it. """
+        overview = self._overview
+        self._dimensions = overview.get_dimensions()
+        self._level = 0
+        while self._level < overview.get_max_level() \
+                and max(overview.get_level_size(self._level)) > self._size:
+            self._level += 1
+        height, width = overview.get_level_size(self._level)
+        self._magnify = max(1, self._size // max(height, width, 1))
+        pixels = overview.get_image(self._level, (0, 0, *self._dimensions))
+        image = Image.fromarray(pixels).resize(
+            (width * self._magnify, height * self._magnify), Image.NEAREST)
+        self._image = ImageTk.PhotoImage(image)
+        self.delete('farm')
+        self.create_image(0, 0, image=self._image, anchor=tk.NW, tags='farm')
+        self.tag_lower('farm')
+
+    def _paint(self, y: int, x: int, pixels: 'np.ndarray') -> None:
+        """ Paints the pixels of part of the farm, given its top left pixel.
+        """
+        magnify = self._magnify
+        if magnify > 1:
+            pixels = pixels.repeat(magnify, axis=0).repeat(magnify, axis=1)
+        data = ' '.join('{' + ' '.join('#%02x%02x%02x' % tuple(pixel)
+                                       for pixel in row) + '}'
+                        for row in pixels.tolist())
+        self.tk.call(str(self._image), 'put', data,
+                     '-to', x * magnify, y * magnify)
+
+
+class InventoryRow(tk.Frame):
+    """ A view class
+        Displays one item of the inventory with its amount, prices and buy and
+        sell buttons. Rows are recycled by InventoryList to show whichever
+        items are scrolled into view
+    """
+    def __init__(self, master: tk.Frame,
+                 select_command: Callable[[int], None],
+                 sell_command: Callable[[int], None],
+                 buy_command: Callable[[int], None], slot: int) -> None:
+
+        super().__init__(master, padx=10)
+        # What the row last rendered, to skip rows that have not changed
+        self._state = None
+        self._label = tk.Label(self, padx=10, pady=20, width=18,
+                               borderwidth=0, highlightthickness=0)
+        self._label.pack(side=tk.LEFT)
+        self._buy_btn = tk.Button(self, text="Buy", padx=10,
+                                  command=lambda: buy_command(slot))
+        self._buy_btn.pack(side=tk.LEFT)
+        self._sell_btn = tk.Button(self, text="Sell", padx=10,
+                                   command=lambda: sell_command(slot))
+        self._sell_btn.pack(side=tk.LEFT)
+        self._label.bind('<Button-1>', lambda event: select_command(slot))
+
+    def render(self, item_name: str, amount: int, selected: bool,
+               buy_price: Optional[int], sell_price: Optional[int]) -> None:
+        # Only touch the widgets if what the row shows has changed
+        state = (item_name, amount, selected, buy_price, sell_price)
+        if state == self._state:
+            return
+        self._state = state
 
+        if amount <= 0:
+            colour = INVENTORY_EMPTY_COLOUR
+        elif selected:
+            colour = INVENTORY_SELECTED_COLOUR
+        else:
+            colour = INVENTORY_COLOUR
+        self.config(bg=colour)
+        self._label.config(bg=colour, text='{}: {}\n Sell price: ${}\n Buy price: ${}'.format(
+            item_name, amount, 'N/A' if sell_price is None else sell_price,
+            'N/A' if buy_price is None else buy_price))
+        self._buy_btn.config(
+            state=tk.NORMAL if buy_price is not None else tk.DISABLED)
+        self._sell_btn.config(
+            state=tk.NORMAL if sell_price is not None else tk.DISABLED)
+
+
+class InventoryList(tk.Frame):
+    """ A view class
+        Displays the player's inventory as a scrolling list of every item in
+        the catalogue. Only a fixed pool of rows exists, however many items
+        there are: scrolling re-binds the rows to different items, and a row
+        is only re-rendered when its item, amount or selection changes
+    """
+    def __init__(self, master: tk.Tk | tk.Frame,
+                 select_command: Callable[[str], None],
+                 sell_command: Callable[[str], None],
+                 buy_command: Callable[[str], None],
+                 registry: ItemRegistry = ITEM_REGISTRY,
+                 visible_rows: int = INVENTORY_VISIBLE_ROWS) -> None:
+
+        super().__init__(master, width=INVENTORY_WIDTH, borderwidth=0,
+                         highlightthickness=0)
+        self._items = registry.get_names()
+        # Prices are None for items the store does not buy or sell
+        buyable, sellable = registry.get_buyable(), registry.get_sellable()
+        self._buy_prices = [
+            int(price) if available else None for price, available
+            in zip(registry.get_buy_prices(), buyable)]
+        self._sell_prices = [
+            int(price) if available else None for price, available
+            in zip(registry.get_sell_prices(), sellable)]
+        self._commands = (select_command, sell_command, buy_command)
+        self._first = 0
+        self._inventory = {}
+        self._selected = None
+
+        rows_frame = tk.Frame(self)
+        rows_frame.pack(side=tk.LEFT)
+        self._rows = []
+        for slot in range(min(visible_rows, len(self._items))):
+            row = InventoryRow(rows_frame, self._select, self._sell,
+                               self._buy, slot)
+            row.pack(side=tk.TOP, fill=tk.X)
+            self._rows.append(row)
+
+        # Only show a scrollbar if some items do not fit
+        self._scrollbar = None
+        if len(self._items) > len(self._rows):
+            self._scrollbar = tk.Scrollbar(self, command=self._on_scroll)
+            self._scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            for widget in (self, rows_frame, *self._rows):
+                widget.bind('<MouseWheel>', self._on_wheel)
+                widget.bind('<Button-4>', lambda event: self.scroll_to(
+                    self._first - 1))
+                widget.bind('<Button-5>', lambda event: self.scroll_to(
+                    self._first + 1))
+        self.pack()
+
+    def redraw(self, inventory: dict[str, int],
+               selected_item: Optional[str]) -> None:
+        self._inventory = inventory
+        self._selected = selected_item
+        for slot, row in enumerate(self._rows):
+            item_id = self._first + slot
+            item_name = self._items[item_id]
+            amount = inventory.get(item_name, 0)
+            row.render(item_name, amount,
+                       item_name == selected_item and amount > 0,
+                       self._buy_prices[item_id], self._sell_prices[item_id])
+        if self._scrollbar is not None:
+            total = len(self._items)
+            self._scrollbar.set(self._first / total,
+                                (self._first + len(self._rows)) / total)
+
+    def scroll_to(self, first: int) -> None:
+        # Show the items from the given index onwards
+        first = max(0, min(first, len(self._items) - len(self._rows)))
+        if first != self._first:
+            self._first = first
+            self.redraw(self._inventory, self._selected)
+
+    def _on_scroll(self, command: str, amount: str, unit: str = None) -> None:
+        if command == tk.MOVETO:
+            self.scroll_to(round(float(amount) * len(self._items)))
+        elif command == tk.SCROLL:
+            step = len(self._rows) if unit == tk.PAGES else 1
+            self.scroll_to(self._first + int(amount) * step)
+
+    def _on_wheel(self, event: tk.Event) -> None:
+        self.scroll_to(self._first - (1 if event.delta > 0 else -1))
+
+    def _select(self, slot: int) -> None:
+        self._commands[0](self._items[self._first + slot])
+
+    def _sell(self, slot: int) -> None:
+        self._commands[1](self._items[self._first + slot])
+
+    def _buy(self, slot: int) -> None:
+        self._commands[2](self._items[self._first + slot])
 
 
 class FarmGame:
@@ -225,211 +557,201 @@ class FarmGame:
         responsible for creating and maintaining instances of the model
         and view classes, event handling, and facilitating communication
         between the model and view classes
+
+        The model is owned by a SimulationWorker running on its own thread;
+        player actions are sent to it in order and the views are redrawn from
+        the snapshots it publishes, so the window never waits on the model.
     """
-    def __init__(self, master: tk.Tk, map_file: str) -> None:
+    def __init__(self, master: tk.Tk, map_file: str | list[str],
+                 show_telemetry: bool = False,
+                 weather: Optional[Weather] = None) -> None:
         # Set the title of the window
         master.title("Farm Game")
+        self._master = master
         self._cache = {}
         # Create the title banner
         banner = get_image('images/header.png', (FARM_WIDTH+INVENTORY_WIDTH,
                                                  BANNER_HEIGHT), self._cache)
         label = tk.Label(master, image=banner, borderwidth=1, highlightthickness=1)
         label.pack()
-        # Create the FarmModel instance
-        self._model = FarmModel(map_file)
+        # Create the FarmModel instance and hand it to the simulation worker.
+        # Given several maps, the player can travel between their farms
+        self._world = None
+        self._farm_index = 0
+        if isinstance(map_file, str):
+            model = FarmModel(map_file)
+        elif len(map_file) == 1:
+            model = FarmModel(map_file[0])
+        else:
+            self._world = FarmWorld(map_file, WORLD_SAVE_DIR)
+            model = self._world.get_current()
+            self._farm_index = map_file.index(self._world.get_current_name())
+        if show_telemetry and self._world is not None:
+            self._world.set_telemetry(Telemetry())
+        elif show_telemetry:
+            model.set_telemetry(Telemetry())
+        if self._world is not None:
+            self._world.set_weather(weather)
+        else:
+            model.set_weather(weather)
+        self._worker = SimulationWorker(model, world=self._world)
+        self._snapshot = self._worker.get_initial_snapshot()
         # Command to execute next day
         def next_day():
-            self._model.new_day()
-            self._infobar.redraw(self._model.get_days_elapsed(),
-                                 self._model.get_player().get_money(),
-                                 self._model.get_player().get_energy())
-            self.redraw()
+            self._worker.submit(NEW_DAY_ACTION)
         
         # "Next day" button
         tk.Button(master, text="Next day", command=next_day).pack(side=tk.BOTTOM)
         # Create InfoBar instance
         self._infobar = InfoBar(master)
-        # Create FarmView instance
-        self._farmview = FarmView(master, self._model.get_dimensions(),
-                                  (FARM_WIDTH, FARM_WIDTH))
-        self.items_dict = {}
-        
-        # Create ItemView instance
-        item_frame = tk.Frame(master, height=FARM_WIDTH, width=INVENTORY_WIDTH,
-                              borderwidth=0, highlightthickness=0)
-        inventory = self._model.get_player().get_inventory()
-        
-        for item_name in ITEMS:
-            item_qty = 0
-            if item_name in inventory:
-                item_qty = inventory[item_name]
-            if item_name in SEEDS:
-                item_view = ItemView(item_frame, item_name, item_qty,
-                                     self.select_item, self.sell_item, self.buy_item)
-            else:
-                item_view = ItemView(item_frame, item_name, item_qty,
-                                     self.select_item, self.sell_item)
-            
-            item_view.pack(side=tk.TOP)
-            self.items_dict[item_name] = item_view
-        
-        item_frame.pack()
+        # Create SparklinePanel instance, if telemetry is being recorded
+        self._sparklines = None
+        if self._snapshot.sparklines is not None:
+            self._sparklines = SparklinePanel(master,
+                                              list(self._snapshot.sparklines))
+        self._shown_sparklines = None
+        # Create FarmView instance, drawn from the overview when zoomed out
+        self._overview = ChunkOverview()
+        self._farmview = FarmView(master, self._snapshot.dimensions,
+                                  (FARM_WIDTH, FARM_WIDTH), self._overview,
+                                  self.show_view)
+        # Create InventoryList instance
+        self._inventory = InventoryList(master, self.select_item,
+                                        self.sell_item, self.buy_item)
+        # Create Minimap instance
+        self._minimap = Minimap(master, self._overview)
         self.redraw()
         
         master.bind('<KeyPress>', self.handle_keypress)
+        self._worker.start()
+        master.after(POLL_INTERVAL, self.poll_worker)
         master.mainloop()
+        self._worker.stop()
+        if self._world is not None:
+            self._worker.join()
+            self._world.save()
+
+
+    def poll_worker(self) -> None:
+        # Redraw whenever the worker has published a new snapshot
+        snapshot = self._worker.poll()
+        if snapshot is not None:
+            self._snapshot = snapshot
+            self.redraw()
+        # Show what went wrong if the worker failed to apply an action
+        errors = self._worker.poll_errors()
+        if errors:
+            messagebox.showerror('Farm Game', '\n'.join(
+                f'{type(error).__name__}: {error}' for error in errors))
+        self._master.after(POLL_INTERVAL, self.poll_worker)
 
 
     def redraw(self) -> None:
-        # Redraw each view class
-        # Redraw FarmView
-        ground = self._model.get_map()
-        plants = self._model.get_plants()
-        position = self._model.get_player().get_position()
-        direction = self._model.get_player().get_direction()
-        self._farmview.redraw(ground, plants, position, direction)
+        # Redraw each view class from the latest snapshot
+        snapshot = self._snapshot
+        # Bring the overview up to date and redraw Minimap
+        self._overview.update(snapshot.map, snapshot.plants,
+                              snapshot.dirty_cells)
+        self._minimap.redraw(snapshot.position)
+
+        # Redraw FarmView, whose farm may have changed size after travelling
+        self._farmview.set_dimensions(snapshot.dimensions)
+        self._farmview.redraw(snapshot.map, snapshot.plants,
+                              snapshot.position, snapshot.direction)
 
         # Redraw InfoBar
-        day = self._model.get_days_elapsed()
-        money = self._model.get_player().get_money()
-        energy = self._model.get_player().get_energy()
-        self._infobar.redraw(day, int(money), energy)
-
-        # Redraw ItemView
-        frames = self.items_dict
-        player_inventory = self._model.get_player().get_inventory()
-        player_selected_item = self._model.get_player().get_selected_item()
-        for item in ITEMS:
-            item_frame = frames[item]
-            # Player has item in inventory
-            try:
-                item_amount = player_inventory[item]
-                if item == player_selected_item:
-                    item_frame.update(item_amount, True)
-                else:
-                    item_frame.update(item_amount, False)
-            # Player does not have item in inventory
-            except KeyError:
-                item_amount = 0
-                item_frame.update(item_amount, False)
-
-        # Update selected item in ItemView
-        selected_frame = frames.get(player_selected_item)
-        if selected_frame:
-            selected_frame.update(player_inventory.get(player_selected_item, 0), True)
+        self._infobar.redraw(snapshot.day, int(snapshot.money),
+                             snapshot.energy)
+
+        # Redraw SparklinePanel when a day has ended
+        if self._sparklines is not None and \
+                snapshot.sparklines is not self._shown_sparklines:
+            self._sparklines.redraw(snapshot.sparklines)
+            self._shown_sparklines = snapshot.sparklines
+
+        # Redraw InventoryList
+        self._inventory.redraw(snapshot.inventory, snapshot.selected_item)
 
 
     def handle_keypress(self, event: tk.Event) -> None:
         keypress = event.keysym.lower()
         keycharsym = event.keysym
-        keypress = keypress.lower()
-        player = self._model.get_player()
-        player_position = self._model.get_player().get_position()
-        player_selected_item = self._model.get_player().get_selected_item()
-        player_inventory = self._model.get_player().get_inventory()
 
         valid_player_directions = 'wasd'
         if keypress in valid_player_directions and keycharsym in valid_player_directions:
-            self._model.move_player(keypress)
-            self.redraw()
+            self._worker.submit(MOVE_ACTION, keypress)
         # Till soil
         elif (keypress == "t") and (keycharsym == "t"):  
-            self._model.till_soil(player_position)
-            self.redraw()
+            self._worker.submit(TILL_ACTION)
         # Until soil
         elif (keypress == "u") and (keycharsym == "u"):  
-            self._model.untill_soil(player_position)
-            self.redraw()
+            self._worker.submit(UNTILL_ACTION)
         # Plant seed
         elif keypress == "p":  
-            map = self._model.get_map()
-            row, col = player_position
-            if (map[row][col] == SOIL) and (player_selected_item in player_inventory):
-                if player_selected_item == 'Potato Seed':
-                    self._model.add_plant(player_position, PotatoPlant())
-                elif player_selected_item == 'Kale Seed':
-                    self._model.add_plant(player_position, KalePlant())
-                elif player_selected_item == 'Berry Seed':
-                    self._model.add_plant(player_position, BerryPlant())
-                else:
-                    return
-
-                frames = self.items_dict
-                item_frame = frames[player_selected_item]
-                item_frame.update(player_inventory.get(player_selected_item, 0), True)
-                self._model.get_player().remove_item((player_selected_item, 1))
-                self.redraw()
-
-            else:
-                return
+            self._worker.submit(PLANT_ACTION)
         # Pick produce
         elif keypress == "h":  
-            harvest_result = self._model.harvest_plant(player_position)
-            if harvest_result is None:
-                return
-
-            frames = self.items_dict
-            item_frame = frames[harvest_result[0]]
-            self._model.get_player().add_item(harvest_result)
-            item_frame.update(self._model.get_player().get_inventory()[harvest_result[0]], False)
-            self.redraw()
-            pass
+            self._worker.submit(HARVEST_ACTION)
         # Remove plant
         elif keypress == "r":  
-            self._model.remove_plant(player_position)
-            self.redraw()
-        elif keypress == '':
-            pass
-        else:
-            pass
+            self._worker.submit(REMOVE_ACTION)
+        # Undo and redo
+        elif keypress == "z":
+            self._worker.submit(UNDO_ACTION)
+        elif keypress == "y":
+            self._worker.submit(REDO_ACTION)
+        # Zoom and pan the farm view
+        elif keypress in ("plus", "equal"):
+            self._farmview.zoom(1)
+        elif keypress == "minus":
+            self._farmview.zoom(-1)
+        elif keypress in ("up", "down", "left", "right"):
+            top, left, bottom, right = self._farmview.get_view()
+            rows, cols = (bottom - top) / 4, (right - left) / 4
+            self._farmview.pan(*{"up": (-rows, 0), "down": (rows, 0),
+                                 "left": (0, -cols),
+                                 "right": (0, cols)}[keypress])
+        # Travel to the next farm
+        elif keypress == "tab" and self._world is not None:
+            farms = self._world.get_map_files()
+            self._farm_index = (self._farm_index + 1) % len(farms)
+            self._worker.submit(TRAVEL_ACTION, farms[self._farm_index])
+
+    def show_view(self, view: tuple[int, int, int, int]) -> None:
+        # Outline the part of the farm in view on the minimap
+        self._minimap.show_view(view)
 
     def select_item(self, item_name: str) -> None:
-        for item in ITEMS:
-            if item_name == item:
-                self._model.get_player().select_item(item_name)
-        self.redraw()
+        if ITEM_REGISTRY.find_id(item_name) is not None:
+            self._worker.submit(SELECT_ACTION, item_name)
 
 
     def buy_item(self, item_name: str) -> None:
-        player_money = self._model.get_player().get_money()
-        price_of_item_to_buy = BUY_PRICES[item_name]
-
-        if player_money >= price_of_item_to_buy:
-            self._model.get_player().buy(item_name, price_of_item_to_buy)
-
-            if item_name in self._model.get_player().get_inventory():
-                frames = self.items_dict
-                item_frame = frames[item_name]
-                item_frame.update(self._model.get_player().get_inventory()[item_name], False)
-            self.redraw()
-        else:
-            return
+        # Buy one unit at the best price in the market
+        self._worker.submit(BUY_ACTION, item_name)
 
 
     def sell_item(self, item_name: str) -> None:
-        price_of_item_to_sell = SELL_PRICES[item_name]
-        self._model.get_player().sell(item_name, price_of_item_to_sell)
-        self._infobar.redraw(self._model.get_days_elapsed(),
-                             self._model.get_player().get_money(),
-                             self._model.get_player().get_energy())  # Update money in InfoBar
-        if item_name in self._model.get_player().get_inventory():
-            frames = self.items_dict
-            item_frame = frames[item_name]
-            item_frame.update(self._model.get_player().get_inventory()[item_name], False)
-        self.redraw()
+        # Sell one unit at the best price in the market
+        self._worker.submit(SELL_ACTION, item_name)
 
 
 
-def play_game(root: tk.Tk, map_file: str) -> None:
+def play_game(root: tk.Tk, map_file: str | list[str],
+              show_telemetry: bool = False,
+              weather: Optional[Weather] = None) -> None:
     
-    game = FarmGame(root, map_file)
+    game = FarmGame(root, map_file, show_telemetry, weather)
     root.mainloop()
 
 def main() -> None:
     
     root = tk.Tk()
-    map_file = filedialog.askopenfilename()
-    play_game(root, map_file)
+    # Choosing several maps opens a world with a farm for each of them
+    map_files = list(filedialog.askopenfilenames())
+    # Weather is off unless asked for, as it changes how plants grow
+    weather = Weather() if '--weather' in sys.argv[1:] else None
+    play_game(root, map_files, '--telemetry' in sys.argv[1:], weather)
 
 if __name__ == '__main__':
     main()
@@ -2,21 +2,85 @@ import tkinter as tk
 from PIL import ImageTk, Image
 from typing import Union
 from constants import *
+from atlas import SpriteAtlas, load_atlas
+
+# The sprite atlas, loaded on first use; False if it has not been loaded yet
+_atlas = False
+
+
+def get_atlas() -> SpriteAtlas | None:
+    """ Returns the sprite atlas built by atlas.py, or None if there is no
+        usable atlas.
+    """
+    global _atlas
+    if _atlas is False:
+        _atlas = load_atlas()
+    return _atlas
 
 def read_map(map_file: str) -> list[str]:
     """ Reads the map file and returns a list of strings, where each string
         represents one row of the farm (first string represents top row), and
         each character in a string represents a tile.
 
+        Files ending in BINARY_MAP_EXTENSION are read as packed binary maps.
+
     Parameters:
         map_file: The path to the map file.
 
     Returns:
         A list of strings representing the tiles in the map.
     """
+    if map_file.endswith(BINARY_MAP_EXTENSION):
+        return read_binary_map(map_file)
     with open(map_file, 'r') as file:
         return [line.strip() for line in file.readlines()]
 
+# The four tiles packed into each possible byte of a binary map
+_UNPACKED_BYTES = [
+    ''.join(TILES_BY_CODE[min((byte >> shift) & 3, len(TILES_BY_CODE) - 1)]
+            for shift in (6, 4, 2, 0))
+    for byte in range(256)
+]
+
+def read_binary_map(map_file: str) -> list[str]:
+    """ Reads a packed binary map file (see BINARY_MAP_MAGIC) and returns its
+        rows in the same form as read_map.
+
+    Parameters:
+        map_file: The path to the map file.
+
+    Returns:
+        A list of strings representing the tiles in the map.
+    """
+    with open(map_file, 'rb') as file:
+        if file.read(len(BINARY_MAP_MAGIC)) != BINARY_MAP_MAGIC:
+            raise ValueError(f'{map_file} is not a binary map file')
+        rows = int.from_bytes(file.read(4), 'little')
+        cols = int.from_bytes(file.read(4), 'little')
+        row_bytes = (cols + 3) // 4
+        return [''.join(_UNPACKED_BYTES[byte]
+                        for byte in file.read(row_bytes))[:cols]
+                for _ in range(rows)]
+
+def read_plants(plants_file: str) -> list[tuple[int, int, str, int]]:
+    """ Reads a file of initial plants, one per line as
+        "row,col,species,days" where days is how many days ago the plant was
+        planted.
+
+    Parameters:
+        plants_file: The path to the plants file.
+
+    Returns:
+        A list of (row, col, species, days) tuples.
+    """
+    plants = []
+    with open(plants_file, 'r') as file:
+        for line in file:
+            if line.strip():
+                row, col, species, days = line.strip().split(',')
+                plants.append((int(row), int(col), species, int(days)))
+    return plants
+
 def get_plant_image_name(plant: 'Plant') -> str:
     """ Returns the name of the appropriate image for the given plant at its
         current stage, relative to the images directory.
@@ -41,6 +105,9 @@ def get_image(
     """ Returns the cached image for image_id if one exists, otherwise creates a
         new one, caches and returns it.
 
+        New images are sliced from the sprite atlas when it holds an up to
+        date copy at the requested size, and otherwise loaded from the file.
+
     Parameters:
         image_name: The path to the image to load.
         size: The size to resize the image to, as (width, height).
@@ -50,13 +117,56 @@ def get_image(
         The image for the given image_name, resized appropriately.
     """
     if cache is None or image_name not in cache:
-        image = ImageTk.PhotoImage(image=Image.open(image_name).resize(size))
+        image = ImageTk.PhotoImage(image=_load_sprite(image_name, size))
         if cache is not None:
             cache[image_name] = image
     elif image_name in cache:
         return cache[image_name]
     return image
 
+def get_run_image(
+        image_name: str,
+        size: tuple[int, int],
+        length: int,
+        cache: dict = None
+    ) -> ImageTk.PhotoImage:
+    """ Returns an image of a run of cells with the same image side by side,
+        so that the run can be drawn as one item. Images are cached as for
+        get_image.
+
+    Parameters:
+        image_name: The path to the image of each cell.
+        size: The size of each cell, as (width, height).
+        length: The number of cells in the run.
+        cache: The cache to use. If None, no caching is performed.
+
+    Returns:
+        The image of the whole run.
+    """
+    if length == 1:
+        return get_image(image_name, size, cache)
+    key = (image_name, length)
+    if cache is not None and key in cache:
+        return cache[key]
+    sprite = _load_sprite(image_name, size)
+    run = Image.new(sprite.mode, (size[0] * length, size[1]))
+    for cell in range(length):
+        run.paste(sprite, (cell * size[0], 0))
+    image = ImageTk.PhotoImage(image=run)
+    if cache is not None:
+        cache[key] = image
+    return image
+
+def _load_sprite(image_name: str, size: tuple[int, int]) -> Image.Image:
+    """ Returns the image with the given path at the given size, from the
+        sprite atlas if it holds an up to date copy, or else from the file.
+    """
+    atlas = get_atlas()
+    sprite = atlas.get_image(image_name, size) if atlas is not None else None
+    if sprite is None:
+        sprite = Image.open(image_name).resize(size)
+    return sprite
+
 class AbstractGrid(tk.Canvas):
     """ A type of tkinter Canvas that provides support for using the canvas as a
         grid (i.e. a collection of rows and columns). """
@@ -0,0 +1,192 @@
+""" Packs the game's sprites into one atlas of raw, pre-scaled RGBA pixels.
+
+    Loading a sprite from a PNG means opening the file, decoding it and
+    resizing it. The atlas does all of that ahead of time for the sizes the
+    game draws at: the runtime memory-maps the atlas and slices each sprite
+    out of it without copying or decoding anything. Sprites whose PNG has
+    changed since the atlas was built are treated as missing, so get_image
+    falls back to the PNG until the atlas is rebuilt.
+
+    Usage:
+        python atlas.py                       # sizes for every map in maps/
+        python atlas.py --maps maps/map1.txt --sizes 40x40 20x20
+"""
+import argparse
+import glob
+import json
+import mmap
+import os
+from typing import Iterable, Optional
+from PIL import Image
+from constants import *
+
+ATLAS_VERSION = 1
+
+
+def sprite_paths(image_dir: str = 'images') -> list[str]:
+    """ Returns the paths of every sprite drawn on the farm: the tiles, the
+        player and every stage of every plant.
+    """
+    paths = [os.path.join(image_dir, name) for name in IMAGES.values()]
+    paths.extend(sorted(glob.glob(os.path.join(image_dir, 'plants', '*',
+                                               'stage_*.png'))))
+    return [os.path.normpath(path) for path in paths]
+
+
+def cell_sizes(map_files: Iterable[str],
+               farm_size: tuple[int, int] = (FARM_WIDTH, FARM_WIDTH)
+               ) -> list[tuple[int, int]]:
+    """ Returns the cell sizes, as (width, height), at which FarmView draws
+        each of the given maps.
+    """
+    from a3_support import read_map
+
+    sizes = set()
+    for map_file in map_files:
+        rows = read_map(map_file)
+        sizes.add((farm_size[0] // len(rows[0]), farm_size[1] // len(rows)))
+    return sorted(sizes)
+
+
+def _sprite_key(image_name: str, size: tuple[int, int]) -> str:
+    """ Returns the index key of a sprite at a size. """
+    return f'{os.path.normpath(image_name)}@{size[0]}x{size[1]}'
+
+
+def _source_stamp(image_name: str) -> list[int]:
+    """ Returns what identifies the current version of a source image. """
+    stat = os.stat(image_name)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def build_atlas(sprites: Iterable[tuple[str, tuple[int, int]]],
+                atlas_file: str = ATLAS_FILE,
+                index_file: str = ATLAS_INDEX_FILE) -> int:
+    """ Writes an atlas holding each image at each requested size, scaled as
+        get_image would scale it, and an index of where each one is.
+
+    Parameters:
+        sprites: The (image path, (width, height)) of each sprite to store.
+        atlas_file: The path to write the raw pixels to.
+        index_file: The path to write the index to.
+
+    Returns:
+        The number of sprites written.
+    """
+    index = {'version': ATLAS_VERSION, 'sprites': {}, 'sources': {}}
+    offset = 0
+    with open(atlas_file, 'wb') as file:
+        for image_name, size in sprites:
+            key = _sprite_key(image_name, size)
+            if key in index['sprites']:
+                continue
+            image = Image.open(image_name).resize(size).convert('RGBA')
+            file.write(image.tobytes())
+            index['sprites'][key] = [offset, size[0], size[1]]
+            index['sources'][os.path.normpath(image_name)] = \
+                _source_stamp(image_name)
+            offset += size[0] * size[1] * 4
+    with open(index_file, 'w') as file:
+        json.dump(index, file)
+    return len(index['sprites'])
+
+
+class SpriteAtlas:
+    """ A memory-mapped atlas written by build_atlas. """
+
+    def __init__(self, atlas_file: str = ATLAS_FILE,
+                 index_file: str = ATLAS_INDEX_FILE) -> None:
+        """ Constructor for the atlas. Maps the atlas file into memory and
+            checks which of its sprites are still up to date.
+
+        Parameters:
+            atlas_file: The path to the raw pixels.
+            index_file: The path to the index.
+        """
+        with open(index_file) as file:
+            index = json.load(file)
+        if index.get('version') != ATLAS_VERSION:
+            raise ValueError(f'{index_file} is from another atlas version')
+        with open(atlas_file, 'rb') as file:
+            self._pixels = memoryview(
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                if os.path.getsize(atlas_file) else b'')
+        fresh = set()
+        for image_name, stamp in index['sources'].items():
+            try:
+                if _source_stamp(image_name) == stamp:
+                    fresh.add(image_name)
+            except OSError:
+                pass
+        self._sprites = {
+            key: entry for key, entry in index['sprites'].items()
+            if key.rsplit('@', 1)[0] in fresh
+        }
+
+    def __len__(self) -> int:
+        """ Returns the number of up to date sprites in the atlas. """
+        return len(self._sprites)
+
+    def get_pixels(self, image_name: str,
+                   size: tuple[int, int]) -> Optional[memoryview]:
+        """ Returns a read-only view of a sprite's RGBA pixels, row by row,
+            or None if the atlas has no up to date copy of it.
+        """
+        entry = self._sprites.get(_sprite_key(image_name, size))
+        if entry is None:
+            return None
+        offset, width, height = entry
+        return self._pixels[offset:offset + width * height * 4]
+
+    def get_image(self, image_name: str,
+                  size: tuple[int, int]) -> Optional[Image.Image]:
+        """ Returns a sprite as a PIL image sharing the atlas' memory, or None
+            if the atlas has no up to date copy of it.
+        """
+        pixels = self.get_pixels(image_name, size)
+        if pixels is None:
+            return None
+        return Image.frombuffer('RGBA', size, pixels, 'raw', 'RGBA', 0, 1)
+
+
+def load_atlas(atlas_file: str = ATLAS_FILE,
+               index_file: str = ATLAS_INDEX_FILE) -> Optional[SpriteAtlas]:
+    """ Returns the atlas, or None if it has not been built or is unreadable.
+    """
+    try:
+        return SpriteAtlas(atlas_file, index_file)
+    except (OSError, ValueError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Build the pre-scaled sprite atlas.')
+    parser.add_argument('--maps', nargs='*', default=None,
+                        help='maps whose cell sizes to include '
+                             '(default: every map in maps/)')
+    parser.add_argument('--sizes', nargs='*', default=[],
+                        help='extra cell sizes, as WIDTHxHEIGHT')
+    parser.add_argument('--images', default='images',
+                        help='directory of the source images')
+    parser.add_argument('--output', default=ATLAS_FILE)
+    parser.add_argument('--index', default=ATLAS_INDEX_FILE)
+    args = parser.parse_args()
+
+    map_files = args.maps if args.maps is not None \
+        else sorted(glob.glob(os.path.join('maps', '*')))
+    sizes = set(cell_sizes(map_files))
+    for size in args.sizes:
+        width, height = size.lower().split('x')
+        sizes.add((int(width), int(height)))
+
+    sprites = [(os.path.join(args.images, 'header.png'),
+                (FARM_WIDTH + INVENTORY_WIDTH, BANNER_HEIGHT))]
+    sprites.extend((path, size) for size in sorted(sizes)
+                   for path in sprite_paths(args.images))
+    count = build_atlas(sprites, args.output, args.index)
+    print(f'Wrote {count} sprites at sizes {sorted(sizes)} to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
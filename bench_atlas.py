@@ -0,0 +1,85 @@
+""" Benchmark for cold-start sprite loading.
+
+    Each run starts a fresh Python process that imports the game's modules,
+    then loads every farm sprite at one cell size, either by decoding and
+    resizing the PNGs or by slicing them from the atlas. It reports how long
+    the sprites took to load and how long the process took to get there.
+    Converting to Tk images is left out, as it costs the same either way and
+    needs a display.
+
+    Build the atlas first with `python atlas.py`.
+
+    Usage: python bench_atlas.py [runs] [width] [height]
+"""
+import statistics
+import subprocess
+import sys
+import time
+
+
+def load_sprites(mode: str, size: tuple[int, int]) -> int:
+    """ Loads every sprite at the given size, as get_image would, and returns
+        how many were loaded.
+    """
+    from PIL import Image
+    from atlas import load_atlas, sprite_paths
+
+    paths = sprite_paths()
+    if mode == 'atlas':
+        atlas = load_atlas()
+        if atlas is None:
+            raise SystemExit('No atlas: run python atlas.py first')
+        images = [atlas.get_image(path, size) for path in paths]
+        if None in images:
+            raise SystemExit(f'The atlas has no up to date {size} sprites')
+    else:
+        images = [Image.open(path).resize(size) for path in paths]
+    # Make sure every image's pixels are actually available
+    for image in images:
+        image.load()
+    return len(images)
+
+
+def child(mode: str, size: tuple[int, int], start: float) -> None:
+    """ Runs one measurement in this process and prints the number of
+        sprites, the ms spent loading them and the ms since process start.
+    """
+    import a3_support
+    import model
+
+    load_start = time.perf_counter()
+    count = load_sprites(mode, size)
+    end = time.perf_counter()
+    print(count, (end - load_start) * 1000, (end - start) * 1000)
+
+
+def run(runs: int, size: tuple[int, int]) -> dict[str, float]:
+    """ Runs the benchmark, returning the median sprite loading ms per
+        mode.
+    """
+    results = {}
+    for mode in ('png', 'atlas'):
+        load_times, total_times = [], []
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, '-c',
+                 'import time; start = time.perf_counter(); '
+                 'import bench_atlas; '
+                 f'bench_atlas.child({mode!r}, {size!r}, start)'],
+                capture_output=True, text=True, check=True).stdout
+            count, load_time, total_time = output.split()
+            load_times.append(float(load_time))
+            total_times.append(float(total_time))
+        results[mode] = statistics.median(load_times)
+        print(f'{mode:>5}: {int(count)} sprites at {size[0]}x{size[1]} in '
+              f'{results[mode]:.1f}ms, {statistics.median(total_times):.1f}ms '
+              f'from process start (medians of {runs})')
+    print(f'atlas speedup: {results["png"] / results["atlas"]:.1f}x')
+    return results
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    height = int(sys.argv[3]) if len(sys.argv) > 3 else width
+    run(runs, (width, height))
@@ -0,0 +1,71 @@
+""" Benchmark for forking FarmModel states.
+
+    Builds a large farm with a plant on every other soil tile, then measures
+    how many fork-and-change operations per second a planner could perform,
+    compared with deep-copying the model.
+
+    Usage: python bench_fork.py [size] [num_forks]
+"""
+import copy
+import os
+import random
+import sys
+import tempfile
+import time
+from constants import *
+from model import FarmModel
+
+SPECIES_NAMES = ['potato', 'kale', 'berry']
+
+
+def make_farm(size: int) -> FarmModel:
+    """ Returns a size x size farm, mostly tilled soil, half of it planted. """
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+        for row in range(size):
+            file.write((SOIL * (size - 1)) + UNTILLED + '\n')
+    with tempfile.NamedTemporaryFile('w', suffix='.txt',
+                                     delete=False) as plants:
+        for row in range(size):
+            plants.writelines(
+                f'{row},{col},{SPECIES_NAMES[(row + col) % 3]},0\n'
+                for col in range(0, size - 1, 2))
+    try:
+        model = FarmModel(file.name, plants.name)
+    finally:
+        os.remove(file.name)
+        os.remove(plants.name)
+    return model
+
+
+def run(size: int, num_forks: int) -> float:
+    """ Runs the benchmark, returning the number of forks per second. """
+    model = make_farm(size)
+    for _ in range(14):
+        model.new_day()
+    rng = random.Random(0)
+
+    start = time.perf_counter()
+    for _ in range(num_forks):
+        fork = model.fork()
+        # Each branch tries a few actions that change the farm
+        fork.get_player().set_position((rng.randrange(size),
+                                        rng.randrange(size)))
+        fork.till_soil((rng.randrange(size), size - 1))
+        fork.harvest_plant((rng.randrange(size), 2 * rng.randrange(size // 2)))
+    elapsed = time.perf_counter() - start
+    rate = num_forks / elapsed
+
+    start = time.perf_counter()
+    copy.deepcopy(model)
+    deepcopy_time = time.perf_counter() - start
+
+    print(f'{size}x{size} farm, {len(model.get_plants())} plants: '
+          f'{rate:,.0f} forks/s ({elapsed / num_forks * 1e6:.1f}us each), '
+          f'deepcopy {deepcopy_time * 1e3:.1f}ms')
+    return rate
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    num_forks = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    run(size, num_forks)
@@ -0,0 +1,68 @@
+""" Benchmark for machines working a large farm.
+
+    Builds a farm of plants of mixed ages and lets it grow without machines.
+    Each day, once the plants have aged, many machines of every kind are
+    placed on it, with plenty of seeds in their storage, and their work is
+    timed. As the machines are new each day, every ready plant they cover is
+    harvested and every empty cell planted, the most work they can do.
+
+    Usage: python bench_machines.py [size] [machines] [days]
+"""
+import random
+import sys
+import time
+from constants import *
+from bench_fork import SPECIES_NAMES
+from bench_weather import make_farm
+from model import FarmModel
+from species import SPECIES_REGISTRY
+
+# Seeds stocked for auto-plant machines, enough never to run out
+SEED_STOCK = 10 ** 9
+
+
+def add_machines(model: FarmModel, num_machines: int, seed: int = 1) -> None:
+    """ Places machines of every kind at random on the farm and stocks their
+        storage with seeds.
+    """
+    rows, cols = model.get_dimensions()
+    rng = random.Random(seed)
+    kinds = [AUTO_HARVEST, AUTO_PLANT, AUTO_TILL]
+    while len(model.get_machines()) < num_machines:
+        kind = kinds[len(model.get_machines()) % len(kinds)]
+        model.add_machine(kind, (rng.randrange(rows), rng.randrange(cols)),
+                          species=rng.choice(SPECIES_NAMES)
+                          if kind == AUTO_PLANT else None)
+    registry = model.get_player().get_registry()
+    storage = model.get_machines().get_storage_array()
+    for name in SPECIES_NAMES:
+        storage[registry.get_id(SPECIES_REGISTRY.get_seed(
+            SPECIES_REGISTRY.get_id(name)))] = SEED_STOCK
+
+
+def run(size: int, num_machines: int, days: int) -> None:
+    """ Runs the benchmark and prints the results. """
+    model = make_farm(size)
+    print(f'{size}x{size} farm ({size * size:,} cells), '
+          f'{len(model.get_plants()):,} plants, {num_machines:,} machines')
+    for day in range(days):
+        model.new_day()
+        add_machines(model, num_machines)
+        plants = len(model.get_plants())
+        storage = model.get_machines().get_storage_array()
+        stored = int(storage.sum())
+        start = time.perf_counter()
+        model.run_machines()
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f'day {model.get_days_elapsed()}: {elapsed:.0f}ms, '
+              f'{len(model.get_plants()) - plants:+,} plants, '
+              f'{int(storage.sum()) - stored:+,} items in storage net of '
+              f'seeds planted')
+        for position in list(model.get_machines().get_machines()):
+            model.remove_machine(position)
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    num_machines = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    days = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    run(size, num_machines, days)
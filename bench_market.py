@@ -0,0 +1,74 @@
+""" Benchmark for the order-book market.
+
+    Simulates a number of farms trading their seeds and produce with each other
+    through one shared Market, and reports the matching throughput.
+
+    Usage: python bench_market.py [num_farms] [num_orders]
+"""
+import random
+import sys
+import time
+from constants import *
+from model import Player
+from market import Market
+
+
+def make_farms(num_farms: int) -> list[Player]:
+    """ Returns players with enough money and stock to trade for a while. """
+    farms = []
+    for _ in range(num_farms):
+        player = Player()
+        player.add_money(10 ** 9)
+        for item_name in ITEMS:
+            player.add_item((item_name, 10 ** 6))
+        farms.append(player)
+    return farms
+
+
+def make_orders(farms: list[Player], num_orders: int, seed: int = 0) -> list:
+    """ Returns a reproducible stream of orders priced around the store's
+        prices, so that most of them rest in the books and cross each other.
+        Orders are placed by the index of the farm, its owner id.
+    """
+    rng = random.Random(seed)
+    orders = []
+    for _ in range(num_orders):
+        item_name = rng.choice(ITEMS)
+        low = SELL_PRICES[item_name]
+        high = BUY_PRICES.get(item_name, low * 2)
+        side = rng.choice((BUY_SIDE, SELL_SIDE))
+        price = rng.randint(low, high) if rng.random() < 0.9 else None
+        orders.append((rng.randrange(len(farms)), item_name, side, price,
+                       rng.randint(1, 10)))
+    return orders
+
+
+def run(num_farms: int, num_orders: int) -> float:
+    """ Runs the benchmark, returning the number of orders handled per second.
+    """
+    farms = make_farms(num_farms)
+    orders = make_orders(farms, num_orders)
+    market = Market()
+    for player in farms:
+        market.register_owner(lambda player=player: player)
+    place_limit = market.place_limit_order
+    place_market = market.place_market_order
+
+    start = time.perf_counter()
+    for owner, item_name, side, price, quantity in orders:
+        if price is None:
+            place_market(owner, item_name, side, quantity)
+        else:
+            place_limit(owner, item_name, side, price, quantity)
+    elapsed = time.perf_counter() - start
+
+    rate = num_orders / elapsed
+    print(f'{num_orders} orders from {num_farms} farms in {elapsed:.3f}s: '
+          f'{rate:,.0f} orders/s, {market.get_trade_count()} fills')
+    return rate
+
+
+if __name__ == '__main__':
+    num_farms = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    num_orders = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+    run(num_farms, num_orders)
@@ -0,0 +1,112 @@
+""" Benchmark for drawing a large farm zoomed out.
+
+    Generates a farm, builds its overview, then pans across it at every
+    zoomed-out level, timing each frame from the overview's pixels to a PIL
+    image of the view, as FarmView draws it. Making the Tk image is left out,
+    as it needs a display. Finally it marks cells changed by a day of play
+    dirty and times rebuilding their chunks, both at once and a few chunks at
+    a time as the minimap does between the window's other events.
+
+    Usage: python bench_overview.py [size] [frames] [plant_ratio]
+"""
+import random
+import statistics
+import sys
+import time
+from PIL import Image
+from constants import *
+from mapgen import MapGenerator
+from overview import ChunkOverview
+from tiles import TileRows, make_tile_rows
+from worker import PlantSnapshot
+
+STAGES = {'potato': 5, 'kale': 5, 'berry': 6}
+
+
+def make_farm(size: int, plant_ratio: float
+              ) -> tuple[TileRows, dict[tuple[int, int], PlantSnapshot]]:
+    """ Returns the map rows and plant snapshots of a generated farm. """
+    generator = MapGenerator(size, size, layout='noise', scale=16)
+    tiles = ''.join(TILES_BY_CODE)
+    ground, plants = [], {}
+    for row, codes in enumerate(generator.rows()):
+        ground.append(''.join(tiles[code] for code in codes.tolist()))
+        for col, species, days in generator.row_plants(row, codes,
+                                                       plant_ratio):
+            stage = min(1 + days // 2, STAGES[species])
+            plants[(row, col)] = PlantSnapshot(species, stage)
+    return make_tile_rows(ground), plants
+
+
+def pan(overview: ChunkOverview, level: int, frames: int,
+        view: int = FARM_WIDTH) -> list[float]:
+    """ Pans diagonally across the farm at a level, returning the ms taken by
+        each frame.
+    """
+    rows, cols = overview.get_dimensions()
+    cells = view << level
+    step = max(1, 1 << level)
+    times = []
+    for frame in range(frames):
+        top = frame * 3 * step % max(rows - cells, 1)
+        left = frame * 2 * step % max(cols - cells, 1)
+        start = time.perf_counter()
+        pixels = overview.get_image(level, (top, left, top + cells,
+                                            left + cells))
+        image = Image.fromarray(pixels)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def run(size: int, frames: int, plant_ratio: float) -> None:
+    """ Runs the benchmark and prints the results. """
+    start = time.perf_counter()
+    ground, plants = make_farm(size, plant_ratio)
+    print(f'{size}x{size} farm with {len(plants):,} plants generated in '
+          f'{time.perf_counter() - start:.1f}s')
+
+    overview = ChunkOverview()
+    start = time.perf_counter()
+    overview.update(ground, plants, None)
+    overview.build()
+    print(f'full build: {time.perf_counter() - start:.2f}s')
+
+    for level in range(overview.get_max_level(), -1, -1):
+        if max(overview.get_level_size(level)) <= FARM_WIDTH // 2:
+            continue
+        times = pan(overview, level, frames)
+        print(f'level {level} ({1 << level} cells/pixel): frame median '
+              f'{statistics.median(times):.2f}ms, worst {max(times):.2f}ms '
+              f'(first {times[0]:.2f}ms)')
+
+    # A day of play: a few thousand cells tilled, planted or harvested
+    rng = random.Random(0)
+    dirty = set()
+    for _ in range(2000):
+        position = (rng.randrange(size), rng.randrange(size))
+        plants[position] = PlantSnapshot('kale', 1)
+        dirty.add(position)
+    overview.update(ground, plants, dirty)
+    chunks = len({(row // OVERVIEW_CHUNK, col // OVERVIEW_CHUNK)
+                  for row, col in dirty})
+    start = time.perf_counter()
+    overview.build()
+    print(f'{len(dirty)} dirty cells in {chunks} chunks rebuilt at once in '
+          f'{(time.perf_counter() - start) * 1000:.1f}ms')
+
+    overview.update(ground, plants, dirty)
+    steps = []
+    more = True
+    while more:
+        start = time.perf_counter()
+        more = overview.build_some(MINIMAP_BUILD_CHUNKS)
+        steps.append((time.perf_counter() - start) * 1000)
+    print(f'rebuilt {MINIMAP_BUILD_CHUNKS} chunks at a time in {len(steps)} '
+          f'steps: median {statistics.median(steps):.1f}ms, worst '
+          f'{max(steps):.1f}ms, total {sum(steps):.1f}ms')
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    plant_ratio = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    run(size, frames, plant_ratio)
@@ -0,0 +1,107 @@
+""" Benchmark for the tile stores.
+
+    Generates a map, stores it as dense rows and as runs of equal tiles, and
+    compares the memory each store takes with the cost of looking up tiles,
+    tilling and untilling them, and iterating the runs of a view as FarmView
+    draws it.
+
+    Usage: python bench_tiles.py [size] [lookups] [layout] [grass_ratio]
+"""
+import random
+import sys
+import time
+import tracemalloc
+from constants import *
+from mapgen import MapGenerator
+from tiles import make_tile_rows, TileRows
+
+VIEW_CELLS = 50
+
+
+def make_rows(size: int, layout: str, grass_ratio: float) -> list[str]:
+    """ Returns the rows of a generated map, with large patches of tiles. """
+    other = (1 - grass_ratio) / 2
+    generator = MapGenerator(size, size, layout=layout, scale=64,
+                             plot_size=64, ratios=(grass_ratio, other, other))
+    tiles = ''.join(TILES_BY_CODE)
+    return [''.join(tiles[code] for code in codes.tolist())
+            for codes in generator.rows()]
+
+
+def build(size: int, layout: str, grass_ratio: float,
+          store: str) -> tuple[TileRows, int]:
+    """ Returns a generated map in the given store and the bytes it takes. """
+    tracemalloc.start()
+    rows = make_rows(size, layout, grass_ratio)
+    tile_rows = make_tile_rows(rows, store)
+    del rows
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return tile_rows, memory
+
+
+def time_lookups(tile_rows: TileRows, positions: list[tuple[int, int]]
+                 ) -> float:
+    """ Returns the ns taken by each get_tile. """
+    start = time.perf_counter()
+    for row, col in positions:
+        tile_rows.get_tile(row, col)
+    return (time.perf_counter() - start) / len(positions) * 1e9
+
+
+def time_updates(tile_rows: TileRows, positions: list[tuple[int, int]]
+                 ) -> float:
+    """ Returns the ns taken by each set_tile, tilling and then untilling
+        every untilled cell among the positions.
+    """
+    cells = [(row, col) for row, col in positions
+             if tile_rows.get_tile(row, col) == UNTILLED]
+    start = time.perf_counter()
+    for tile in (SOIL, UNTILLED):
+        for row, col in cells:
+            tile_rows.set_tile(row, col, tile)
+    return (time.perf_counter() - start) / max(2 * len(cells), 1) * 1e9
+
+
+def time_views(tile_rows: TileRows, views: list[tuple[int, int]]) -> tuple[
+        float, float]:
+    """ Returns the ms taken to iterate the runs of each view, and the
+        average number of runs, i.e. canvas items, per view.
+    """
+    runs = 0
+    start = time.perf_counter()
+    for top, left in views:
+        for row in range(top, top + VIEW_CELLS):
+            runs += sum(1 for _ in tile_rows.get_runs(row, left,
+                                                      left + VIEW_CELLS))
+    return ((time.perf_counter() - start) / len(views) * 1000,
+            runs / len(views))
+
+
+def run(size: int, lookups: int, layout: str, grass_ratio: float) -> None:
+    """ Runs the benchmark and prints the results. """
+    rng = random.Random(0)
+    positions = [(rng.randrange(size), rng.randrange(size))
+                 for _ in range(lookups)]
+    views = [(rng.randrange(size - VIEW_CELLS), rng.randrange(size - VIEW_CELLS))
+             for _ in range(100)]
+    print(f'{size}x{size} {layout} map, {grass_ratio:.0%} grass')
+    for store in (DENSE_TILES, RUN_TILES):
+        start = time.perf_counter()
+        tile_rows, memory = build(size, layout, grass_ratio, store)
+        built = time.perf_counter() - start
+        lookup = time_lookups(tile_rows, positions)
+        update = time_updates(tile_rows, positions)
+        view, items = time_views(tile_rows, views)
+        print(f'{store:>6}: {memory / 2 ** 20:8.1f}MiB, built in '
+              f'{built:.1f}s, lookup {lookup:.0f}ns, till/untill '
+              f'{update:.0f}ns, view runs {view:.2f}ms ({items:.0f} items '
+              f'vs {VIEW_CELLS ** 2} cells)')
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+    layout = sys.argv[3] if len(sys.argv) > 3 else 'noise'
+    grass_ratio = float(sys.argv[4]) if len(sys.argv) > 4 else 0.9
+    run(size, lookups, layout, grass_ratio)
@@ -0,0 +1,35 @@
+""" Benchmark for VectorFarmEnv.
+
+    Steps many copies of a map with random actions and reports the number of
+    farm-steps per second.
+
+    Usage: python bench_vector_env.py [map_file] [num_farms] [num_steps]
+"""
+import sys
+import time
+import numpy as np
+from vector_env import VectorFarmEnv
+
+
+def run(map_file: str, num_farms: int, num_steps: int) -> float:
+    """ Runs the benchmark, returning the number of farm-steps per second. """
+    env = VectorFarmEnv(map_file, num_farms)
+    rng = np.random.default_rng(0)
+    actions = rng.integers(0, env.get_num_actions(), (num_steps, num_farms))
+
+    start = time.perf_counter()
+    for step_actions in actions:
+        env.step(step_actions)
+    elapsed = time.perf_counter() - start
+
+    rate = num_farms * num_steps / elapsed
+    print(f'{num_farms} farms x {num_steps} steps in {elapsed:.3f}s: '
+          f'{rate:,.0f} farm-steps/s')
+    return rate
+
+
+if __name__ == '__main__':
+    map_file = sys.argv[1] if len(sys.argv) > 1 else 'maps/map1.txt'
+    num_farms = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    num_steps = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    run(map_file, num_farms, num_steps)
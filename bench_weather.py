@@ -0,0 +1,75 @@
+""" Benchmark for the cost of weather in day transitions.
+
+    Builds a large farm of plants of mixed ages and, through the first days
+    of each season, alternates days with and without weather on it, so that
+    both kinds of day age nearly the same plants. Reports the fastest day of
+    each kind and how much longer weather makes a day.
+
+    Usage: python bench_weather.py [size] [days]
+    where days, the number of days of each kind per season, is less than
+    SEASON_DAYS / 2.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from constants import *
+from bench_fork import SPECIES_NAMES
+from model import FarmModel
+from weather import Weather
+
+# Plants start up to this many days old, so that they ripen on different days
+MAX_START_DAYS = 20
+
+
+def make_farm(size: int, seed: int = 0) -> FarmModel:
+    """ Returns a size x size farm of tilled soil, half of it planted with
+        plants of random species and ages.
+    """
+    rng = random.Random(seed)
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+        file.writelines(SOIL * size + '\n' for _ in range(size))
+    with tempfile.NamedTemporaryFile('w', suffix='.txt',
+                                     delete=False) as plants:
+        for row in range(size):
+            plants.writelines(
+                f'{row},{col},{rng.choice(SPECIES_NAMES)},'
+                f'{rng.randrange(MAX_START_DAYS)}\n'
+                for col in range(row % 2, size, 2))
+    try:
+        return FarmModel(file.name, plants.name)
+    finally:
+        os.remove(file.name)
+        os.remove(plants.name)
+
+
+def run(size: int, days: int) -> None:
+    """ Runs the benchmark and prints the results. """
+    model = make_farm(size)
+    weather = Weather(seed=1)
+    print(f'{size}x{size} farm, {len(model.get_plants())} plants')
+    for season in SEASONS:
+        fastest = {}
+        for day in range(2 * days):
+            with_weather = day % 2 == 1
+            model.set_weather(weather if with_weather else None)
+            start = time.perf_counter()
+            model.new_day()
+            elapsed = (time.perf_counter() - start) * 1000
+            fastest[with_weather] = min(fastest.get(with_weather, elapsed),
+                                        elapsed)
+        plain, stormy = fastest[False], fastest[True]
+        print(f'{season:>6}: {plain:6.0f}ms without weather, {stormy:6.0f}ms '
+              f'with weather ({stormy / plain - 1:+.0%}), '
+              f'{len(model.get_plants())} plants left')
+        # Skip to the first day of the next season
+        model.set_weather(None)
+        model.fast_forward(SEASON_DAYS
+                           - (model.get_days_elapsed() - 1) % SEASON_DAYS)
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    run(size, days)
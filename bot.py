@@ -0,0 +1,142 @@
+from typing import Iterator, Optional
+from constants import *
+from model import FarmModel
+from species import SPECIES_REGISTRY
+
+# Cost of the action the bot performs at each kind of job
+JOB_COSTS = {
+    HARVEST_ACTION: HARVEST_COST,
+    PLANT_ACTION: PLANT_COST,
+    TILL_ACTION: TILL_COST,
+}
+
+
+def best_seed(money: int) -> Optional[str]:
+    """ Returns the seed that earns the most per day of growth that the given
+        amount of money can buy, or None if no seed is affordable.
+    """
+    best, best_score = None, None
+    for species in range(len(SPECIES_REGISTRY)):
+        seed = SPECIES_REGISTRY.get_seed(species)
+        product = SPECIES_REGISTRY.get_product(species)
+        if seed not in BUY_PRICES or BUY_PRICES[seed] > money:
+            continue
+        profit = SPECIES_REGISTRY.get_yield(species) \
+            * SELL_PRICES.get(product, 0) - BUY_PRICES[seed]
+        days = SPECIES_REGISTRY.get_maturity_day(species) or 1
+        if best_score is None or profit / days > best_score:
+            best, best_score = seed, profit / days
+    return best
+
+
+class GreedyBot:
+    """ A simple player for headless runs. At the start of each day it sells
+        its produce and buys seeds for any empty soil, then walks to the
+        nearest job (a ready plant to harvest, empty soil to plant, or
+        untilled soil to till when it has spare seeds) until it runs out of
+        energy.
+    """
+
+    def play_day(self, model: FarmModel) -> Iterator[tuple[str, Optional[str]]]:
+        """ Yields the actions for one day, inspecting the model between
+            actions. The caller applies each action before asking for the next.
+
+        Parameters:
+            model: The game being played.
+        """
+        player = model.get_player()
+        for item_name, amount in list(player.get_inventory().items()):
+            if item_name not in SEEDS:
+                for _ in range(amount):
+                    yield (SELL_ACTION, item_name)
+
+        jobs = self._find_jobs(model)
+        empty_soil = sum(1 for action in jobs.values()
+                         if action == PLANT_ACTION)
+        seeds = sum(player.get_item_count(seed) for seed in SEEDS)
+        while seeds < empty_soil:
+            seed = best_seed(player.get_money())
+            if seed is None:
+                break
+            yield (BUY_ACTION, seed)
+            seeds += 1
+        if seeds <= empty_soil:
+            jobs = {position: action for position, action in jobs.items()
+                    if action != TILL_ACTION}
+
+        while jobs:
+            row, col = player.get_position()
+            position = min(jobs, key=lambda job: abs(job[0] - row)
+                           + abs(job[1] - col))
+            action = jobs.pop(position)
+            distance = abs(position[0] - row) + abs(position[1] - col)
+            if player.get_energy() < distance * MOVE_COST \
+                    + JOB_COSTS[action]:
+                continue
+            # Don't walk to empty soil without a seed to plant there
+            seed = max(SEEDS, key=player.get_item_count)
+            if action == PLANT_ACTION and player.get_item_count(seed) == 0:
+                continue
+
+            yield from self._walk_to(model, position)
+            if action == PLANT_ACTION:
+                yield (SELECT_ACTION, seed)
+            yield (action, None)
+            if action == TILL_ACTION:
+                jobs[position] = PLANT_ACTION
+
+    def _find_jobs(self, model: FarmModel) -> dict[tuple[int, int], str]:
+        """ Returns the action the bot wants to perform at each position. """
+        plants = model.get_plants()
+        jobs = {position: HARVEST_ACTION for position, plant in plants.items()
+                if plant.can_harvest()}
+        for row, tiles in enumerate(model.get_map()):
+            for col, tile in enumerate(tiles):
+                if tile == SOIL and (row, col) not in plants:
+                    jobs[(row, col)] = PLANT_ACTION
+                elif tile == UNTILLED:
+                    jobs[(row, col)] = TILL_ACTION
+        return jobs
+
+    def _walk_to(self, model: FarmModel,
+                 position: tuple[int, int]) -> Iterator[tuple[str, str]]:
+        """ Yields the moves that take the player to the given position. """
+        row, col = model.get_player_position()
+        target_row, target_col = position
+        vertical = DOWN if target_row > row else UP
+        horizontal = RIGHT if target_col > col else LEFT
+        for _ in range(abs(target_row - row)):
+            yield (MOVE_ACTION, vertical)
+        for _ in range(abs(target_col - col)):
+            yield (MOVE_ACTION, horizontal)
+
+
+class ScenarioPlayer:
+    """ Plays a fixed script of actions, one list of actions per day. The
+        script repeats if the run is longer than it.
+    """
+
+    def __init__(self, days: list[list[list]]) -> None:
+        """ Constructor for the scenario player.
+
+        Parameters:
+            days: For each day, the list of [action, argument] pairs to apply.
+                  The argument may be omitted for actions that take none.
+                  Days end between the lists, so NEW_DAY_ACTION is not
+                  allowed in them.
+        """
+        for number, actions in enumerate(days, 1):
+            if any(action[0] == NEW_DAY_ACTION for action in actions):
+                raise ValueError(f'Day {number} of the scenario contains '
+                                 f'{NEW_DAY_ACTION!r}; days end between '
+                                 f'the lists of actions')
+        self._days = days
+        self._day = 0
+
+    def play_day(self, model: FarmModel) -> Iterator[tuple[str, Optional[str]]]:
+        """ Yields the scripted actions for the next day. """
+        if not self._days:
+            return
+        for action in self._days[self._day % len(self._days)]:
+            yield (action[0], action[1] if len(action) > 1 else None)
+        self._day += 1
@@ -3,6 +3,16 @@ GRASS = 'G'
 SOIL = 'S'
 UNTILLED = 'U'
 
+# Integer codes for tiles, used by array and binary representations of maps
+TILE_CODES = {GRASS: 0, SOIL: 1, UNTILLED: 2}
+TILES_BY_CODE = [GRASS, SOIL, UNTILLED]
+
+# Packed binary map files start with this, followed by the number of rows and
+# columns (little-endian uint32s) and then each row with 2 bits per tile (the
+# first tile in the highest bits), padded to a whole byte
+BINARY_MAP_MAGIC = b'FARMMAP1'
+BINARY_MAP_EXTENSION = '.fmap'
+
 # Constants related to moving the player
 UP = 'w'
 DOWN = 's'
@@ -84,3 +94,162 @@ SELL_PRICES = {
     'Berry': 50,
     'Berry Seed': 40,
 }
+
+# Sides of an order in the market
+BUY_SIDE = 'buy'
+SELL_SIDE = 'sell'
+
+# All plant species in the game. Each species' stage on a given day after it
+# was planted is read from 'days_to_stage' (the last entry is the harvest
+# stage). Species with a 'regrow_stage' are not removed on harvest; they drop
+# back to that stage and return to the harvest stage 'regrow_days' days later.
+PLANT_SPECIES = [
+    {
+        'name': 'potato',
+        'seed': 'Potato Seed',
+        'product': 'Potato',
+        'yield': 1,
+        'days_to_stage': [1, 2, 3, 4, 5],
+    },
+    {
+        'name': 'kale',
+        'seed': 'Kale Seed',
+        'product': 'Kale',
+        'yield': 1,
+        'days_to_stage': [1, 2, 2, 3, 3, 4, 5],
+    },
+    {
+        'name': 'berry',
+        'seed': 'Berry Seed',
+        'product': 'Berry',
+        'yield': 3,
+        'days_to_stage': [1, 2, 2, 2, 3, 3, 3, 4, 4, 4, 4, 5, 5, 6],
+        'regrow_stage': 5,
+        'regrow_days': 4,
+    },
+]
+
+# Player actions understood by FarmModel.apply_action
+MOVE_ACTION = 'move'
+TILL_ACTION = 'till'
+UNTILL_ACTION = 'untill'
+PLANT_ACTION = 'plant'
+HARVEST_ACTION = 'harvest'
+REMOVE_ACTION = 'remove'
+SELECT_ACTION = 'select'
+BUY_ACTION = 'buy'
+SELL_ACTION = 'sell'
+NEW_DAY_ACTION = 'new_day'
+
+# Energy needed by the actions that act on the tile under the player
+ACTION_COSTS = {
+    TILL_ACTION: TILL_COST,
+    UNTILL_ACTION: UNTILL_COST,
+    PLANT_ACTION: PLANT_COST,
+    HARVEST_ACTION: HARVEST_COST,
+    REMOVE_ACTION: REMOVE_COST,
+}
+
+# Actions understood by the game window's simulation worker
+UNDO_ACTION = 'undo'
+REDO_ACTION = 'redo'
+TRAVEL_ACTION = 'travel'
+
+# How often the game checks for new frames from the simulation (ms)
+POLL_INTERVAL = 15
+
+# How map rows and plants are grouped for copy-on-write snapshots
+COW_CHUNK_ROWS = 64
+COW_PLANT_BLOCK = 32
+
+# How a farm's map is stored: one string per row, runs of equal tiles, or
+# runs only if the map's runs average at least TILE_RUN_MIN_LENGTH tiles
+DENSE_TILES = 'dense'
+RUN_TILES = 'runs'
+AUTO_TILES = 'auto'
+TILE_STORE = AUTO_TILES
+TILE_RUN_MIN_LENGTH = 16
+
+# How many actions can be undone in the game window, and how many plants
+# that are not shared with the next state the undo history may hold on to
+# (each day copies every plant, so this bounds how many days can be undone)
+UNDO_LIMIT = 200
+UNDO_PLANT_LIMIT = 1000000
+
+# Kinds of machine that work the farm at the start of each day
+AUTO_TILL = 'auto_till'
+AUTO_PLANT = 'auto_plant'
+AUTO_HARVEST = 'auto_harvest'
+MACHINE_KINDS = (AUTO_HARVEST, AUTO_TILL, AUTO_PLANT)
+MACHINE_RADIUS = 2
+
+# How many map rows machines are processed together
+MACHINE_BAND_ROWS = 256
+
+# Days of history kept by telemetry, and shown in the game's sparklines
+TELEMETRY_DAYS = 365
+SPARKLINE_DAYS = 60
+SPARKLINE_HEIGHT = 30
+
+# Pre-scaled sprite atlas built by atlas.py, and its index
+ATLAS_FILE = 'images/atlas.rgba'
+ATLAS_INDEX_FILE = 'images/atlas.json'
+
+# How many items the inventory shows at once
+INVENTORY_VISIBLE_ROWS = 6
+
+# Farms kept in memory by a FarmWorld, and where it saves the others
+WORLD_RESIDENT_FARMS = 3
+WORLD_SAVE_DIR = 'saves'
+WORLD_STATE_FILE = 'world.json'
+FARM_SAVE_EXTENSION = '.farm'
+
+# Zoom of the farm view: the most pixels per cell when zoomed in, and the most
+# cells in view that are drawn with sprites rather than from the overview
+ZOOM_MAX_CELL = 64
+SPRITE_MAX_CELLS = 2500
+
+# Cells per side of each chunk of the farm overview, the finest level
+# (2 ** level cells per pixel) the overview keeps for the whole farm, and how
+# many chunks' full-resolution colours it caches for the finer levels
+OVERVIEW_CHUNK = 64
+OVERVIEW_MOSAIC_LEVEL = 2
+OVERVIEW_CACHE_CHUNKS = 1024
+
+# The minimap of the whole farm
+MINIMAP_SIZE = 160
+MINIMAP_PLAYER_COLOUR = 'red'
+MINIMAP_VIEW_COLOUR = 'white'
+# The most dirty overview chunks the minimap rebuilds at a time, between which
+# the window handles its other events
+MINIMAP_BUILD_CHUNKS = 16
+
+# Seasons, each lasting SEASON_DAYS days, and the weather that can strike a
+# region of the farm on any day. Drought stops plants growing for the day,
+# rain makes them grow two days' worth, and frost kills each plant in the
+# region with FROST_KILL_CHANCE
+SPRING = 'spring'
+SUMMER = 'summer'
+AUTUMN = 'autumn'
+WINTER = 'winter'
+SEASONS = (SPRING, SUMMER, AUTUMN, WINTER)
+SEASON_DAYS = 28
+
+CALM = 'calm'
+DROUGHT = 'drought'
+RAIN = 'rain'
+FROST = 'frost'
+WEATHER_EVENTS = (CALM, DROUGHT, RAIN, FROST)
+WEATHER_GROWTH_DAYS = {CALM: 1, DROUGHT: 0, RAIN: 2, FROST: 1}
+
+# The chance of each event in a region on a day, by season
+SEASON_WEATHER = {
+    SPRING: {DROUGHT: 0.05, RAIN: 0.3, FROST: 0.05},
+    SUMMER: {DROUGHT: 0.25, RAIN: 0.1, FROST: 0.0},
+    AUTUMN: {DROUGHT: 0.05, RAIN: 0.25, FROST: 0.1},
+    WINTER: {DROUGHT: 0.0, RAIN: 0.05, FROST: 0.3},
+}
+FROST_KILL_CHANCE = 0.5
+
+# Width and height of a weather region, a multiple of COW_PLANT_BLOCK
+WEATHER_REGION = 64
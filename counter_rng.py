@@ -0,0 +1,46 @@
+""" Counter-based random numbers.
+
+    Every value is a pure function of a seed and a tuple of integer counters
+    (e.g. a day, row and column), so any value can be reproduced directly
+    without replaying the values before it, and whole arrays of counters can
+    be hashed at once with NumPy.
+"""
+import numpy as np
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def mix64(values: np.ndarray) -> np.ndarray:
+    """ Returns the SplitMix64 finaliser of each of the given uint64 values,
+        which scrambles every input bit into every output bit.
+    """
+    with np.errstate(over='ignore'):
+        values = (values ^ (values >> np.uint64(30))) * _MIX_1
+        values = (values ^ (values >> np.uint64(27))) * _MIX_2
+        return values ^ (values >> np.uint64(31))
+
+
+def hash_counters(seed: int, *counters) -> np.ndarray:
+    """ Returns a 64-bit hash of the seed and counters. Counters may be
+        integers or integer arrays, which are broadcast together.
+
+    Parameters:
+        seed: The seed of the random stream.
+        counters: The non-negative integer counters to hash.
+    """
+    state = mix64(np.uint64(seed % 2 ** 64) + _GOLDEN)
+    with np.errstate(over='ignore'):
+        for counter in counters:
+            counter = np.asarray(counter).astype(np.uint64)
+            state = mix64(state ^ (counter + _GOLDEN))
+    return state
+
+
+def uniform(seed: int, *counters) -> np.ndarray:
+    """ Returns a float in [0, 1) for each combination of counters, as for
+        hash_counters.
+    """
+    return (hash_counters(seed, *counters) >> np.uint64(11)) \
+        * (1.0 / 2 ** 53)
@@ -0,0 +1,283 @@
+from itertools import chain
+from typing import Iterable, Iterator, Mapping, Optional
+from constants import *
+
+
+class CowRows:
+    """ A fixed-length sequence of immutable values (e.g. the rows of a map),
+        stored in chunks that are shared between forks until one of them is
+        written to.
+
+        Forking is O(1): both the original and the fork give up ownership of
+        every chunk, and whichever writes to a chunk first copies just that
+        chunk (and, once per fork, the list of chunks).
+    """
+    __slots__ = ('_chunks', '_chunks_owned', '_owned', '_chunk_size',
+                 '_length')
+
+    def __init__(self, values: list, chunk_size: int = COW_CHUNK_ROWS) -> None:
+        """ Constructor for the sequence.
+
+        Parameters:
+            values: The initial values.
+            chunk_size: How many values to store per chunk.
+        """
+        self._chunk_size = chunk_size
+        self._length = len(values)
+        self._chunks = [list(values[start:start + chunk_size])
+                        for start in range(0, len(values), chunk_size)]
+        self._chunks_owned = True
+        self._owned = set(range(len(self._chunks)))
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('CowRows index out of range')
+        chunk, offset = divmod(index, self._chunk_size)
+        return self._chunks[chunk][offset]
+
+    def __setitem__(self, index: int, value) -> None:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('CowRows index out of range')
+        chunk, offset = divmod(index, self._chunk_size)
+        self._get_own_chunk(chunk)[offset] = value
+
+    def __iter__(self) -> Iterator:
+        for chunk in self._chunks:
+            yield from chunk
+
+    def __eq__(self, other) -> bool:
+        return len(self) == len(other) and all(
+            mine == theirs for mine, theirs in zip(self, other))
+
+    def get_chunk_size(self) -> int:
+        """ Returns how many values are stored per chunk. """
+        return self._chunk_size
+
+    def get_chunk(self, chunk: int) -> list:
+        """ Returns the given chunk. Chunks are shared between forks and must
+            not be modified.
+        """
+        return self._chunks[chunk]
+
+    def get_chunk_count(self) -> int:
+        """ Returns the number of chunks. """
+        return len(self._chunks)
+
+    def fork(self) -> 'CowRows':
+        """ Returns a copy of this sequence, of the same class, that shares
+            all of its chunks.
+        """
+        other = object.__new__(type(self))
+        other._chunk_size = self._chunk_size
+        other._length = self._length
+        other._chunks = self._chunks
+        other._chunks_owned = False
+        other._owned = set()
+        self._chunks_owned = False
+        self._owned = set()
+        return other
+
+    def _get_own_chunk(self, chunk: int) -> list:
+        """ Returns the given chunk, copying it first if it is shared. """
+        if not self._chunks_owned:
+            self._chunks = list(self._chunks)
+            self._chunks_owned = True
+        if chunk not in self._owned:
+            self._chunks[chunk] = list(self._chunks[chunk])
+            self._owned.add(chunk)
+        return self._chunks[chunk]
+
+
+class CowPlantMap(Mapping):
+    """ A mapping of (row, col) positions to plants that is shared between
+        forks until one of them changes it.
+
+        Plants are grouped into square blocks of cells. Adding or removing a
+        plant copies only its block, and changing a plant (aging or harvesting
+        it) additionally copies only that plant. Plants returned by the
+        read-only Mapping methods may be shared with other forks and must not
+        be modified; use get_mutable or mutable_values instead.
+    """
+
+    def __init__(self, block_size: int = COW_PLANT_BLOCK) -> None:
+        """ Constructor for an empty plant map.
+
+        Parameters:
+            block_size: The width and height of the blocks of cells.
+        """
+        self._block_size = block_size
+        self._blocks = {}
+        self._blocks_owned = True
+        self._owned = set()
+        self._owned_plants = set()
+        self._size = 0
+
+    def _block_key(self, position: tuple[int, int]) -> tuple[int, int]:
+        return position[0] // self._block_size, position[1] // self._block_size
+
+    def __getitem__(self, position: tuple[int, int]) -> 'Plant':
+        block = self._blocks.get(self._block_key(position))
+        if block is None:
+            raise KeyError(position)
+        return block[position]
+
+    def __contains__(self, position) -> bool:
+        block = self._blocks.get(self._block_key(position))
+        return block is not None and position in block
+
+    def get(self, position: tuple[int, int], default=None):
+        block = self._blocks.get(self._block_key(position))
+        if block is None:
+            return default
+        return block.get(position, default)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        for block in self._blocks.values():
+            yield from block
+
+    def items(self):
+        for block in self._blocks.values():
+            yield from block.items()
+
+    def values(self):
+        for block in self._blocks.values():
+            yield from block.values()
+
+    def __setitem__(self, position: tuple[int, int], plant: 'Plant') -> None:
+        block = self._get_own_block(self._block_key(position))
+        if position not in block:
+            self._size += 1
+        block[position] = plant
+        self._owned_plants.add(position)
+
+    def pop(self, position: tuple[int, int], *default) -> 'Plant':
+        """ Removes and returns the plant at the given position. """
+        key = self._block_key(position)
+        if position not in self._blocks.get(key, ()):
+            if default:
+                return default[0]
+            raise KeyError(position)
+        block = self._get_own_block(key)
+        self._size -= 1
+        self._owned_plants.discard(position)
+        plant = block.pop(position)
+        if not block:
+            del self._blocks[key]
+            self._owned.discard(key)
+        return plant
+
+    def pop_block(self, key: tuple[int, int],
+                  positions: list[tuple[int, int]]) -> list['Plant']:
+        """ Removes and returns the plants at the given positions, which must
+            all hold plants in the block with the given key, as in get_blocks.
+        """
+        block = self._get_own_block(key)
+        plants = list(map(block.pop, positions))
+        self._owned_plants.difference_update(positions)
+        self._size -= len(plants)
+        if not block:
+            del self._blocks[key]
+            self._owned.discard(key)
+        return plants
+
+    def get_mutable(self, position: tuple[int, int]) -> 'Plant':
+        """ Returns the plant at the given position, copying it first if it is
+            shared with another fork, so that it may be modified.
+        """
+        if position in self._owned_plants:
+            return self[position]
+        block = self._get_own_block(self._block_key(position))
+        plant = block[position] = block[position].copy()
+        self._owned_plants.add(position)
+        return plant
+
+    def mutable_values(
+            self,
+            keys: Optional[Iterable[tuple[int, int]]] = None
+        ) -> Iterator['Plant']:
+        """ Yields every plant, copying any that are shared with another fork,
+            so that all of them may be modified.
+
+        Parameters:
+            keys: If given, only the plants in the blocks with these keys, as
+                  in get_blocks.
+        """
+        owned_plants = self._owned_plants
+        for key in list(self._blocks) if keys is None else keys:
+            if key not in self._blocks:
+                continue
+            block = self._get_own_block(key)
+            for position, plant in block.items():
+                if position not in owned_plants:
+                    plant = block[position] = plant.copy()
+                    owned_plants.add(position)
+                yield plant
+
+    def get_positions(
+            self,
+            keys: Optional[Iterable[tuple[int, int]]] = None
+        ) -> list[tuple[int, int]]:
+        """ Returns the position of every plant, in the order mutable_values
+            yields them for the same keys.
+        """
+        blocks = self._blocks
+        if keys is None:
+            return list(chain.from_iterable(blocks.values()))
+        return list(chain.from_iterable(blocks[key] for key in keys
+                                        if key in blocks))
+
+    def count_unshared(self, other: 'CowPlantMap') -> int:
+        """ Returns the number of plants in this map's blocks that are not
+            shared with the given fork of it, i.e. that copying it cost.
+        """
+        blocks = other._blocks
+        return sum(len(block) for key, block in self._blocks.items()
+                   if blocks.get(key) is not block)
+
+    def get_block_size(self) -> int:
+        """ Returns the width and height of the blocks of cells. """
+        return self._block_size
+
+    def get_blocks(self) -> dict[tuple[int, int], dict]:
+        """ Returns the blocks of plants, keyed by (row, col) // block_size.
+            Blocks are shared between forks and must not be modified.
+        """
+        return self._blocks
+
+    def fork(self) -> 'CowPlantMap':
+        """ Returns a copy of this map that shares all of its blocks and
+            plants.
+        """
+        other = CowPlantMap.__new__(CowPlantMap)
+        other._block_size = self._block_size
+        other._blocks = self._blocks
+        other._blocks_owned = False
+        other._owned = set()
+        other._owned_plants = set()
+        other._size = self._size
+        self._blocks_owned = False
+        self._owned = set()
+        self._owned_plants = set()
+        return other
+
+    def _get_own_block(self, key: tuple[int, int]) -> dict:
+        """ Returns the given block, creating it if needed or copying it first
+            if it is shared.
+        """
+        if not self._blocks_owned:
+            self._blocks = dict(self._blocks)
+            self._blocks_owned = True
+        if key not in self._owned:
+            self._blocks[key] = dict(self._blocks.get(key, ()))
+            self._owned.add(key)
+        return self._blocks[key]
@@ -0,0 +1,112 @@
+import numpy as np
+from typing import Optional
+from constants import *
+
+
+class ItemRegistry:
+    """ Assigns dense integer ids to item names, in catalogue order, so that
+        inventories and prices can be stored as fixed-size integer arrays
+        indexed by item id.
+    """
+
+    def __init__(
+            self,
+            item_names: list[str],
+            buy_prices: dict[str, int],
+            sell_prices: dict[str, int]
+        ) -> None:
+        """ Constructor for the item registry.
+
+        Parameters:
+            item_names: All item names, in the order their ids are assigned.
+            buy_prices: How much it costs to buy items from the store.
+            sell_prices: How much items can be sold to the store for.
+        """
+        self._names = list(item_names)
+        self._ids = {name: item_id for item_id, name in enumerate(self._names)}
+        self._buy_prices = np.array(
+            [buy_prices.get(name, 0) for name in self._names], dtype=np.int64)
+        self._sell_prices = np.array(
+            [sell_prices.get(name, 0) for name in self._names], dtype=np.int64)
+        self._buyable = np.array([name in buy_prices for name in self._names])
+        self._sellable = np.array([name in sell_prices
+                                   for name in self._names])
+
+    def __reduce_ex__(self, protocol):
+        # The shared registry is pickled by name, so that saved games load
+        # with references to it rather than copies
+        if self is ITEM_REGISTRY:
+            return 'ITEM_REGISTRY'
+        return super().__reduce_ex__(protocol)
+
+    def __len__(self) -> int:
+        """ Returns the number of items in the registry. """
+        return len(self._names)
+
+    def get_id(self, item_name: str) -> int:
+        """ Returns the id of the item with the given name. """
+        return self._ids[item_name]
+
+    def find_id(self, item_name: str) -> Optional[int]:
+        """ Returns the id of the item with the given name, or None if there is
+            no such item.
+        """
+        return self._ids.get(item_name)
+
+    def get_name(self, item_id: int) -> str:
+        """ Returns the name of the item with the given id. """
+        return self._names[item_id]
+
+    def get_names(self) -> list[str]:
+        """ Returns all item names, in id order. """
+        return self._names
+
+    def get_buy_prices(self) -> np.ndarray:
+        """ Returns the store's buy price of every item, indexed by id. Items
+            that cannot be bought have a price of 0.
+        """
+        return self._buy_prices
+
+    def get_sell_prices(self) -> np.ndarray:
+        """ Returns the store's sell price of every item, indexed by id. Items
+            that cannot be sold have a price of 0.
+        """
+        return self._sell_prices
+
+    def get_buyable(self) -> np.ndarray:
+        """ Returns a boolean mask of the items that can be bought. """
+        return self._buyable
+
+    def get_sellable(self) -> np.ndarray:
+        """ Returns a boolean mask of the items that can be sold. """
+        return self._sellable
+
+    def make_inventory(self, contents: dict[str, int] = None) -> np.ndarray:
+        """ Returns a new inventory array, optionally filled from a mapping of
+            item names to amounts.
+
+        Parameters:
+            contents: The initial amount of each named item.
+        """
+        inventory = np.zeros(len(self._names), dtype=np.int64)
+        for item_name, amount in (contents or {}).items():
+            inventory[self._ids[item_name]] = amount
+        return inventory
+
+    def make_basket(self, contents: dict[str, int]) -> np.ndarray:
+        """ Returns an array holding the given amount of each named item, for
+            use with Player.buy_many and Player.sell_many.
+        """
+        return self.make_inventory(contents)
+
+    def to_dict(self, inventory: np.ndarray) -> dict[str, int]:
+        """ Returns a mapping of item names to amounts for the non-zero
+            entries of the given inventory array.
+        """
+        names = self._names
+        return {names[item_id]: int(inventory[item_id])
+                for item_id in np.flatnonzero(inventory)}
+
+
+# Registry for the items available in the game
+ITEM_REGISTRY = ItemRegistry(ITEMS, BUY_PRICES, SELL_PRICES)
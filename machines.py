@@ -0,0 +1,210 @@
+from itertools import count
+from typing import Optional
+import numpy as np
+from constants import *
+from items import ITEM_REGISTRY, ItemRegistry
+from species import SPECIES_REGISTRY, SpeciesRegistry
+
+# Versions handed out to machine sets, unique across every set and copy
+_VERSIONS = count()
+
+
+class MachineSet:
+    """ The machines placed on a farm, and the storage they share.
+
+        Each machine works every cell within its radius (a square of side
+        2 * radius + 1 centred on it) at the start of each day: auto-till
+        machines till untilled soil, auto-plant machines plant their species
+        on empty soil using seeds from the storage, and auto-harvest machines
+        harvest ready plants into the storage.
+
+        The area each kind of machine covers is computed for a band of rows at
+        a time with a 2D difference array, so the cost depends on the size of
+        the band and the number of machines, not on the size of their areas.
+        One difference array is kept for the set and reused for every band.
+    """
+
+    def __init__(
+            self,
+            items: ItemRegistry = ITEM_REGISTRY,
+            species: SpeciesRegistry = SPECIES_REGISTRY
+        ) -> None:
+        """ Constructor for the machine set.
+
+        Parameters:
+            items: The items that can be held in the storage.
+            species: The plant species auto-plant machines can plant.
+        """
+        self._items = items
+        self._species = species
+        # (kind, radius, species id or -1) of each machine, by position
+        self._machines = {}
+        self._storage = items.make_inventory()
+        self._arrays = None
+        self._difference = None
+        self._version = next(_VERSIONS)
+
+    def copy(self) -> 'MachineSet':
+        """ Returns an independent copy of the machines and their storage. """
+        other = object.__new__(MachineSet)
+        other._items = self._items
+        other._species = self._species
+        other._machines = dict(self._machines)
+        other._storage = self._storage.copy()
+        other._arrays = self._arrays
+        other._difference = None
+        other._version = self._version
+        return other
+
+    def __getstate__(self) -> dict:
+        # The difference array is only scratch space, so is left out of saves
+        state = self.__dict__.copy()
+        state['_difference'] = None
+        return state
+
+    def __len__(self) -> int:
+        return len(self._machines)
+
+    def get_version(self) -> int:
+        """ Returns the version of the machines (not their storage). A set
+            and its copies have the same version until one of them places or
+            removes a machine, which gives it a version no other set has.
+        """
+        return self._version
+
+    def add(self, kind: str, position: tuple[int, int],
+            radius: int = MACHINE_RADIUS, species: Optional[str] = None
+            ) -> bool:
+        """ Places a machine, if there is not one at the position already.
+
+        Parameters:
+            kind: One of MACHINE_KINDS.
+            position: The (row, col) of the machine.
+            radius: How far the machine reaches in each direction.
+            species: The name of the species an AUTO_PLANT machine plants.
+
+        Returns:
+            True if the machine was placed, False otherwise.
+        """
+        if kind not in MACHINE_KINDS:
+            raise ValueError(f'Unknown machine kind {kind!r}')
+        if kind == AUTO_PLANT and species is None:
+            raise ValueError('Auto-plant machines need a species')
+        if position in self._machines:
+            return False
+        species_id = self._species.get_id(species) if kind == AUTO_PLANT \
+            else -1
+        self._machines[position] = (kind, max(radius, 0), species_id)
+        self._arrays = None
+        self._version = next(_VERSIONS)
+        return True
+
+    def remove(self, position: tuple[int, int]) -> bool:
+        """ Removes the machine at the given position, if there is one.
+
+        Returns:
+            True if a machine was removed, False otherwise.
+        """
+        if self._machines.pop(position, None) is None:
+            return False
+        self._arrays = None
+        self._version = next(_VERSIONS)
+        return True
+
+    def get_machines(
+            self
+        ) -> dict[tuple[int, int], tuple[str, int, Optional[str]]]:
+        """ Returns the (kind, radius, species name or None) of each machine, by
+            position.
+        """
+        return {
+            position: (kind, radius,
+                       self._species.get_name(species) if species >= 0
+                       else None)
+            for position, (kind, radius, species) in self._machines.items()
+        }
+
+    def get_storage(self) -> dict[str, int]:
+        """ Returns the non-zero amounts of items in the shared storage. """
+        return self._items.to_dict(self._storage)
+
+    def get_storage_array(self) -> np.ndarray:
+        """ Returns the shared storage as an array of amounts by item id. This
+            is the set's own array, which machines and the model update in
+            place.
+        """
+        return self._storage
+
+    def get_plant_species(self) -> list[int]:
+        """ Returns the ids of the species planted by auto-plant machines. """
+        if self._arrays is None:
+            self._build_arrays()
+        return np.unique(self._arrays[AUTO_PLANT][3]).tolist()
+
+    def coverage(self, kind: str, top: int, bottom: int, cols: int,
+                 species: int = -1) -> Optional[np.ndarray]:
+        """ Returns which cells of a band of rows are worked by machines of
+            the given kind.
+
+        Parameters:
+            kind: One of MACHINE_KINDS.
+            top: The first row of the band.
+            bottom: The row after the last row of the band.
+            cols: The number of columns in the map.
+            species: For AUTO_PLANT, the id of the species planted.
+
+        Returns:
+            A boolean array of shape (bottom - top, cols), or None if no such
+            machine reaches the band.
+        """
+        if self._arrays is None:
+            self._build_arrays()
+        rows, columns, radii, species_ids = self._arrays[kind]
+        selected = (rows + radii >= top) & (rows - radii < bottom)
+        if kind == AUTO_PLANT:
+            selected &= species_ids == species
+        if not selected.any():
+            return None
+        rows, columns, radii = rows[selected], columns[selected], \
+            radii[selected]
+
+        height = bottom - top
+        row_start = np.clip(rows - radii - top, 0, height)
+        row_end = np.clip(rows + radii + 1 - top, 0, height)
+        col_start = np.clip(columns - radii, 0, cols)
+        col_end = np.clip(columns + radii + 1, 0, cols)
+        difference = self._get_difference(height + 1, cols + 1)
+        np.add.at(difference, (row_start, col_start), 1)
+        np.add.at(difference, (row_start, col_end), -1)
+        np.add.at(difference, (row_end, col_start), -1)
+        np.add.at(difference, (row_end, col_end), 1)
+        # Summed in place into the number of machines covering each cell
+        np.cumsum(difference, axis=0, out=difference)
+        np.cumsum(difference, axis=1, out=difference)
+        return difference[:height, :cols] > 0
+
+    def _get_difference(self, rows: int, cols: int) -> np.ndarray:
+        """ Returns the set's difference array, cleared, as a view of the
+            given shape, first making it larger if it is too small.
+        """
+        difference = self._difference
+        if difference is None or difference.shape[0] < rows \
+                or difference.shape[1] != cols:
+            difference = self._difference = np.empty(
+                (max(rows, MACHINE_BAND_ROWS + 1), cols), dtype=np.int32)
+        difference = difference[:rows]
+        difference.fill(0)
+        return difference
+
+    def _build_arrays(self) -> None:
+        """ Gathers the machines of each kind into arrays of their rows,
+            columns, radii and species ids.
+        """
+        self._arrays = {}
+        for kind in MACHINE_KINDS:
+            machines = [(row, col, radius, species)
+                        for (row, col), (machine_kind, radius, species)
+                        in self._machines.items() if machine_kind == kind]
+            self._arrays[kind] = tuple(
+                np.array(values, dtype=np.int64)
+                for values in (zip(*machines) if machines else ([],) * 4))
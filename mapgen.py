@@ -0,0 +1,246 @@
+""" Generates large synthetic farm maps for stress tests.
+
+    Maps are produced and written one row at a time, so their size is limited
+    only by disk space. Every tile is a pure function of the seed and its
+    position, so the same arguments always produce the same map.
+
+    Usage:
+        python mapgen.py maps/huge.txt 5000 5000 --layout plots --seed 1
+        python mapgen.py huge.fmap 50000 50000 --layout noise --plants 0.3
+
+    Files ending in BINARY_MAP_EXTENSION are written in the packed binary
+    format read by read_map; anything else is written as text.
+"""
+import argparse
+from typing import Iterator, Optional
+import numpy as np
+from constants import *
+from counter_rng import hash_counters, uniform
+from species import SPECIES_REGISTRY
+
+LAYOUTS = ('noise', 'plots', 'paths')
+
+# Random streams, so that independent choices never share random numbers
+_TILE_STREAM = 0
+_PATH_STREAM = 1
+_PLANT_STREAM = 2
+_SPECIES_STREAM = 3
+_AGE_STREAM = 4
+
+
+class MapGenerator:
+    """ Produces the rows of a synthetic map.
+
+        Layouts:
+            noise: patches of scale x scale tiles, each patch grass, soil or
+                   untilled according to the ratios.
+            plots: plot_size x plot_size plots separated by grass paths of
+                   path_width; each plot is grass, soil or untilled according
+                   to the ratios.
+            paths: noise crossed by straight grass paths of path_width, about
+                   every plot_size rows and columns.
+    """
+
+    def __init__(
+            self,
+            rows: int,
+            cols: int,
+            layout: str = 'plots',
+            ratios: tuple[float, float, float] = (0.2, 0.3, 0.5),
+            seed: int = 0,
+            scale: int = 1,
+            plot_size: int = 8,
+            path_width: int = 1,
+            border: bool = True
+        ) -> None:
+        """ Constructor for the map generator.
+
+        Parameters:
+            rows: The number of rows in the map.
+            cols: The number of columns in the map.
+            layout: One of LAYOUTS.
+            ratios: The relative amounts of grass, soil and untilled soil.
+            seed: The seed for all random choices.
+            scale: The size of noise patches.
+            plot_size: The size of plots, or the spacing of paths.
+            path_width: The width of the grass paths.
+            border: Whether to surround the map with grass.
+        """
+        if layout not in LAYOUTS:
+            raise ValueError(f'Unknown layout {layout!r}')
+        total = sum(ratios)
+        self._rows = rows
+        self._cols = cols
+        self._layout = layout
+        # Thresholds on a uniform number in [0, 1) for grass, then soil
+        self._thresholds = np.cumsum(ratios[:2]) / total
+        self._seed = seed
+        self._scale = max(scale, 1)
+        self._plot_size = max(plot_size, 1)
+        self._path_width = max(path_width, 0)
+        self._border = border
+        self._cols_index = np.arange(cols)
+        self._maturity = np.array([SPECIES_REGISTRY.get_maturity_day(s)
+                                   for s in range(len(SPECIES_REGISTRY))])
+
+    def get_dimensions(self) -> tuple[int, int]:
+        """ Returns the dimensions of the map, as (rows, columns). """
+        return self._rows, self._cols
+
+    def _pick_tiles(self, values: np.ndarray) -> np.ndarray:
+        """ Returns tile codes for uniform values, according to the ratios. """
+        grass_limit, soil_limit = self._thresholds
+        return np.select([values < grass_limit, values < soil_limit],
+                         [TILE_CODES[GRASS], TILE_CODES[SOIL]],
+                         TILE_CODES[UNTILLED]).astype(np.uint8)
+
+    def row_codes(self, row: int) -> np.ndarray:
+        """ Returns the tile codes of the given row. """
+        cols = self._cols_index
+        if self._layout == 'plots':
+            period = self._plot_size + self._path_width
+            values = uniform(self._seed, _TILE_STREAM, row // period,
+                             cols // period)
+            codes = self._pick_tiles(values)
+            codes[cols % period >= self._plot_size] = TILE_CODES[GRASS]
+            if row % period >= self._plot_size:
+                codes[:] = TILE_CODES[GRASS]
+        else:
+            values = uniform(self._seed, _TILE_STREAM, row // self._scale,
+                             cols // self._scale)
+            codes = self._pick_tiles(values)
+            if self._layout == 'paths':
+                codes[self._on_path(1, cols)] = TILE_CODES[GRASS]
+                if self._on_path(0, np.array([row]))[0]:
+                    codes[:] = TILE_CODES[GRASS]
+
+        if self._border:
+            if row in (0, self._rows - 1):
+                codes[:] = TILE_CODES[GRASS]
+            codes[[0, -1]] = TILE_CODES[GRASS]
+        return codes
+
+    def _on_path(self, axis: int, positions: np.ndarray) -> np.ndarray:
+        """ Returns whether each position along an axis (0 for rows, 1 for
+            columns) lies on a path. Each block of plot_size positions holds
+            one path at a random offset.
+        """
+        blocks, offsets = np.divmod(positions, self._plot_size)
+        starts = hash_counters(self._seed, _PATH_STREAM, axis, blocks) \
+            % np.uint64(self._plot_size)
+        return (offsets >= starts) & (offsets < starts + self._path_width)
+
+    def rows(self) -> Iterator[np.ndarray]:
+        """ Yields the tile codes of every row, top to bottom. """
+        for row in range(self._rows):
+            yield self.row_codes(row)
+
+    def row_plants(self, row: int, codes: np.ndarray,
+                   ratio: float) -> Iterator[tuple[int, str, int]]:
+        """ Yields (col, species, days) for the initial plants of a row, placed
+            on a fraction of its soil tiles.
+
+        Parameters:
+            row: The index of the row.
+            codes: The tile codes of the row.
+            ratio: The fraction of soil tiles to plant.
+        """
+        cols = np.flatnonzero(
+            (codes == TILE_CODES[SOIL])
+            & (uniform(self._seed, _PLANT_STREAM, row, self._cols_index)
+               < ratio))
+        if not cols.size:
+            return
+        species = hash_counters(self._seed, _SPECIES_STREAM, row, cols) \
+            % np.uint64(len(SPECIES_REGISTRY))
+        days = hash_counters(self._seed, _AGE_STREAM, row, cols) \
+            % (self._maturity[species] + 1).astype(np.uint64)
+        for col, kind, age in zip(cols.tolist(), species.tolist(),
+                                  days.tolist()):
+            yield col, SPECIES_REGISTRY.get_name(kind), age
+
+
+def pack_row(codes: np.ndarray) -> bytes:
+    """ Returns the tile codes of a row packed 2 bits per tile, as stored in
+        binary map files.
+    """
+    padded = np.zeros((len(codes) + 3) // 4 * 4, dtype=np.uint8)
+    padded[:len(codes)] = codes
+    quads = padded.reshape(-1, 4)
+    return ((quads[:, 0] << 6) | (quads[:, 1] << 4) | (quads[:, 2] << 2)
+            | quads[:, 3]).astype(np.uint8).tobytes()
+
+
+def write_map(generator: MapGenerator, map_file: str,
+              plants_file: Optional[str] = None,
+              plant_ratio: float = 0.0) -> None:
+    """ Writes the generator's map to a file one row at a time, optionally
+        with a matching file of initial plants for FarmModel.
+
+    Parameters:
+        generator: The generator of the map.
+        map_file: The path to write the map to.
+        plants_file: The path to write the plants to, if any.
+        plant_ratio: The fraction of soil tiles to plant.
+    """
+    binary = map_file.endswith(BINARY_MAP_EXTENSION)
+    tile_bytes = np.frombuffer(''.join(TILES_BY_CODE).encode(), dtype=np.uint8)
+    plants = open(plants_file, 'w') if plants_file else None
+    try:
+        with open(map_file, 'wb') as file:
+            if binary:
+                rows, cols = generator.get_dimensions()
+                file.write(BINARY_MAP_MAGIC + rows.to_bytes(4, 'little')
+                           + cols.to_bytes(4, 'little'))
+            for row, codes in enumerate(generator.rows()):
+                if binary:
+                    file.write(pack_row(codes))
+                else:
+                    file.write(tile_bytes[codes].tobytes() + b'\n')
+                if plants is not None:
+                    plants.writelines(
+                        f'{row},{col},{species},{days}\n'
+                        for col, species, days
+                        in generator.row_plants(row, codes, plant_ratio))
+    finally:
+        if plants is not None:
+            plants.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Generate a synthetic farm map.')
+    parser.add_argument('output', help='map file to write (use '
+                        f'{BINARY_MAP_EXTENSION} for the binary format)')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('cols', type=int)
+    parser.add_argument('--layout', choices=LAYOUTS, default='plots')
+    parser.add_argument('--grass', type=float, default=0.2,
+                        help='relative amount of grass')
+    parser.add_argument('--soil', type=float, default=0.3,
+                        help='relative amount of tilled soil')
+    parser.add_argument('--untilled', type=float, default=0.5,
+                        help='relative amount of untilled soil')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scale', type=int, default=1,
+                        help='size of noise patches')
+    parser.add_argument('--plot-size', type=int, default=8,
+                        help='size of plots, or spacing of paths')
+    parser.add_argument('--path-width', type=int, default=1)
+    parser.add_argument('--no-border', action='store_true',
+                        help='do not surround the map with grass')
+    parser.add_argument('--plants', type=float, default=0.0,
+                        help='fraction of soil to plant; plants are written '
+                             'to OUTPUT.plants')
+    args = parser.parse_args()
+
+    generator = MapGenerator(
+        args.rows, args.cols, args.layout,
+        (args.grass, args.soil, args.untilled), args.seed, args.scale,
+        args.plot_size, args.path_width, not args.no_border)
+    plants_file = args.output + '.plants' if args.plants > 0 else None
+    write_map(generator, args.output, plants_file, args.plants)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,388 @@
+import heapq
+from itertools import count
+from typing import Callable, Optional
+from constants import *
+from items import ITEM_REGISTRY, ItemRegistry
+
+
+class Order:
+    """ A single buy or sell order for some quantity of one item.
+
+        Limit orders carry a price and may rest in an order book until they are
+        filled or cancelled. Market orders have a price of None and never rest.
+    """
+    __slots__ = ('order_id', 'owner', 'item_name', 'side', 'price',
+                 'quantity', 'filled', 'active')
+
+    def __init__(self, order_id: int, owner: int, item_name: str,
+                 side: str, price: Optional[int], quantity: int) -> None:
+        """ Constructor for an order.
+
+        Parameters:
+            order_id: Sequence number of the order, used for time priority.
+            owner: The id of the owner who placed the order, as given by
+                   Market.register_owner.
+            item_name: The name of the item being traded.
+            side: One of BUY_SIDE or SELL_SIDE.
+            price: The limit price per unit, or None for a market order.
+            quantity: The number of units to trade.
+        """
+        self.order_id = order_id
+        self.owner = owner
+        self.item_name = item_name
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.filled = 0
+        self.active = True
+
+    def get_remaining(self) -> int:
+        """ Returns the number of units still waiting to be filled. """
+        return self.quantity - self.filled
+
+    def is_active(self) -> bool:
+        """ Returns True iff the order is resting in a book. """
+        return self.active
+
+
+class OrderBook:
+    """ Bids and asks for a single item, kept in heaps ordered by price and
+        then by time of arrival. Cancelled and filled orders are removed
+        lazily when they reach the top of a heap.
+    """
+
+    def __init__(self, item_name: str) -> None:
+        """ Constructor for an empty order book.
+
+        Parameters:
+            item_name: The name of the item traded in this book.
+        """
+        self._item_name = item_name
+        # Entries are (-price, order_id, order) so the highest bid pops first
+        self._bids = []
+        # Entries are (price, order_id, order) so the lowest ask pops first
+        self._asks = []
+
+    def get_item_name(self) -> str:
+        """ Returns the name of the item traded in this book. """
+        return self._item_name
+
+    def add(self, order: Order) -> None:
+        """ Rests the given limit order in the book.
+
+        Parameters:
+            order: The order to add.
+        """
+        if order.side == BUY_SIDE:
+            heapq.heappush(self._bids, (-order.price, order.order_id, order))
+        else:
+            heapq.heappush(self._asks, (order.price, order.order_id, order))
+
+    def best_bid(self) -> Optional[Order]:
+        """ Returns the active bid with the highest price, or None. """
+        bids = self._bids
+        while bids and not bids[0][2].active:
+            heapq.heappop(bids)
+        return bids[0][2] if bids else None
+
+    def best_ask(self) -> Optional[Order]:
+        """ Returns the active ask with the lowest price, or None. """
+        asks = self._asks
+        while asks and not asks[0][2].active:
+            heapq.heappop(asks)
+        return asks[0][2] if asks else None
+
+    def get_orders(self) -> list[Order]:
+        """ Returns the active orders on both sides of the book. """
+        return [order for _, _, order in self._bids + self._asks
+                if order.active]
+
+    def get_depth(self, side: str) -> list[tuple[int, int]]:
+        """ Returns the (price, total quantity) levels on one side of the book,
+            best price first.
+
+        Parameters:
+            side: One of BUY_SIDE or SELL_SIDE.
+        """
+        heap = self._bids if side == BUY_SIDE else self._asks
+        levels = {}
+        for _, _, order in heap:
+            if order.active:
+                levels[order.price] = levels.get(order.price, 0) \
+                    + order.get_remaining()
+        return sorted(levels.items(), reverse=side == BUY_SIDE)
+
+
+class Market:
+    """ A marketplace with one order book per item.
+
+        Orders are matched with price-time priority and settled straight into
+        the players' money and inventories. Money for resting bids and items
+        for resting asks are held in escrow until the order fills or is
+        cancelled. The store acts as a market maker with unlimited stock,
+        selling at BUY_PRICES and buying at SELL_PRICES, so a book is never
+        worse than the fixed store prices.
+
+        Orders are placed by owner id rather than by player, and each owner's
+        player is looked up when an order settles, so that an order resting
+        across an undo or a restore settles with the owner's current player.
+    """
+
+    def __init__(
+            self,
+            buy_prices: dict[str, int] = BUY_PRICES,
+            sell_prices: dict[str, int] = SELL_PRICES,
+            items: ItemRegistry = ITEM_REGISTRY
+        ) -> None:
+        """ Constructor for the market.
+
+        Parameters:
+            buy_prices: Prices at which the market maker sells items.
+            sell_prices: Prices at which the market maker buys items.
+            items: The items that can be traded.
+        """
+        self._maker_asks = buy_prices
+        self._maker_bids = sell_prices
+        self._items = items
+        # The function returning each owner's current player, by owner id
+        self._owners = []
+        self._books = {}
+        self._order_ids = count()
+        self._trade_count = 0
+        self._last_prices = {}
+
+    def register_owner(self, get_player: Callable[[], 'Player']) -> int:
+        """ Returns a new owner id to place orders with.
+
+        Parameters:
+            get_player: Returns the owner's current player, who pays for and
+                        receives whatever the owner's orders trade.
+        """
+        self._owners.append(get_player)
+        return len(self._owners) - 1
+
+    def get_book(self, item_name: str) -> OrderBook:
+        """ Returns the order book for the given item, creating it if needed.
+
+        Parameters:
+            item_name: The name of the item.
+        """
+        book = self._books.get(item_name)
+        if book is None:
+            book = self._books[item_name] = OrderBook(item_name)
+        return book
+
+    def get_trade_count(self) -> int:
+        """ Returns the number of fills executed by this market. """
+        return self._trade_count
+
+    def get_last_price(self, item_name: str) -> Optional[int]:
+        """ Returns the price of the most recent fill of the given item, or None
+            if it has never traded.
+        """
+        return self._last_prices.get(item_name)
+
+    def place_limit_order(self, owner: int, item_name: str, side: str,
+                          price: int, quantity: int) -> Optional[Order]:
+        """ Places a limit order, matching it against the book and the market
+            maker and resting any unfilled remainder.
+
+        Parameters:
+            owner: The id of the owner placing the order.
+            item_name: The name of the item to trade.
+            side: One of BUY_SIDE or SELL_SIDE.
+            price: The worst acceptable price per unit.
+            quantity: The number of units to trade.
+
+        Returns:
+            The order, or None if the owner cannot cover it (not enough money
+            for a bid or not enough items for an ask).
+
+        Raises:
+            ValueError: If the item is not one that can be traded.
+        """
+        self._check_item(item_name)
+        if quantity <= 0 or price < 0:
+            return None
+        player = self._owners[owner]()
+        if side == BUY_SIDE:
+            if player.get_money() < price * quantity:
+                return None
+            player.reduce_money(price * quantity)
+        else:
+            if player.get_item_count(item_name) < quantity:
+                return None
+            player.remove_item((item_name, quantity))
+
+        order = Order(next(self._order_ids), owner, item_name, side, price,
+                      quantity)
+        book = self.get_book(item_name)
+        if side == BUY_SIDE:
+            self._match_buy(book, order)
+        else:
+            self._match_sell(book, order)
+        if order.filled < order.quantity:
+            book.add(order)
+        else:
+            order.active = False
+        return order
+
+    def place_market_order(self, owner: int, item_name: str, side: str,
+                           quantity: int) -> Order:
+        """ Places a market order, filling as much as possible at the best
+            available prices. Any remainder that cannot be filled (because the
+            book is empty or the owner runs out of money or items) is dropped.
+
+        Parameters:
+            owner: The id of the owner placing the order.
+            item_name: The name of the item to trade.
+            side: One of BUY_SIDE or SELL_SIDE.
+            quantity: The number of units to trade.
+
+        Returns:
+            The order, with its filled quantity set.
+
+        Raises:
+            ValueError: If the item is not one that can be traded.
+        """
+        self._check_item(item_name)
+        order = Order(next(self._order_ids), owner, item_name, side, None,
+                      max(quantity, 0))
+        order.active = False
+        book = self.get_book(item_name)
+        if side == BUY_SIDE:
+            self._match_buy(book, order)
+        else:
+            player = self._owners[owner]()
+            order.quantity = min(order.quantity,
+                                 player.get_item_count(item_name))
+            if order.quantity > 0:
+                player.remove_item((item_name, order.quantity))
+                self._match_sell(book, order)
+                unfilled = order.quantity - order.filled
+                if unfilled > 0:
+                    player.add_item((item_name, unfilled))
+        return order
+
+    def cancel_order(self, order: Order) -> bool:
+        """ Cancels a resting order and returns its escrow to the owner.
+
+        Parameters:
+            order: The order to cancel.
+
+        Returns:
+            True if the order was resting and is now cancelled, False otherwise.
+        """
+        if not order.active:
+            return False
+        order.active = False
+        remaining = order.quantity - order.filled
+        player = self._owners[order.owner]()
+        if order.side == BUY_SIDE:
+            player.add_money(order.price * remaining)
+        else:
+            player.add_item((order.item_name, remaining))
+        return True
+
+    def cancel_all(self) -> int:
+        """ Cancels every resting order, returning the escrow of each to its
+            owner.
+
+        Returns:
+            The number of orders cancelled.
+        """
+        return sum(self.cancel_order(order) for book in self._books.values()
+                   for order in book.get_orders())
+
+    def _check_item(self, item_name: str) -> None:
+        """ Raises ValueError if the item cannot be traded. """
+        if self._items.find_id(item_name) is None:
+            raise ValueError(f'Unknown item {item_name!r}')
+
+    def _match_buy(self, book: OrderBook, order: Order) -> None:
+        """ Fills an incoming buy order against resting asks and the market
+            maker, cheapest first. Resting asks win ties with the maker.
+        """
+        owners = self._owners
+        buyer = owners[order.owner]()
+        item_name = order.item_name
+        limit = order.price
+        maker_price = self._maker_asks.get(item_name)
+        remaining = order.quantity - order.filled
+        while remaining > 0:
+            ask = book.best_ask()
+            if ask is not None and (maker_price is None
+                                    or ask.price <= maker_price):
+                price = ask.price
+            elif maker_price is not None:
+                ask = None
+                price = maker_price
+            else:
+                break
+            if limit is not None and price > limit:
+                break
+
+            if ask is not None:
+                fill = min(remaining, ask.quantity - ask.filled)
+            else:
+                fill = remaining
+            if limit is None:
+                # Market orders are paid for as they fill
+                if price > 0:
+                    fill = min(fill, buyer.get_money() // price)
+                if fill <= 0:
+                    break
+                buyer.reduce_money(price * fill)
+            elif price < limit:
+                # Refund the escrowed difference for price improvement
+                buyer.add_money((limit - price) * fill)
+
+            buyer.add_item((item_name, fill))
+            if ask is not None:
+                owners[ask.owner]().add_money(price * fill)
+                ask.filled += fill
+                if ask.filled == ask.quantity:
+                    ask.active = False
+            order.filled += fill
+            remaining -= fill
+            self._trade_count += 1
+            self._last_prices[item_name] = price
+
+    def _match_sell(self, book: OrderBook, order: Order) -> None:
+        """ Fills an incoming sell order against resting bids and the market
+            maker, highest first. Resting bids win ties with the maker. The
+            order's items must already be held in escrow.
+        """
+        owners = self._owners
+        seller = owners[order.owner]()
+        item_name = order.item_name
+        limit = order.price
+        maker_price = self._maker_bids.get(item_name)
+        remaining = order.quantity - order.filled
+        while remaining > 0:
+            bid = book.best_bid()
+            if bid is not None and (maker_price is None
+                                    or bid.price >= maker_price):
+                price = bid.price
+            elif maker_price is not None:
+                bid = None
+                price = maker_price
+            else:
+                break
+            if limit is not None and price < limit:
+                break
+
+            if bid is not None:
+                fill = min(remaining, bid.quantity - bid.filled)
+                # The bid's money is already escrowed at its own price
+                owners[bid.owner]().add_item((item_name, fill))
+                bid.filled += fill
+                if bid.filled == bid.quantity:
+                    bid.active = False
+            else:
+                fill = remaining
+            seller.add_money(price * fill)
+            order.filled += fill
+            remaining -= fill
+            self._trade_count += 1
+            self._last_prices[item_name] = price
@@ -0,0 +1,204 @@
+from typing import Iterable, Iterator, Mapping, Optional, Sequence
+import numpy as np
+from constants import *
+from cow import CowRows
+
+# Translation tables turning a map row into a string of bits, one per tile
+_IS_UNTILLED = str.maketrans({GRASS: '0', SOIL: '0', UNTILLED: '1'})
+_IS_SOIL = str.maketrans({GRASS: '0', SOIL: '1', UNTILLED: '0'})
+
+
+def _row_bits(row: str, table: dict) -> int:
+    """ Returns an int with bit c set iff tile c of the row is selected by the
+        translation table.
+    """
+    return int(row.translate(table)[::-1] or '0', 2)
+
+
+def soil_bits(row: str) -> int:
+    """ Returns an int with bit c set iff tile c of the map row is tilled soil.
+    """
+    return _row_bits(row, _IS_SOIL)
+
+
+def bits_from_array(cells: np.ndarray) -> int:
+    """ Returns an int with bit c set iff cells[c] is true. """
+    return int.from_bytes(np.packbits(cells, bitorder='little').tobytes(),
+                          'little')
+
+
+def bits_from_rows(cells: np.ndarray) -> list[int]:
+    """ Returns bits_from_array of each row of a 2D array. """
+    packed = np.packbits(cells, axis=1, bitorder='little')
+    data, width = packed.tobytes(), packed.shape[1]
+    return [int.from_bytes(data[start:start + width], 'little')
+            for start in range(0, len(data), width)]
+
+
+def bits_to_columns(bits: int) -> np.ndarray:
+    """ Returns the indices of the set bits of a non-negative int, in
+        ascending order.
+    """
+    packed = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8,
+                                         'little'), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(packed, bitorder='little'))
+
+
+class ActionMasks:
+    """ Which cells of a farm each tile action could currently succeed on,
+        kept up to date as the farm changes instead of being re-derived by
+        scanning the map and plants.
+
+        Each mask is stored as one int per row with bit c set for column c, in
+        copy-on-write rows so that masks fork along with the model:
+            tillable: untilled soil.
+            empty soil: tilled soil with no plant (where soil can be untilled
+                        or a seed planted).
+            harvestable: plants that are ready for harvest.
+            planted: cells with a plant.
+    """
+    TILLABLE = 'tillable'
+    EMPTY_SOIL = 'empty soil'
+    HARVESTABLE = 'harvestable'
+    PLANTED = 'planted'
+    _ACTION_MASKS = {
+        TILL_ACTION: TILLABLE,
+        UNTILL_ACTION: EMPTY_SOIL,
+        PLANT_ACTION: EMPTY_SOIL,
+        HARVEST_ACTION: HARVESTABLE,
+    }
+
+    def __init__(self, rows: Sequence[str],
+                 plants: Mapping[tuple[int, int], 'Plant']) -> None:
+        """ Constructor for the masks.
+
+        Parameters:
+            rows: The rows of the farm's map.
+            plants: The plants on the farm, by position.
+        """
+        empty_soil = [_row_bits(row, _IS_SOIL) for row in rows]
+        harvestable = [0] * len(rows)
+        planted = [0] * len(rows)
+        for (row, col), plant in plants.items():
+            empty_soil[row] &= ~(1 << col)
+            planted[row] |= 1 << col
+            if plant.can_harvest():
+                harvestable[row] |= 1 << col
+        self._masks = {
+            self.TILLABLE: CowRows([_row_bits(row, _IS_UNTILLED)
+                                    for row in rows]),
+            self.EMPTY_SOIL: CowRows(empty_soil),
+            self.HARVESTABLE: CowRows(harvestable),
+            self.PLANTED: CowRows(planted),
+        }
+
+    def fork(self) -> 'ActionMasks':
+        """ Returns a copy of the masks that shares their unchanged rows. """
+        other = object.__new__(ActionMasks)
+        other._masks = {name: mask.fork() for name, mask in self._masks.items()}
+        return other
+
+    def get_row(self, name: str, row: int) -> int:
+        """ Returns the bits of one row of the named mask.
+
+        Parameters:
+            name: One of TILLABLE, EMPTY_SOIL, HARVESTABLE or PLANTED.
+            row: The index of the row.
+        """
+        return self._masks[name][row]
+
+    def set_bits(self, name: str, row: int, bits: int, value: bool) -> None:
+        """ Sets or clears the given bits of one row of the named mask,
+            writing the row only if it changes, so that unchanged rows stay
+            shared with forks.
+        """
+        mask = self._masks[name]
+        old_bits = mask[row]
+        new_bits = old_bits | bits if value else old_bits & ~bits
+        if new_bits != old_bits:
+            mask[row] = new_bits
+
+    def update_cell(self, position: tuple[int, int], tile: str,
+                    plant: Optional['Plant']) -> None:
+        """ Updates every mask for one cell after its tile or plant changed.
+
+        Parameters:
+            position: The (row, col) of the cell.
+            tile: The cell's tile.
+            plant: The plant in the cell, or None.
+        """
+        row, col = position
+        bit = 1 << col
+        self.set_bits(self.TILLABLE, row, bit, tile == UNTILLED)
+        self.set_bits(self.EMPTY_SOIL, row, bit,
+                      tile == SOIL and plant is None)
+        self.set_bits(self.HARVESTABLE, row, bit,
+                      plant is not None and plant.can_harvest())
+        self.set_bits(self.PLANTED, row, bit, plant is not None)
+
+    def update_harvestable(
+            self,
+            plants: Mapping[tuple[int, int], 'Plant'],
+            positions: Iterable[tuple[int, int]]
+        ) -> None:
+        """ Updates the harvestable mask for the plants at the given
+            positions, e.g. those that became ready to harvest as they aged.
+
+        Parameters:
+            plants: The plants on the farm, by position.
+            positions: The positions of the plants to update.
+        """
+        ready, not_ready = {}, {}
+        for position in positions:
+            row, col = position
+            bits = ready if plants[position].can_harvest() else not_ready
+            bits[row] = bits.get(row, 0) | (1 << col)
+        for value, rows in ((True, ready), (False, not_ready)):
+            for row, bits in rows.items():
+                self.set_bits(self.HARVESTABLE, row, bits, value)
+
+    def _region_bits(
+            self,
+            action: str,
+            region: Optional[tuple[int, int, int, int]]
+        ) -> Iterator[tuple[int, int, int]]:
+        """ Yields (row, first column, bits) for each row of the region, with
+            bit i of bits standing for column first column + i.
+        """
+        mask = self._masks[self._ACTION_MASKS[action]]
+        if region is None:
+            region = (0, 0, len(mask), None)
+        top, left, bottom, right = region
+        bottom = min(bottom, len(mask))
+        # Regions may reach past the edges, e.g. a view around the player
+        left = max(left, 0)
+        width_mask = -1 if right is None else (1 << max(right - left, 0)) - 1
+        for row in range(max(top, 0), bottom):
+            bits = (mask[row] >> left) & width_mask
+            if bits:
+                yield row, left, bits
+
+    def count(self, action: str,
+              region: Optional[tuple[int, int, int, int]] = None) -> int:
+        """ Returns the number of cells where the action is possible.
+
+        Parameters:
+            action: One of TILL_ACTION, UNTILL_ACTION, PLANT_ACTION or
+                    HARVEST_ACTION.
+            region: (top, left, bottom, right) with exclusive bottom and
+                    right, or None for the whole farm.
+        """
+        return sum(bits.bit_count()
+                   for _, _, bits in self._region_bits(action, region))
+
+    def cells(self, action: str,
+              region: Optional[tuple[int, int, int, int]] = None
+              ) -> list[tuple[int, int]]:
+        """ Returns the (row, col) of every cell where the action is possible,
+            in row-major order. Parameters are as for count.
+        """
+        cells = []
+        for row, left, bits in self._region_bits(action, region):
+            cells.extend((row, left + col)
+                         for col in bits_to_columns(bits).tolist())
+        return cells
@@ -1,85 +1,136 @@
-from typing import Optional
+import time
+from collections import Counter
+from itertools import chain
+from operator import attrgetter
+import numpy as np
+from typing import Iterable, Optional
 from constants import *
 from a3_support import *
+from market import Market
+from items import ITEM_REGISTRY, ItemRegistry
+from species import SPECIES_REGISTRY, SpeciesRegistry
+from cow import CowPlantMap
+from tiles import TileRows, make_tile_rows
+from masks import ActionMasks, bits_from_rows, bits_to_columns
+from machines import MachineSet
+from telemetry import Telemetry
+from weather import Weather
+from state_diff import StateDelta, diff_states
 
 class Plant:
-    """ Abstract plant class, which implements default behaviour and specifies
-        required functions for all plant subclasses.
+    """ A plant of one of the species in a SpeciesRegistry. All behaviour is
+        driven by the registry's lookup tables, so plants of every species
+        share the same code.
     """
-    _NAME = 'abstract plant'
+    __slots__ = ('_registry', '_species', '_stage', '_days',
+                 '_days_since_harvest')
+    _NAME = None
+
+    def __init__(
+            self,
+            species: str = None,
+            registry: SpeciesRegistry = SPECIES_REGISTRY
+        ) -> None:
+        """ Constructor for a newly planted plant.
+
+        Parameters:
+            species: The name of the plant's species. Defaults to the species
+                     named by the class, for the species-specific subclasses.
+            registry: The registry in which the species is defined.
+        """
+        self._registry = registry
+        self._species = registry.get_id(species or self._NAME)
+        self._stage = registry.get_initial_stage(self._species)
+        self._days = 0
+        self._days_since_harvest = 0
+
+    def copy(self) -> 'Plant':
+        """ Returns a new plant of the same species in the same state. """
+        other = object.__new__(type(self))
+        other._registry = self._registry
+        other._species = self._species
+        other._stage = self._stage
+        other._days = self._days
+        other._days_since_harvest = self._days_since_harvest
+        return other
+
+    def get_state(self) -> tuple[int, int, int, int]:
+        """ Returns everything that determines the plant's behaviour, as
+            (species id, stage, days, days since harvest).
+        """
+        return (self._species, self._stage, self._days,
+                self._days_since_harvest)
+
+    @classmethod
+    def from_state(
+            cls,
+            state: tuple[int, int, int, int],
+            registry: SpeciesRegistry = SPECIES_REGISTRY
+        ) -> 'Plant':
+        """ Returns a plant in the given state, as returned by get_state. """
+        plant = object.__new__(cls)
+        plant._registry = registry
+        (plant._species, plant._stage, plant._days,
+         plant._days_since_harvest) = state
+        return plant
 
-    def __init__(self):
-        """ Constructor for this type of plant. """
-        self._stage = 1
-    
     def get_name(self) -> str:
         """ Returns the name of the plant. """
-        return self._NAME
-    
+        return self._registry.get_name(self._species)
+
+    def get_species_id(self) -> int:
+        """ Returns the id of the plant's species in its registry. """
+        return self._species
+
     def get_stage(self) -> int:
         """ Returns the current stage of the plant. """
         return self._stage
     
     def can_harvest(self) -> bool:
         """ Returns True iff the plant is ready to be harvested. """
-        return self._stage >= 3
+        return self._stage == self._registry.get_harvest_stage(self._species)
     
     def remove_on_harvest(self) -> bool:
         """ Returns True iff the plant should be removed from the grid after
             being harvested. """
-        return True
+        return self._registry.get_regrow_stage(self._species) == 0
 
     def age(self) -> None:
         """ Ages the plant by one day, and makes any necessary changes to the
             plants stage.
         """
-        raise NotImplementedError('Plant subclasses must implement age()')
+        age_plants((self,))
     
-    def harvest(self) -> Optional[tuple[str, int]]:
+    def harvest(self) -> Optional[tuple[int, int]]:
         """ Harvests the plant iff it is ready to be harvested. Otherwise, does
             nothing.
         
             Returns:
-                The name and quantity of the harvested item, or None if the
+                The item id and quantity of the harvested item, or None if the
                 harvest is unsuccessful.
         """
-        raise NotImplementedError('Plant subclasses must implement harvest()')
+        if not self.can_harvest():
+            return None
+        regrow_stage = self._registry.get_regrow_stage(self._species)
+        if regrow_stage:
+            self._stage = regrow_stage
+            self._days_since_harvest = 0
+        return (self._registry.get_product_id(self._species),
+                self._registry.get_yield(self._species))
 
 
 class PotatoPlant(Plant):
     """ Potato plant has 5 stages, with stages 0-4 lasting one day each. At \
         stage 5 it is ready for harvest.
     """
+    __slots__ = ()
     _NAME = 'potato'
 
-    def age(self) -> None:
-        self._stage = min(self._stage + 1, 5)
-    
-    def can_harvest(self) -> bool:
-        return self._stage == 5
-    
-    def harvest(self) -> Optional[tuple[str, int]]:
-        if self.can_harvest():
-            return ('Potato', 1)
-
 
 class KalePlant(Plant):
     """ Kale plant has 5 stages, with stage 5 being harvest. """
+    __slots__ = ()
     _NAME = 'kale'
-    def __init__(self) -> None:
-        super().__init__()
-        self._days = 0
-
-    def age(self) -> None:
-        self._days += 1
-        self._stage = 5 if self._days >= 6 else (self._days + 1) // 2 + 1
-
-    def can_harvest(self) -> bool:
-        return self._stage == 5
-    
-    def harvest(self) -> Optional[tuple[str, int]]:
-        if self.can_harvest():
-            return ('Kale', 1)
 
 
 class BerryPlant(Plant):
@@ -87,41 +138,297 @@ class BerryPlant(Plant):
         the berry tree returns to stage 5 and regrows to stage 6 every 4
         days.
     """
+    __slots__ = ()
     _NAME = 'berry'
-    _DAYS_TO_STAGE = [1, 2, 2, 2, 3, 3, 3, 4, 4, 4, 4, 5, 5, 6]
 
-    def __init__(self) -> None:
-        super().__init__()
-        self._days = 0
-        self._days_since_harvest = 0
 
-    def age(self) -> None:
-        self._days += 1
+def age_plants(plants: Iterable[Plant]) -> list[int]:
+    """ Ages each of the given plants by one day.
 
-        # Before first harvest, use the _DAYS_TO_STAGE mapping
-        if self._days <= 13:
-            self._stage = self._DAYS_TO_STAGE[self._days]
-            return
+        Before maturity a plant's stage is read from its species' schedule.
+        After maturity, plants that regrow return to the harvest stage once
+        enough days have passed since they were last harvested.
 
-        # After plant has matured, it can be harvested after 4 days have elapsed
-        # since the last harvest
-        self._days_since_harvest += 1
-        if self._days_since_harvest >= 4 or self._stage == 6:
-            self._stage = 6
+    Parameters:
+        plants: The plants to age. They may be of any species, but must all
+                share one registry.
+
+    Returns:
+        The indices, in the order given, of the plants that became ready or
+        stopped being ready to harvest.
+    """
+    tables = None
+    changed = []
+    for index, plant in enumerate(plants):
+        if tables is None:
+            (stage_table, schedule_start, maturity_day, harvest_stage, _,
+             regrow_days) = tables = plant._registry.get_tables()
+        species = plant._species
+        days = plant._days + 1
+        plant._days = days
+        if days <= maturity_day[species]:
+            stage = stage_table[schedule_start[species] + days]
         else:
-            self._stage = 5
-        
-    def remove_on_harvest(self) -> bool:
-        return False
-    
-    def can_harvest(self) -> bool:
-        return self._stage == 6
-    
-    def harvest(self) -> Optional[tuple[str, int]]:
-        if self.can_harvest():
-            self._stage = 5
-            self._days_since_harvest = 0
-            return ('Berry', 3)
+            since_harvest = plant._days_since_harvest + 1
+            plant._days_since_harvest = since_harvest
+            if since_harvest < regrow_days[species]:
+                continue
+            stage = harvest_stage[species]
+        ready = harvest_stage[species]
+        if (stage == ready) != (plant._stage == ready):
+            changed.append(index)
+        plant._stage = stage
+    return changed
+
+
+def advance_plants(plants: Iterable[Plant], days: int) -> list[int]:
+    """ Ages each of the given plants by the given number of days at once,
+        with the same result as calling age_plants that many times.
+
+    Parameters:
+        plants: The plants to age. They may be of any species, but must all
+                share one registry.
+        days: The number of days to age them by.
+
+    Returns:
+        The indices, in the order given, of the plants that became ready or
+        stopped being ready to harvest.
+    """
+    if days <= 0:
+        return []
+    tables = None
+    changed = []
+    for index, plant in enumerate(plants):
+        if tables is None:
+            (stage_table, schedule_start, maturity_day, harvest_stage, _,
+             regrow_days) = tables = plant._registry.get_tables()
+        species = plant._species
+        maturity = maturity_day[species]
+        old_days = plant._days
+        old_stage = stage = plant._stage
+        new_days = old_days + days
+        plant._days = new_days
+        if new_days <= maturity:
+            stage = stage_table[schedule_start[species] + new_days]
+        else:
+            # Days spent growing leave the plant at its stage on maturity,
+            # and the rest count towards regrowing
+            if old_days < maturity:
+                stage = stage_table[schedule_start[species] + maturity]
+                since_harvest = plant._days_since_harvest + new_days \
+                    - maturity
+            else:
+                since_harvest = plant._days_since_harvest + days
+            plant._days_since_harvest = since_harvest
+            if since_harvest >= regrow_days[species]:
+                stage = harvest_stage[species]
+        plant._stage = stage
+        ready = harvest_stage[species]
+        if (stage == ready) != (old_stage == ready):
+            changed.append(index)
+    return changed
+
+
+def harvest_plants(plants: Iterable[Plant]) -> tuple[list[int], list[int]]:
+    """ Harvests each of the given plants at once, with the same result as
+        calling Plant.harvest on each of them.
+
+    Parameters:
+        plants: The plants to harvest, which must all be ready for harvest.
+                They may be of any species, but must all share one registry.
+
+    Returns:
+        The number of plants of each species harvested, by species id, and
+        the indices, in the order given, of the plants removed on harvest.
+    """
+    harvested = []
+    removed = []
+    for index, plant in enumerate(plants):
+        if not harvested:
+            regrow_stage = plant._registry.get_tables()[4]
+            harvested = [0] * len(regrow_stage)
+        species = plant._species
+        harvested[species] += 1
+        stage = regrow_stage[species]
+        if stage:
+            plant._stage = stage
+            plant._days_since_harvest = 0
+        else:
+            removed.append(index)
+    return harvested, removed
+
+
+# Plant.get_state, without a Python call per plant, for counting plants
+_PLANT_STATE = attrgetter('_species', '_stage', '_days', '_days_since_harvest')
+
+
+class PlantCensus:
+    """ The number of plants on a farm in each distinct state, where two
+        plants are in the same state if they will behave the same from now on.
+
+        Past maturity, only whether a plant has matured matters, not how long
+        ago, and days since harvest only matter up to the species' regrow
+        days. States are counted with those parts capped, so there are only a
+        few hundred possible states however old the farm is. Aging every plant
+        moves whole counts from state to state.
+    """
+
+    def __init__(self, registry: SpeciesRegistry = SPECIES_REGISTRY) -> None:
+        """ Constructor for an empty census.
+
+        Parameters:
+            registry: The registry of the species counted.
+        """
+        self._registry = registry
+        self._counts = Counter()
+
+    def copy(self) -> 'PlantCensus':
+        """ Returns an independent copy of the census. """
+        other = object.__new__(PlantCensus)
+        other._registry = self._registry
+        other._counts = self._counts.copy()
+        return other
+
+    def __len__(self) -> int:
+        """ Returns the number of plants counted. """
+        return self._counts.total()
+
+    def get_counts(self) -> dict[tuple[int, int, int, int], int]:
+        """ Returns the number of plants in each state, as from
+            Plant.get_state with days and days since harvest capped.
+        """
+        return dict(self._counts)
+
+    def get_items(self) -> Iterable[tuple[tuple[int, int, int, int], int]]:
+        """ Returns (state, count) for each state counted, as in
+            get_counts, without copying them. The census must not change
+            while they are iterated.
+        """
+        return self._counts.items()
+
+    def _key(self, plant: Plant) -> tuple[int, int, int, int]:
+        """ Returns the capped state of a plant. """
+        return self._cap(plant.get_state())
+
+    def _cap(self, state: tuple[int, int, int, int]
+             ) -> tuple[int, int, int, int]:
+        """ Returns a state with the parts that no longer matter capped. """
+        species, stage, days, since_harvest = state
+        (_, _, maturity_day, _, _,
+         regrow_days) = self._registry.get_tables()
+        return (species, stage, min(days, maturity_day[species] + 1),
+                min(since_harvest, regrow_days[species]))
+
+    def count(self, plants: Iterable[Plant]) -> Counter:
+        """ Returns the number of the given plants in each capped state,
+            without adding them to the census.
+        """
+        counts = Counter()
+        for state, count in Counter(map(_PLANT_STATE, plants)).items():
+            counts[self._cap(state)] += count
+        return counts
+
+    def advanced(self, counts: Counter, days: int) -> Counter:
+        """ Returns the given counts of capped states after that many days of
+            aging.
+        """
+        if days <= 0:
+            return Counter(counts)
+        advanced = Counter()
+        for state, count in counts.items():
+            plant = Plant.from_state(state, self._registry)
+            advance_plants((plant,), days)
+            advanced[self._key(plant)] += count
+        return advanced
+
+    def replace(self, old: Counter, new: Counter) -> None:
+        """ Moves plants in the census from the old counts of capped states to
+            the new ones, e.g. after some plants aged differently.
+        """
+        counts = self._counts
+        counts.subtract(old)
+        counts.update(new)
+        for state in [state for state in old if counts[state] <= 0]:
+            del counts[state]
+
+    def add(self, plant: Plant) -> None:
+        """ Counts a plant in its current state. """
+        self._counts[self._key(plant)] += 1
+
+    def discard(self, plant: Plant) -> None:
+        """ Stops counting a plant in its current state. """
+        key = self._key(plant)
+        count = self._counts[key] - 1
+        if count > 0:
+            self._counts[key] = count
+        else:
+            del self._counts[key]
+
+    def add_all(self, plants: Iterable[Plant]) -> None:
+        """ Counts each of the given plants in its current state. """
+        self.replace(Counter(), self.count(plants))
+
+    def discard_all(self, plants: Iterable[Plant]) -> None:
+        """ Stops counting each of the given plants in its current state. """
+        self.replace(self.count(plants), Counter())
+
+    def advance(self, days: int) -> None:
+        """ Ages every plant counted by the given number of days. """
+        if days > 0:
+            self._counts = self.advanced(self._counts, days)
+
+    def forecast(
+            self,
+            days: int,
+            prices: dict[str, int] = SELL_PRICES
+        ) -> tuple[dict[str, np.ndarray], np.ndarray]:
+        """ Returns how much would be harvested and earned on each of the
+            coming days if every plant were harvested as soon as it is ready.
+
+            Each state is followed only until its harvests repeat, which
+            happens once a regrowing plant has matured and been harvested;
+            every later harvest is then a fixed number of days apart.
+
+        Parameters:
+            days: The number of days to forecast. Day 0 is today, before the
+                  next new day, and day d follows d more new days.
+            prices: The price each product sells for.
+
+        Returns:
+            The amount of each product harvested on each day, by product
+            name, and the money those harvests would sell for on each day.
+        """
+        days = max(days, 0)
+        registry = self._registry
+        (_, _, maturity_day, _, _, regrow_days) = registry.get_tables()
+        harvests = {}
+        for state, count in self._counts.items():
+            species = state[0]
+            product = registry.get_product(species)
+            amounts = harvests.get(product)
+            if amounts is None:
+                amounts = harvests[product] = np.zeros(days, dtype=np.int64)
+            amount = registry.get_yield(species) * count
+            plant = Plant.from_state(state, registry)
+            for day in range(days):
+                if day:
+                    age_plants((plant,))
+                if not plant.can_harvest():
+                    continue
+                plant.harvest()
+                amounts[day] += amount
+                if plant.remove_on_harvest():
+                    break
+                if plant.get_state()[2] > maturity_day[species]:
+                    # The plant now regrows at a fixed rate
+                    period = max(regrow_days[species], 1)
+                    amounts[day + period::period] += amount
+                    break
+
+        income = np.zeros(days, dtype=np.int64)
+        for product, amounts in harvests.items():
+            income += amounts * prices.get(product, 0)
+        return harvests, income
 
 
 class Player:
@@ -129,18 +436,31 @@ class Player:
 
     START_ENERGY = 100
 
-    def __init__(self) -> None:
-        """ Constructor for the player. """
+    def __init__(self, registry: ItemRegistry = ITEM_REGISTRY) -> None:
+        """ Constructor for the player.
+
+        Parameters:
+            registry: The registry assigning ids to the items the player holds.
+        """
         self._energy = self.START_ENERGY
         self._money = 0
-        self._inventory = {
+        self._registry = registry
+        # Amount of each item held, indexed by item id
+        self._inventory = registry.make_inventory({
             'Potato Seed': 5,
             'Kale Seed': 5,
-        }
+        })
         self._position = (0, 0)
         self._direction = DOWN
         self._selected_item = None
     
+    def copy(self) -> 'Player':
+        """ Returns a new player with the same state as this one. """
+        other = object.__new__(Player)
+        other.__dict__.update(self.__dict__)
+        other._inventory = self._inventory.copy()
+        return other
+
     def get_energy(self) -> int:
         """ Returns the player's current energy. """
         return self._energy
@@ -150,16 +470,36 @@ class Player:
         return self._money
     
     def get_inventory(self) -> dict[str, int]:
-        """ Returns the player's current inventory, mapping item names to
-            amounts.
+        """ Returns the player's current inventory, mapping the names of the
+            items the player has to amounts.
+        """
+        return self._registry.to_dict(self._inventory)
+
+    def get_inventory_array(self) -> np.ndarray:
+        """ Returns the player's inventory as an array of amounts indexed by
+            item id. The array is the player's own and may be modified.
         """
         return self._inventory
-    
+
+    def get_registry(self) -> ItemRegistry:
+        """ Returns the registry assigning ids to the player's items. """
+        return self._registry
+
+    def get_item_count(self, item_name: str) -> int:
+        """ Returns how many of the given item the player has. """
+        item_id = self._registry.find_id(item_name)
+        return 0 if item_id is None else int(self._inventory[item_id])
+
     def select_item(self, item_name: str) -> None:
         """ Selects the item with the given name, if it's in the inventory. """
-        if item_name in self._inventory.keys():
+        if self.get_item_count(item_name) > 0:
             self._selected_item = item_name
     
+    def set_selected_item(self, item_name: Optional[str]) -> None:
+        """ Sets the selected item, whether or not the player has any of it.
+        """
+        self._selected_item = item_name
+
     def get_selected_item(self) -> Optional[str]:
         """ Returns the name of the currently selected item, or None if no item
             is selected.
@@ -183,6 +523,23 @@ class Player:
         """
         self._energy -= amount
 
+    def add_money(self, amount: int) -> None:
+        """ Adds the given amount to the player's money.
+
+        Parameters:
+            amount: The amount of money to add.
+        """
+        self._money += amount
+
+    def reduce_money(self, amount: int) -> None:
+        """ Reduces the player's money by the given amount. Note that this
+            method will not ensure the player's money remains non-negative.
+
+        Parameters:
+            amount: The amount to reduce the player's money by.
+        """
+        self._money -= amount
+
     def sell(self, item_name: str, price: int) -> None:
         """ Sells one instance of the given item for the given price, if the
             player has some of the item available.
@@ -191,8 +548,7 @@ class Player:
             item_name: The name of the item to sell.
             price: The price to sell the item for.
         """
-        amount = self._inventory.get(item_name, 0)
-        if amount > 0:
+        if self.get_item_count(item_name) > 0:
             self._money += price
             self.remove_item((item_name, 1))
 
@@ -208,6 +564,55 @@ class Player:
             self._money -= price
             self.add_item((item_name, 1))
 
+    def buy_many(self, basket: np.ndarray, prices: np.ndarray = None) -> bool:
+        """ Buys a whole basket of items in one transaction, if every item in
+            it can be bought and the player can afford all of it.
+
+        Parameters:
+            basket: The amount of each item to buy, indexed by item id.
+            prices: The price of each item, indexed by item id. Defaults to the
+                    store's buy prices, in which case items that cannot be
+                    bought at the store make the purchase fail.
+
+        Returns:
+            True if the basket was bought, False otherwise.
+        """
+        if prices is None:
+            if np.any(basket[~self._registry.get_buyable()]):
+                return False
+            prices = self._registry.get_buy_prices()
+        if np.any(basket < 0):
+            return False
+        cost = int(basket @ prices)
+        if self._money < cost:
+            return False
+        self._money -= cost
+        self._inventory += basket
+        return True
+
+    def sell_many(self, basket: np.ndarray, prices: np.ndarray = None) -> bool:
+        """ Sells a whole basket of items in one transaction, if every item in
+            it can be sold and the player has all of it.
+
+        Parameters:
+            basket: The amount of each item to sell, indexed by item id.
+            prices: The price of each item, indexed by item id. Defaults to the
+                    store's sell prices, in which case items that cannot be
+                    sold at the store make the sale fail.
+
+        Returns:
+            True if the basket was sold, False otherwise.
+        """
+        if prices is None:
+            if np.any(basket[~self._registry.get_sellable()]):
+                return False
+            prices = self._registry.get_sell_prices()
+        if np.any(basket < 0) or np.any(basket > self._inventory):
+            return False
+        self._money += int(basket @ prices)
+        self._inventory -= basket
+        return True
+
     def add_item(self, to_add: tuple[str, int]) -> None:
         """ Adds the given amount of the given item to the player's inventory.
         
@@ -215,7 +620,17 @@ class Player:
             to_add: A tuple of the item name and amount to add.
         """
         item_name, amount = to_add
-        self._inventory[item_name] = self._inventory.get(item_name, 0) + amount
+        self.add_item_id(self._registry.get_id(item_name), amount)
+
+    def add_item_id(self, item_id: int, amount: int) -> None:
+        """ Adds the given amount of the item with the given id to the
+            player's inventory.
+
+        Parameters:
+            item_id: The id of the item to add.
+            amount: The amount to add.
+        """
+        self._inventory[item_id] += amount
 
     def remove_item(self, to_remove: tuple[str, int]) -> None:
         """ Removes the given amount of the given item from the player's
@@ -225,11 +640,17 @@ class Player:
             to_remove: A tuple of the item name and amount to remove.
         """
         item_name, amount = to_remove
-        new_amount = self._inventory.get(item_name, 0) - amount
-        if new_amount <= 0:
-            self._inventory.pop(item_name)
-        else:
-            self._inventory[item_name] = new_amount
+        self.remove_item_id(self._registry.get_id(item_name), amount)
+
+    def remove_item_id(self, item_id: int, amount: int) -> None:
+        """ Removes the given amount of the item with the given id from the
+            player's inventory. The amount held never drops below zero.
+
+        Parameters:
+            item_id: The id of the item to remove.
+            amount: The amount to remove.
+        """
+        self._inventory[item_id] = max(int(self._inventory[item_id]) - amount, 0)
 
     def set_position(self, position: tuple[int, int]) -> None:
         """ Sets the player's position to the given position.
@@ -256,29 +677,196 @@ class Player:
 
 
 class FarmModel:
-    """ Represents the model for the farm game. """
+    """ Represents the model for the farm game.
+
+        The map and plants are stored copy-on-write, so that snapshot() and
+        fork() take constant time and later changes to either copy only the
+        parts of the farm they touch.
+    """
 
-    def __init__(self, map_file: str) -> None:
+    def __init__(self, map_file: str, plants_file: str = None,
+                 tile_store: str = TILE_STORE) -> None:
         """ Constructor for the farm model.
         
         Parameters:
             map_file: The path to the file containing the map to use.
+            plants_file: The path to a file of plants to start with, in the
+                         format read by read_plants.
+            tile_store: How to store the map; see make_tile_rows.
         """
-        self._map = read_map(map_file)
-        self._plants = {}
+        self._map = make_tile_rows(read_map(map_file), tile_store)
+        self._plants = CowPlantMap()
         self._player = Player()
+        self._market = Market()
+        self._market_owner = self._market.register_owner(self.get_player)
+        self._machines = MachineSet()
+        self._telemetry = None
+        self._telemetry_mark = None
+        self._weather = None
+        self._census = PlantCensus()
         self._days_elapsed = 1
+        if plants_file is not None:
+            for row, col, species, days in read_plants(plants_file):
+                plant = Plant(species)
+                for _ in range(days):
+                    plant.age()
+                self._plants[(row, col)] = plant
+                self._census.add(plant)
+        self._masks = ActionMasks(self._map, self._plants)
+
+    def fork(self) -> 'FarmModel':
+        """ Returns an independent copy of this game, sharing unchanged state
+            with it. The copy trades in its own, empty market.
+        """
+        other = object.__new__(FarmModel)
+        other._copy_state(self)
+        other._market = Market()
+        other._market_owner = other._market.register_owner(other.get_player)
+        other._telemetry = None
+        other._telemetry_mark = None
+        return other
+
+    def __getstate__(self) -> dict:
+        # Saved games leave out the market, whose owners refer back to the
+        # game, and any telemetry recorder, which belongs to the session
+        state = self.__dict__.copy()
+        for name in ('_market', '_market_owner', '_telemetry',
+                     '_telemetry_mark'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._market = Market()
+        self._market_owner = self._market.register_owner(self.get_player)
+        self._telemetry = None
+        self._telemetry_mark = None
+
+    def snapshot(self) -> 'FarmModel':
+        """ Returns a copy of the current state of the game, for passing to
+            restore() later. The snapshot must not be modified.
+        """
+        snapshot = self.fork()
+        if self._telemetry is not None:
+            snapshot._telemetry_mark = self._telemetry.get_mark()
+        return snapshot
+
+    def restore(self, snapshot: 'FarmModel') -> None:
+        """ Returns the game to the state recorded by the given snapshot. The
+            game keeps its own market. Its telemetry recorder, if it had one
+            when the snapshot was taken, forgets what it recorded since.
+
+        Parameters:
+            snapshot: A snapshot previously returned by snapshot().
+        """
+        self._copy_state(snapshot)
+        if self._telemetry is not None \
+                and snapshot._telemetry_mark is not None:
+            self._telemetry.rewind(snapshot._telemetry_mark)
+
+    def count_unshared_plants(self, other: 'FarmModel') -> int:
+        """ Returns the number of plants in this game that are not shared
+            with the given fork or snapshot of it, a measure of the memory
+            that keeping both of them takes.
+        """
+        return self._plants.count_unshared(other._plants)
+
+    def _copy_state(self, other: 'FarmModel') -> None:
+        """ Makes this game's state a copy-on-write copy of another's. """
+        self._map = other._map.fork()
+        self._plants = other._plants.fork()
+        self._masks = other._masks.fork()
+        self._machines = other._machines.copy()
+        self._census = other._census.copy()
+        self._weather = other._weather
+        self._player = other._player.copy()
+        self._days_elapsed = other._days_elapsed
     
-    def get_plants(self) -> dict[tuple[int, int], Plant]:
-        """ Returns the plants currently on the farm, as a dictionary mapping
-            positions to plants.
+    def diff(self, base: 'FarmModel') -> StateDelta:
+        """ Returns the changes from the given earlier state of the game,
+            typically a snapshot, to its current state. See diff_states.
+        """
+        return diff_states(base, self)
+
+    def apply_delta(self, delta: StateDelta) -> None:
+        """ Patches the game forward by the given changes, so that a copy of
+            the delta's earlier state becomes equal to its later state.
+
+        Parameters:
+            delta: Changes from diff_states whose earlier state is this game's
+                   current state.
+        """
+        changed_rows = {}
+        for row, col, tile in delta.tiles:
+            changed_rows.setdefault(row, []).append((col, tile))
+        for row, changes in changed_rows.items():
+            self._map.set_tiles(row, changes)
+        for position in delta.removed_plants:
+            self._census.discard(self._plants.pop(position))
+        for plants in (delta.added_plants, delta.changed_plants):
+            for position, state in plants.items():
+                old_plant = self._plants.get(position)
+                if old_plant is not None:
+                    self._census.discard(old_plant)
+                plant = self._plants[position] = Plant.from_state(state)
+                self._census.add(plant)
+        for positions in (((row, col) for row, col, _ in delta.tiles),
+                          delta.removed_plants, delta.added_plants,
+                          delta.changed_plants):
+            for position in positions:
+                self._update_masks(position)
+
+        player = self._player
+        registry = player.get_registry()
+        for item_name, amount in delta.inventory.items():
+            player.get_inventory_array()[registry.get_id(item_name)] = amount
+        if delta.money is not None:
+            player.add_money(delta.money - player.get_money())
+        if delta.energy is not None:
+            player.reduce_energy(player.get_energy() - delta.energy)
+        if delta.day is not None:
+            self._days_elapsed = delta.day
+        if delta.position is not None:
+            player.set_position(delta.position)
+        if delta.direction is not None:
+            player.set_direction(delta.direction)
+        if delta.selection_changed:
+            player.set_selected_item(delta.selected_item)
+
+        storage = self._machines.get_storage_array()
+        for item_name, amount in delta.storage.items():
+            storage[registry.get_id(item_name)] = amount
+        if delta.machines is not None:
+            for position in list(self._machines.get_machines()):
+                self._machines.remove(position)
+            for position, machine in delta.machines.items():
+                self._machines.add(machine[0], position, *machine[1:])
+
+    def get_plants(self) -> CowPlantMap:
+        """ Returns the plants currently on the farm, as a mapping of positions
+            to plants. The plants may be shared with snapshots of the game and
+            must not be modified directly.
         """
         return self._plants
     
     def get_player(self) -> Player:
         """ Returns the player in this game. """
         return self._player
+
+    def set_player(self, player: Player) -> None:
+        """ Replaces the player in this game, e.g. with one arriving from
+            another farm.
+        """
+        self._player = player
     
+    def get_market(self) -> Market:
+        """ Returns the market in which the player trades items. """
+        return self._market
+
+    def get_market_owner(self) -> int:
+        """ Returns the owner id of this game's player in its market. """
+        return self._market_owner
+
     def add_plant(self, position: tuple[int, int], plant: Plant) -> bool:
         """ Adds the given plant to the given position, if the player has enough
             energy and there is no plant already at that position. Also handles
@@ -298,6 +886,8 @@ class FarmModel:
         if self._plants.get(position) is None:
             self._player.reduce_energy(PLANT_COST)
             self._plants[position] = plant
+            self._census.add(plant)
+            self._update_masks(position)
             return True
     
         return False
@@ -315,23 +905,95 @@ class FarmModel:
             position: The position at which to harvest the plant.
 
         Returns:
-            The result of harvesting the plant, or None if there was no plant
-            at the given position.
+            The name and quantity of the item harvested, or None if there was
+            no plant ready for harvest at the given position.
+        """
+        harvest = self._harvest_at(position)
+        if harvest is None:
+            return None
+        item_id, amount = harvest
+        return (self._player.get_registry().get_name(item_id), amount)
+
+    def _harvest_at(
+            self,
+            position: tuple[int, int]
+        ) -> Optional[tuple[int, int]]:
+        """ Harvests the plant at the given position as for harvest_plant,
+            returning the item id and quantity harvested, or None.
         """
         # Return early if not enough energy
         if self._player.get_energy() < HARVEST_COST:
-            return
+            return None
 
-        if self._plants.get(position) is not None:
-            plant = self._plants[position]
-            harvest_result = plant.harvest()
-            if harvest_result is not None:
-                if plant.remove_on_harvest():
-                    self.remove_plant(position)
-                self._player.reduce_energy(HARVEST_COST)
-                return harvest_result
+        plant = self._plants.get(position)
+        if plant is None or not plant.can_harvest():
+            return None
+        # Harvesting changes the plant, which could be shared
+        plant = self._plants.get_mutable(position)
+        self._census.discard(plant)
+        harvest = plant.harvest()
+        self._census.add(plant)
+        if plant.remove_on_harvest():
+            self.remove_plant(position)
+        self._update_masks(position)
+        if self._telemetry is not None:
+            self._telemetry.record_harvest_id(*harvest)
+        self._player.reduce_energy(HARVEST_COST)
+        return harvest
     
-    def get_map(self) -> list[str]:
+    def _update_masks(self, position: tuple[int, int]) -> None:
+        """ Brings the action masks up to date after the tile or plant at the
+            given position changed.
+        """
+        row, col = position
+        self._masks.update_cell(position, self._map.get_tile(row, col),
+                                self._plants.get(position))
+
+    def count_legal_cells(
+            self,
+            action: str,
+            region: Optional[tuple[int, int, int, int]] = None
+        ) -> int:
+        """ Returns the number of cells where the player could currently
+            perform the given action, taking into account their energy and,
+            for PLANT_ACTION, whether they hold the selected seed.
+
+        Parameters:
+            action: One of TILL_ACTION, UNTILL_ACTION, PLANT_ACTION or
+                    HARVEST_ACTION.
+            region: (top, left, bottom, right) with exclusive bottom and
+                    right, or None for the whole farm.
+        """
+        if not self._can_afford(action):
+            return 0
+        return self._masks.count(action, region)
+
+    def get_legal_cells(
+            self,
+            action: str,
+            region: Optional[tuple[int, int, int, int]] = None
+        ) -> list[tuple[int, int]]:
+        """ Returns the positions, in row-major order, where the player could
+            currently perform the given action. Parameters are as for
+            count_legal_cells.
+        """
+        if not self._can_afford(action):
+            return []
+        return self._masks.cells(action, region)
+
+    def _can_afford(self, action: str) -> bool:
+        """ Returns whether the player has what the given tile action needs,
+            wherever they perform it.
+        """
+        if self._player.get_energy() < ACTION_COSTS[action]:
+            return False
+        if action == PLANT_ACTION:
+            seed_name = self._player.get_selected_item()
+            return SPECIES_REGISTRY.find_by_seed(seed_name) is not None and \
+                self._player.get_item_count(seed_name) > 0
+        return True
+
+    def get_map(self) -> TileRows:
         """ Returns the map for this game. """
         return self._map
     
@@ -339,15 +1001,378 @@ class FarmModel:
         """ Returns the dimensions of the map for this game, as
             (number of rows, number of columns).
         """
-        return (len(self._map), len(self._map[0]))
+        return (len(self._map), self._map.get_width())
     
     def new_day(self) -> None:
-        """ Advances the game by one day. """
-        for plant in self._plants.values():
-            plant.age()
+        """ Advances the game by one day. Machines work the farm once the
+            plants have aged.
+        """
+        start = time.perf_counter()
+        if self._weather is None:
+            self._update_harvestable(
+                None, age_plants(self._plants.mutable_values()))
+            self._census.advance(1)
+        else:
+            self._age_in_weather()
+        if len(self._machines):
+            self.run_machines()
+        if self._telemetry is not None:
+            self._telemetry.end_day(self._days_elapsed,
+                                    self._player.get_money(),
+                                    self._census.get_items(),
+                                    time.perf_counter() - start)
         self._days_elapsed += 1
         self._player.reset_energy()
     
+    def _update_harvestable(
+            self,
+            keys: Optional[list[tuple[int, int]]],
+            changed: list[int]
+        ) -> None:
+        """ Brings the harvestable mask up to date after plants aged.
+
+        Parameters:
+            keys: The keys of the blocks whose plants aged, or None for all.
+            changed: The indices of the plants that became ready or stopped
+                     being ready to harvest, as returned by age_plants for
+                     mutable_values(keys).
+        """
+        if changed:
+            positions = self._plants.get_positions(keys)
+            self._masks.update_harvestable(
+                self._plants, [positions[index] for index in changed])
+
+    def _age_in_weather(self) -> None:
+        """ Ages the plants under the day's weather, region by region: not at
+            all in drought, two days' worth in rain and one day elsewhere.
+            Frost then kills some of the plants in its regions.
+
+            Weather regions are whole blocks of the plant map, so each block
+            is aged as a unit, and the census is corrected by counting only
+            the plants that did not age by exactly one day.
+        """
+        weather = self._weather
+        day = self._days_elapsed
+        scale = weather.get_region_size() // self._plants.get_block_size()
+        keys = list(self._plants.get_blocks())
+        if not keys:
+            return
+        regions = np.array(keys) // scale
+        block_events = weather.get_events(day, self.get_dimensions())[
+            regions[:, 0], regions[:, 1]]
+
+        keys_by_growth = {}
+        for code, event in enumerate(WEATHER_EVENTS):
+            event_keys = [keys[i] for i in
+                          np.flatnonzero(block_events == code).tolist()]
+            keys_by_growth.setdefault(WEATHER_GROWTH_DAYS[event],
+                                      []).extend(event_keys)
+        census = self._census
+        blocks = self._plants.get_blocks()
+        unusual = {
+            growth: census.count(chain.from_iterable(
+                blocks[key].values() for key in growth_keys))
+            for growth, growth_keys in keys_by_growth.items()
+            if growth != 1 and growth_keys
+        }
+        for growth, growth_keys in keys_by_growth.items():
+            if growth == 1:
+                self._update_harvestable(growth_keys, age_plants(
+                    self._plants.mutable_values(growth_keys)))
+            elif growth:
+                self._update_harvestable(growth_keys, advance_plants(
+                    self._plants.mutable_values(growth_keys), growth))
+        census.advance(1)
+        for growth, counts in unusual.items():
+            census.replace(census.advanced(counts, 1),
+                           census.advanced(counts, growth))
+
+        frost_keys = [keys[i] for i in np.flatnonzero(
+            block_events == WEATHER_EVENTS.index(FROST)).tolist()]
+        if frost_keys:
+            self._kill_in_frost(frost_keys)
+
+    def _kill_in_frost(self, keys: list[tuple[int, int]]) -> None:
+        """ Kills the plants that frost kills today in the given blocks of
+            the plant map.
+
+            Frost is drawn for every cell of the blocks at once. The plants
+            killed are then found a row of blocks at a time, by masking the
+            frost with the planted cells as arrays, so that the only work done
+            per plant is removing it.
+        """
+        size = self._plants.get_block_size()
+        rows, cols = self.get_dimensions()
+        blocks = np.array(keys)
+        offsets = np.arange(size)
+        kills = self._weather.get_frost_kills(
+            self._days_elapsed,
+            (blocks[:, 0, None] * size + offsets)[:, :, None],
+            (blocks[:, 1, None] * size + offsets)[:, None, :])
+        width = -(-cols // size) * size
+        row_bytes = -(-width // 8)
+        masks = self._masks
+        dead = []
+        killed = {}
+        for block_row in np.unique(blocks[:, 0]).tolist():
+            top = block_row * size
+            bottom = min(top + size, rows)
+            selected = blocks[:, 0] == block_row
+            frost = np.zeros((size, width // size, size), dtype=bool)
+            frost[:, blocks[selected, 1], :] = \
+                kills[selected].transpose(1, 0, 2)
+            planted = np.unpackbits(np.frombuffer(b''.join(
+                masks.get_row(ActionMasks.PLANTED, row).to_bytes(
+                    row_bytes, 'little') for row in range(top, bottom)),
+                dtype=np.uint8).reshape(bottom - top, row_bytes), axis=1,
+                count=width, bitorder='little').view(bool)
+            hit = frost.reshape(size, width)[:bottom - top] & planted
+
+            for offset, bits in enumerate(np.packbits(
+                    hit, axis=1, bitorder='little').tolist()):
+                bits = int.from_bytes(bits, 'little')
+                if bits:
+                    killed[top + offset] = bits
+            # Positions in each block, ordered by block
+            hit_rows, hit_cols = np.nonzero(hit)
+            order = np.argsort(hit_cols // size, kind='stable')
+            hit_rows, hit_cols = hit_rows[order] + top, hit_cols[order]
+            block_cols = hit_cols // size
+            positions = list(zip(hit_rows.tolist(), hit_cols.tolist()))
+            bounds = [0, *(np.flatnonzero(np.diff(block_cols)) + 1).tolist(),
+                      len(positions)]
+            for start, stop in zip(bounds, bounds[1:]):
+                if start < stop:
+                    dead.extend(self._plants.pop_block(
+                        (block_row, int(block_cols[start])),
+                        positions[start:stop]))
+
+        self._census.discard_all(dead)
+        for row, bits in killed.items():
+            masks.set_bits(ActionMasks.PLANTED, row, bits, False)
+            masks.set_bits(ActionMasks.HARVESTABLE, row, bits, False)
+            masks.set_bits(ActionMasks.EMPTY_SOIL, row,
+                           bits & self._map.get_tile_bits(row, SOIL), True)
+
+    def get_weather(self) -> Optional[Weather]:
+        """ Returns the weather of this game, if it has any. """
+        return self._weather
+
+    def set_weather(self, weather: Optional[Weather]) -> None:
+        """ Lets the given weather affect the plants from the next new day
+            on, or stops weather if it is None. Forks share the weather.
+        """
+        if weather is not None and \
+                weather.get_region_size() % self._plants.get_block_size():
+            raise ValueError('Weather regions must be whole plant blocks')
+        self._weather = weather
+
+    def get_telemetry(self) -> Optional[Telemetry]:
+        """ Returns the telemetry recorder of this game, if it has one. """
+        return self._telemetry
+
+    def set_telemetry(self, telemetry: Optional[Telemetry]) -> None:
+        """ Starts recording the game's metrics with the given recorder, or
+            stops recording if it is None. Forks of the game do not record.
+        """
+        self._telemetry = telemetry
+
+    def get_machines(self) -> MachineSet:
+        """ Returns the machines on the farm and their shared storage. """
+        return self._machines
+
+    def add_machine(self, kind: str, position: tuple[int, int],
+                    radius: int = MACHINE_RADIUS,
+                    species: Optional[str] = None) -> bool:
+        """ Places a machine on the farm, as for MachineSet.add. Machines cost
+            no energy to place or run.
+        """
+        return self._machines.add(kind, position, radius, species)
+
+    def remove_machine(self, position: tuple[int, int]) -> bool:
+        """ Removes the machine at the given position, if there is one. """
+        return self._machines.remove(position)
+
+    def stock_storage(self, item_name: str, quantity: int) -> bool:
+        """ Moves items from the player's inventory into the machines' shared
+            storage, e.g. seeds for auto-plant machines.
+
+        Returns:
+            True if the player had enough of the item to move, else False.
+        """
+        if quantity <= 0 or self._player.get_item_count(item_name) < quantity:
+            return False
+        self._player.remove_item((item_name, quantity))
+        self._machines.get_storage_array()[
+            self._player.get_registry().get_id(item_name)] += quantity
+        return True
+
+    def collect_storage(self) -> None:
+        """ Moves everything in the machines' shared storage into the
+            player's inventory.
+        """
+        storage = self._machines.get_storage_array()
+        for item_id in np.flatnonzero(storage).tolist():
+            self._player.add_item_id(item_id, int(storage[item_id]))
+        storage[:] = 0
+
+    def run_machines(self) -> None:
+        """ Lets every machine work its area once, as they do at the start
+            of each day, a band of rows at a time. Harvesting comes first, so that removed plants can be replaced the
+            same day, then tilling, then planting.
+
+            Which cells each machine works is found by combining the machines'
+            coverage with the action masks, so only cells that change are
+            visited individually. The ready plants of a whole band are
+            harvested together.
+        """
+        machines = self._machines
+        rows, cols = self.get_dimensions()
+        species_ids = machines.get_plant_species()
+        for top in range(0, rows, MACHINE_BAND_ROWS):
+            bottom = min(top + MACHINE_BAND_ROWS, rows)
+            harvest = machines.coverage(AUTO_HARVEST, top, bottom, cols)
+            till = machines.coverage(AUTO_TILL, top, bottom, cols)
+            plant = [(species, machines.coverage(AUTO_PLANT, top, bottom, cols,
+                                                 species))
+                     for species in species_ids]
+            plant = [(species, bits_from_rows(cover))
+                     for species, cover in plant if cover is not None]
+            if harvest is not None:
+                self._machine_harvest(top, bits_from_rows(harvest))
+            if till is None and not plant:
+                continue
+            till = bits_from_rows(till) if till is not None else []
+            for offset, row in enumerate(range(top, bottom)):
+                if till and till[offset]:
+                    self._machine_till(row, till[offset])
+                for species, cover in plant:
+                    if cover[offset]:
+                        self._machine_plant(row, cover[offset], species)
+
+    def _machine_harvest(self, top: int, cover: list[int]) -> None:
+        """ Harvests the ready plants of a band of rows, starting at the given
+            row, within each row's coverage bits into the machines' storage.
+        """
+        masks = self._masks
+        ready = {}
+        positions = []
+        for row, bits in enumerate(cover, top):
+            if bits:
+                bits &= masks.get_row(ActionMasks.HARVESTABLE, row)
+            if bits:
+                ready[row] = bits
+                positions.extend((row, col)
+                                 for col in bits_to_columns(bits).tolist())
+        if not positions:
+            return
+        plants = list(map(self._plants.get_mutable, positions))
+        self._census.discard_all(plants)
+        harvested, removed = harvest_plants(plants)
+
+        storage = self._machines.get_storage_array()
+        for species, count in enumerate(harvested):
+            if count:
+                product = SPECIES_REGISTRY.get_product_id(species)
+                amount = count * SPECIES_REGISTRY.get_yield(species)
+                storage[product] += amount
+                if self._telemetry is not None:
+                    self._telemetry.record_harvest_id(product, amount)
+        removed_bits = {}
+        for index in removed:
+            row, col = position = positions[index]
+            self._plants.pop(position)
+            removed_bits[row] = removed_bits.get(row, 0) | 1 << col
+        if removed:
+            removed = set(removed)
+            plants = [plant for index, plant in enumerate(plants)
+                      if index not in removed]
+        self._census.add_all(plants)
+
+        for row, bits in ready.items():
+            masks.set_bits(ActionMasks.HARVESTABLE, row, bits, False)
+        for row, bits in removed_bits.items():
+            masks.set_bits(ActionMasks.PLANTED, row, bits, False)
+            masks.set_bits(ActionMasks.EMPTY_SOIL, row,
+                           bits & self._map.get_tile_bits(row, SOIL), True)
+
+    def _machine_till(self, row: int, cover: int) -> None:
+        """ Tills the untilled soil of one row within the given coverage bits.
+        """
+        masks = self._masks
+        bits = masks.get_row(ActionMasks.TILLABLE, row) & cover
+        if not bits:
+            return
+        self._map.set_tiles(row, ((col, SOIL) for col
+                                  in bits_to_columns(bits).tolist()))
+        masks.set_bits(ActionMasks.TILLABLE, row, bits, False)
+        masks.set_bits(ActionMasks.EMPTY_SOIL, row,
+                       bits & ~masks.get_row(ActionMasks.PLANTED, row), True)
+
+    def _machine_plant(self, row: int, cover: int, species: int) -> None:
+        """ Plants the given species on the empty soil of one row within the
+            given coverage bits, while the storage has seeds for it.
+        """
+        masks = self._masks
+        bits = masks.get_row(ActionMasks.EMPTY_SOIL, row) & cover
+        storage = self._machines.get_storage_array()
+        seed_id = self._player.get_registry().get_id(
+            SPECIES_REGISTRY.get_seed(species))
+        stock = int(storage[seed_id])
+        if not bits or stock <= 0:
+            return
+        columns = bits_to_columns(bits)[:stock].tolist()
+        if len(columns) < bits.bit_count():
+            bits &= (1 << (columns[-1] + 1)) - 1
+        seedling = Plant(SPECIES_REGISTRY.get_name(species))
+        plants = [seedling.copy() for _ in columns]
+        for col, plant in zip(columns, plants):
+            self._plants[(row, col)] = plant
+        self._census.add_all(plants)
+        storage[seed_id] -= len(columns)
+        masks.set_bits(ActionMasks.EMPTY_SOIL, row, bits, False)
+        masks.set_bits(ActionMasks.PLANTED, row, bits, True)
+        masks.set_bits(ActionMasks.HARVESTABLE, row, bits,
+                       seedling.can_harvest())
+
+    def fast_forward(self, days: int) -> None:
+        """ Advances the game by the given number of days without the player
+            acting, with the same result as calling new_day that many times.
+            Plants are aged in one step; farms with machines or weather are
+            simulated day by day, as these change the farm every day.
+        """
+        if days <= 0:
+            return
+        if len(self._machines) or self._telemetry is not None \
+                or self._weather is not None:
+            for _ in range(days):
+                self.new_day()
+            return
+        self._update_harvestable(
+            None, advance_plants(self._plants.mutable_values(), days))
+        self._census.advance(days)
+        self._days_elapsed += days
+        self._player.reset_energy()
+
+    def get_census(self) -> PlantCensus:
+        """ Returns the number of plants in each distinct state. """
+        return self._census
+
+    def forecast(
+            self,
+            days: int,
+            prices: dict[str, int] = SELL_PRICES
+        ) -> tuple[dict[str, np.ndarray], np.ndarray]:
+        """ Returns how much the plants on the farm would yield, and sell for,
+            on each of the coming days if each were harvested as soon as it
+            is ready. Machines, weather and the player's energy are not taken
+            into account. See PlantCensus.forecast.
+
+            The cost depends on the number of distinct plant states, not on
+            the number of plants.
+        """
+        return self._census.forecast(days, prices)
+
     def get_days_elapsed(self) -> int:
         """ Returns the number of days elapsed in this game. """
         return self._days_elapsed
@@ -406,9 +1431,10 @@ class FarmModel:
             return
 
         row, col = position
-        if self._map[row][col] == UNTILLED:
+        if self._map.get_tile(row, col) == UNTILLED:
             self._player.reduce_energy(TILL_COST)
-            self._map[row] = self._map[row][:col] + SOIL + self._map[row][col + 1:]
+            self._map.set_tile(row, col, SOIL)
+            self._update_masks(position)
     
     def untill_soil(self, position: tuple[int, int]) -> None:
         """ Untills the soil at the given position, if it is tilled soil.
@@ -422,9 +1448,86 @@ class FarmModel:
             return
 
         row, col = position
-        if position not in self._plants and self._map[row][col] == SOIL:
+        if position not in self._plants and \
+                self._map.get_tile(row, col) == SOIL:
             self._player.reduce_energy(UNTILL_COST)
-            self._map[row] = self._map[row][:col] + UNTILLED + self._map[row][col + 1:]
+            self._map.set_tile(row, col, UNTILLED)
+            self._update_masks(position)
+
+    def plant_seed(self, position: tuple[int, int]) -> None:
+        """ Plants the player's selected seed at the given position, if it is
+            tilled soil and the player has the seed. The seed is used up even
+            if the plant cannot be added.
+
+        Parameters:
+            position: The position at which to plant the seed.
+        """
+        row, col = position
+        seed_name = self._player.get_selected_item()
+        if self._map.get_tile(row, col) != SOIL or \
+                self._player.get_item_count(seed_name) <= 0:
+            return
+        species = SPECIES_REGISTRY.find_by_seed(seed_name)
+        if species is None:
+            return
+        self.add_plant(position, Plant(SPECIES_REGISTRY.get_name(species)))
+        self._player.remove_item((seed_name, 1))
+
+    def apply_action(
+            self,
+            action: str,
+            argument: str = None
+        ) -> Optional[tuple[str, int]]:
+        """ Applies one player action to the game, exactly as if the player had
+            performed it through the game window.
+
+        Parameters:
+            action: One of the *_ACTION constants.
+            argument: The direction for MOVE_ACTION, or the item name for
+                      SELECT_ACTION, BUY_ACTION and SELL_ACTION.
+
+        Returns:
+            The name and quantity of the item harvested by a successful
+            HARVEST_ACTION, otherwise None.
+        """
+        position = self.get_player_position()
+        energy = self._player.get_energy()
+        money = self._player.get_money()
+        harvest_result = None
+        if action == MOVE_ACTION:
+            self.move_player(argument)
+        elif action == TILL_ACTION:
+            self.till_soil(position)
+        elif action == UNTILL_ACTION:
+            self.untill_soil(position)
+        elif action == PLANT_ACTION:
+            self.plant_seed(position)
+        elif action == HARVEST_ACTION:
+            harvest = self._harvest_at(position)
+            if harvest is not None:
+                self._player.add_item_id(*harvest)
+                # The GUI and scripts are given the item's name
+                item_id, amount = harvest
+                harvest_result = (
+                    self._player.get_registry().get_name(item_id), amount)
+        elif action == REMOVE_ACTION:
+            self.remove_plant(position)
+        elif action == SELECT_ACTION:
+            self._player.select_item(argument)
+        elif action in (BUY_ACTION, SELL_ACTION):
+            side = BUY_SIDE if action == BUY_ACTION else SELL_SIDE
+            order = self._market.place_market_order(self._market_owner,
+                                                    argument, side, 1)
+            if self._telemetry is not None and order.filled:
+                self._telemetry.record_trade(
+                    order.filled, abs(self._player.get_money() - money))
+        elif action == NEW_DAY_ACTION:
+            self.new_day()
+
+        if self._telemetry is not None and action != NEW_DAY_ACTION:
+            self._telemetry.record_action(action,
+                                          energy - self._player.get_energy())
+        return harvest_result
 
     def remove_plant(self, position: tuple[int, int]) -> None:
         """ Removes the plant at the given position, if there is one.
@@ -439,4 +1542,5 @@ class FarmModel:
 
         if position in self._plants:
             self._player.reduce_energy(REMOVE_COST)
-            self._plants.pop(position)
+            self._census.discard(self._plants.pop(position))
+            self._update_masks(position)
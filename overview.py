@@ -0,0 +1,342 @@
+import math
+import os
+from collections import OrderedDict
+from typing import Iterable, Mapping, Optional
+import numpy as np
+from PIL import Image
+from constants import *
+from tiles import TileRows
+from a3_support import get_plant_image_name
+
+# The average colour and opacity of each sprite, by path, found on first use
+_sprite_colours = {}
+
+
+def sprite_colour(image_name: str) -> tuple[np.ndarray, float]:
+    """ Returns the average colour of a sprite's visible pixels, as float RGB,
+        and the sprite's average opacity between 0 and 1.
+    """
+    if image_name not in _sprite_colours:
+        pixels = np.asarray(Image.open(image_name).convert('RGBA'),
+                            dtype=np.float32).reshape(-1, 4)
+        alpha = pixels[:, 3] / 255
+        weight = alpha.sum()
+        colour = (pixels[:, :3] * alpha[:, None]).sum(axis=0) / weight \
+            if weight else np.zeros(3, dtype=np.float32)
+        _sprite_colours[image_name] = (colour, float(alpha.mean()))
+    return _sprite_colours[image_name]
+
+
+def _halve(pixels: np.ndarray) -> np.ndarray:
+    """ Returns an image at half the size, each pixel the average of 2x2. """
+    return (pixels[0::2, 0::2] + pixels[1::2, 0::2] + pixels[0::2, 1::2]
+            + pixels[1::2, 1::2]) * 0.25
+
+
+class ChunkOverview:
+    """ Downsampled images of a farm, for drawing it zoomed out.
+
+        Each cell is one colour: its tile's average colour, with the average
+        colour of its plant's sprite blended over it. The farm is split into
+        square chunks of cells. Building a chunk computes its colours and a
+        mipmap of them, each level averaging 2x2 pixels of the one before, so
+        at level L one pixel covers 2 ** L cells a side.
+
+        Levels from OVERVIEW_MOSAIC_LEVEL up are kept for the whole farm as one
+        image per level, so any part of them is a slice. The finer levels would
+        be too large for that and are only kept for recently drawn chunks.
+        Chunks are only rebuilt once a change to their tiles or plants has
+        marked them dirty, and only when a part of the farm that includes them
+        is drawn.
+    """
+
+    def __init__(self, image_dir: str = 'images',
+                 chunk_size: int = OVERVIEW_CHUNK,
+                 mosaic_level: int = OVERVIEW_MOSAIC_LEVEL,
+                 cache_chunks: int = OVERVIEW_CACHE_CHUNKS) -> None:
+        """ Constructor for an overview of an empty farm.
+
+        Parameters:
+            image_dir: The directory of the sprites whose colours are used.
+            chunk_size: The cells per side of each chunk, a power of two.
+            mosaic_level: The finest level kept for the whole farm.
+            cache_chunks: The most chunks whose finer levels are kept.
+        """
+        self._image_dir = image_dir
+        self._chunk_size = chunk_size
+        self._max_level = int(math.log2(chunk_size))
+        self._mosaic_level = min(mosaic_level, self._max_level)
+        self._cache_chunks = cache_chunks
+
+        # The colour of each tile, then of each tile with each kind of plant
+        # on it, by the plant's colour id
+        self._tile_codes = np.zeros(256, dtype=np.uint8)
+        self._tile_colours = np.zeros((len(TILE_CODES), 3), dtype=np.float32)
+        for tile, code in TILE_CODES.items():
+            self._tile_codes[ord(tile)] = code
+            self._tile_colours[code] = sprite_colour(
+                os.path.join(image_dir, IMAGES[tile]))[0]
+        self._palette = self._tile_colours
+        self._plant_ids = {}
+
+        self._map = ()
+        self._dimensions = (0, 0)
+        # Plant colour ids by chunk, then by cell within the chunk
+        self._plants = {}
+        self._dirty = np.zeros((0, 0), dtype=bool)
+        self._mosaics = []
+        # The levels finer than the mosaics of recently built chunks, least
+        # recently used first
+        self._cache = OrderedDict()
+        self._rebuilt = None
+
+    def get_dimensions(self) -> tuple[int, int]:
+        """ Returns the (rows, columns) of the farm. """
+        return self._dimensions
+
+    def get_max_level(self) -> int:
+        """ Returns the coarsest level, at which a chunk is one pixel. """
+        return self._max_level
+
+    def get_level_size(self, level: int) -> tuple[int, int]:
+        """ Returns the (height, width) in pixels of the farm at a level. """
+        span = 1 << level
+        rows, cols = self._dimensions
+        return -(-rows // span), -(-cols // span)
+
+    def update(self, ground: TileRows,
+               plants: Mapping[tuple[int, int], 'Plant'],
+               dirty_cells: Optional[Iterable[tuple[int, int]]]) -> None:
+        """ Brings the overview up to date with a new state of the farm.
+
+        Parameters:
+            ground: The rows of the farm's map.
+            plants: The plants on the farm, by position.
+            dirty_cells: The cells whose tile or plant changed since the last
+                         update, or None if anything may have changed.
+        """
+        dimensions = (len(ground), len(ground[0]) if ground else 0)
+        self._map = ground
+        if dirty_cells is None or dimensions != self._dimensions:
+            self._reset(dimensions, plants)
+            return
+        size = self._chunk_size
+        for position in dirty_cells:
+            row, col = position
+            key = (row // size, col // size)
+            chunk_plants = self._plants.setdefault(key, {})
+            plant = plants.get(position)
+            offset = row % size * size + col % size
+            if plant is None:
+                chunk_plants.pop(offset, None)
+            else:
+                chunk_plants[offset] = self._plant_id(plant)
+            self._dirty[key] = True
+            self._cache.pop(key, None)
+
+    def take_rebuilt(self) -> Optional[set[tuple[int, int]]]:
+        """ Returns the (chunk row, chunk column) of each chunk rebuilt since
+            the last call, or None if the whole farm has been replaced since.
+        """
+        rebuilt = self._rebuilt
+        self._rebuilt = set()
+        return rebuilt
+
+    def build(self, region: Optional[tuple[int, int, int, int]] = None,
+              keep: bool = False) -> None:
+        """ Rebuilds the dirty chunks that overlap a region of the farm.
+
+        Parameters:
+            region: The (top, left, bottom, right) cells of the region, with
+                    exclusive ends, or None for the whole farm.
+            keep: If True, also builds the chunks in the region whose finer
+                  levels are not cached, and caches their finer levels.
+        """
+        size = self._chunk_size
+        chunk_rows, chunk_cols = self._dirty.shape
+        if region is None:
+            top, left, bottom, right = 0, 0, chunk_rows, chunk_cols
+        else:
+            top, left = region[0] // size, region[1] // size
+            bottom = min(-(-region[2] // size), chunk_rows)
+            right = min(-(-region[3] // size), chunk_cols)
+        for chunk_row in range(top, bottom):
+            wanted = self._dirty[chunk_row, left:right].copy()
+            if keep:
+                wanted |= [(chunk_row, col) not in self._cache
+                           for col in range(left, right)]
+                for col in range(left, right):
+                    if (chunk_row, col) in self._cache:
+                        self._cache.move_to_end((chunk_row, col))
+            # Build each run of neighbouring chunks together
+            columns = np.flatnonzero(wanted) + left
+            if not len(columns):
+                continue
+            breaks = np.flatnonzero(np.diff(columns) > 1) + 1
+            for run in np.split(columns, breaks):
+                self._build_run(chunk_row, int(run[0]), int(run[-1]) + 1, keep)
+
+    def build_some(self, limit: int) -> bool:
+        """ Rebuilds at most limit of the dirty chunks, in row-major order,
+            so that rebuilding much of the farm can be spread over several
+            calls.
+
+        Parameters:
+            limit: The most chunks to rebuild.
+
+        Returns:
+            True if dirty chunks remain.
+        """
+        dirty = np.flatnonzero(self._dirty)
+        chunk_cols = self._dirty.shape[1]
+        for index in dirty[:limit].tolist():
+            chunk_row, chunk_col = divmod(index, chunk_cols)
+            self._build_run(chunk_row, chunk_col, chunk_col + 1, False)
+        return len(dirty) > limit
+
+    def get_image(self, level: int,
+                  region: tuple[int, int, int, int]) -> np.ndarray:
+        """ Returns a region of the farm at a level, building any chunks it
+            needs first.
+
+        Parameters:
+            level: The level, from 0 to get_max_level().
+            region: The (top, left, bottom, right) cells of the region, with
+                    exclusive ends. The image starts at the pixel holding the
+                    top left cell.
+
+        Returns:
+            The region's pixels as a (height, width, 3) uint8 array.
+        """
+        span = 1 << level
+        rows, cols = self._dimensions
+        top, left = max(region[0], 0) // span, max(region[1], 0) // span
+        bottom = -(-min(region[2], rows) // span)
+        right = -(-min(region[3], cols) // span)
+        if level >= self._mosaic_level:
+            self.build(region)
+            return self._mosaics[level - self._mosaic_level][top:bottom,
+                                                             left:right]
+        self.build(region, keep=True)
+        # Put the cached chunks covering the region together at the level
+        size = self._chunk_size
+        pixels = size >> level
+        chunk_top, chunk_left = top // pixels, left // pixels
+        chunk_bottom, chunk_right = -(-bottom // pixels), -(-right // pixels)
+        image = np.empty(((chunk_bottom - chunk_top) * pixels,
+                          (chunk_right - chunk_left) * pixels, 3),
+                         dtype=np.uint8)
+        for chunk_row in range(chunk_top, chunk_bottom):
+            y = (chunk_row - chunk_top) * pixels
+            for chunk_col in range(chunk_left, chunk_right):
+                x = (chunk_col - chunk_left) * pixels
+                levels = self._cache.get((chunk_row, chunk_col))
+                if levels is None:
+                    # Evicted while building the rest of a large region
+                    self._build_run(chunk_row, chunk_col, chunk_col + 1, True)
+                    levels = self._cache[(chunk_row, chunk_col)]
+                image[y:y + pixels, x:x + pixels] = levels[level]
+        y, x = top - chunk_top * pixels, left - chunk_left * pixels
+        return image[y:y + bottom - top, x:x + right - left]
+
+    def _reset(self, dimensions: tuple[int, int],
+               plants: Mapping[tuple[int, int], 'Plant']) -> None:
+        """ Forgets everything built and indexes the plants of a new farm. """
+        self._dimensions = dimensions
+        size = self._chunk_size
+        chunk_rows = -(-dimensions[0] // size)
+        chunk_cols = -(-dimensions[1] // size)
+        self._dirty = np.ones((chunk_rows, chunk_cols), dtype=bool)
+        self._mosaics = [
+            np.zeros(((chunk_rows * size) >> level,
+                      (chunk_cols * size) >> level, 3), dtype=np.uint8)
+            for level in range(self._mosaic_level, self._max_level + 1)
+        ]
+        self._plants = {}
+        for position, plant in plants.items():
+            row, col = position
+            self._plants.setdefault((row // size, col // size), {})[
+                row % size * size + col % size] = self._plant_id(plant)
+        self._cache.clear()
+        self._rebuilt = None
+
+    def _plant_id(self, plant: 'Plant') -> int:
+        """ Returns the colour id of a plant's current appearance. """
+        key = (plant.get_name(), plant.get_stage())
+        plant_id = self._plant_ids.get(key)
+        if plant_id is None:
+            colour, alpha = sprite_colour(os.path.join(
+                self._image_dir, get_plant_image_name(plant)))
+            plant_id = self._plant_ids[key] = len(self._plant_ids)
+            self._palette = np.vstack([
+                self._palette,
+                self._tile_colours * (1 - alpha) + colour * alpha
+            ]).astype(np.float32)
+        return plant_id
+
+    def _run_colours(self, chunk_row: int, start: int,
+                     end: int) -> np.ndarray:
+        """ Returns the colour of every cell of a run of chunks in one chunk
+            row, as a float32 (chunk size, chunk size * chunks, 3) array.
+            Cells past the edge of the farm repeat the nearest edge cell.
+        """
+        size = self._chunk_size
+        top = chunk_row * size
+        left, right = start * size, min(end * size, self._dimensions[1])
+        bottom = min(top + size, self._dimensions[0])
+        tiles = self._map.get_tile_bytes(top, left, bottom, right)
+        padding = ((0, size - (bottom - top)), (0, (end - start) * size
+                                                - (right - left)))
+        if padding[0][1] or padding[1][1]:
+            tiles = np.pad(tiles, padding, mode='edge')
+        # Each cell's palette entry is its tile's, or its tile and plant's
+        codes = self._tile_codes[tiles].astype(np.intp)
+        flat = codes.reshape(-1)
+        width = (end - start) * size
+        for chunk_col in range(start, end):
+            chunk_plants = self._plants.get((chunk_row, chunk_col))
+            if not chunk_plants:
+                continue
+            offsets = np.fromiter(chunk_plants, dtype=np.intp,
+                                  count=len(chunk_plants))
+            plant_ids = np.fromiter(chunk_plants.values(), dtype=np.intp,
+                                    count=len(chunk_plants))
+            cells = (offsets // size * width + offsets % size
+                     + (chunk_col - start) * size)
+            flat[cells] += (plant_ids + 1) * len(TILE_CODES)
+        return np.take(self._palette, codes, axis=0)
+
+    def _build_run(self, chunk_row: int, start: int, end: int,
+                   keep: bool) -> None:
+        """ Builds a run of neighbouring chunks in one chunk row, from column
+            start to end (exclusive).
+        """
+        size = self._chunk_size
+        level_colours = self._run_colours(chunk_row, start, end)
+        finer = []
+        for level in range(self._max_level + 1):
+            if level:
+                level_colours = _halve(level_colours)
+            pixels = size >> level
+            if level >= self._mosaic_level:
+                mosaic = self._mosaics[level - self._mosaic_level]
+                mosaic[chunk_row * pixels:(chunk_row + 1) * pixels,
+                       start * pixels:end * pixels] = np.rint(level_colours)
+            elif keep:
+                finer.append((pixels, np.rint(level_colours).astype(np.uint8)))
+
+        if keep:
+            for chunk_col in range(start, end):
+                key = (chunk_row, chunk_col)
+                offset = chunk_col - start
+                self._cache[key] = [
+                    levels[:, offset * pixels:(offset + 1) * pixels].copy()
+                    for pixels, levels in finer]
+                self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_chunks:
+                self._cache.popitem(last=False)
+
+        self._dirty[chunk_row, start:end] = False
+        if self._rebuilt is not None:
+            self._rebuilt.update((chunk_row, chunk_col)
+                                 for chunk_col in range(start, end))
@@ -0,0 +1,433 @@
+""" Shares a running farm with read-only viewer processes.
+
+    A FarmPublisher copies the tile grid, the plants and the player's state
+    into one block of shared memory after each change. Any number of
+    SharedFarmReader instances, in any process, can attach to the block by
+    name and read consistent frames straight out of it, without running a
+    simulation of their own or receiving state through pipes.
+
+    Frames are guarded by a sequence lock: the publisher makes the sequence
+    number odd while it writes and even again when it is done, and a reader
+    retries if the number was odd or changed while it was reading.
+
+    When the published farm changes size, e.g. after the player travels, the
+    publisher marks its block as replaced and creates a new block of the new
+    size under the same name, which readers then attach to.
+
+    Usage:
+        python shared_state.py serve maps/map1.txt --name farm
+        python shared_state.py view farm
+"""
+import argparse
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Optional
+import numpy as np
+from constants import *
+from species import SPECIES_REGISTRY
+
+# Fields of the header, each stored as an int64
+HEADER_FIELDS = ['sequence', 'rows', 'cols', 'day', 'energy', 'money',
+                 'row', 'col', 'direction', 'replaced']
+HEADER_SIZE = 128
+DIRECTIONS = [UP, LEFT, DOWN, RIGHT]
+
+# Tile code for each character that can appear in a map row
+_TILE_LOOKUP = np.zeros(256, dtype=np.uint8)
+for _tile, _code in TILE_CODES.items():
+    _TILE_LOOKUP[ord(_tile)] = _code
+
+
+# Type of the plants grid, which holds species id + 1, so that 0 is no plant
+PLANT_DTYPE = np.uint16
+MAX_SPECIES = np.iinfo(PLANT_DTYPE).max
+
+
+# Names of the blocks published by this process, including while a block is
+# being replaced by another of the same name. This process's resource
+# tracker frees them when the publisher closes
+_published = set()
+
+
+def _memory_size(rows: int, cols: int) -> int:
+    """ Returns the bytes of shared memory a farm of the given size takes. """
+    return HEADER_SIZE + (2 + np.dtype(PLANT_DTYPE).itemsize) * rows * cols
+
+
+def _layout(buffer, rows: int, cols: int) -> tuple[np.ndarray, ...]:
+    """ Returns the header, tiles, plants and stages arrays laid out over the
+        given buffer. The plants come first, so that they stay aligned.
+    """
+    cells = rows * cols
+    plant_bytes = np.dtype(PLANT_DTYPE).itemsize * cells
+    header = np.ndarray(len(HEADER_FIELDS), dtype=np.int64, buffer=buffer)
+    plants = np.ndarray((rows, cols), dtype=PLANT_DTYPE, buffer=buffer,
+                        offset=HEADER_SIZE)
+    tiles = np.ndarray((rows, cols), dtype=np.uint8, buffer=buffer,
+                       offset=HEADER_SIZE + plant_bytes)
+    stages = np.ndarray((rows, cols), dtype=np.uint8, buffer=buffer,
+                        offset=HEADER_SIZE + plant_bytes + cells)
+    return header, tiles, plants, stages
+
+
+class FarmPublisher:
+    """ Publishes a FarmModel's state into shared memory. """
+
+    def __init__(self, model: 'FarmModel', name: Optional[str] = None) -> None:
+        """ Constructor for the publisher. Creates the shared memory block and
+            publishes the model's current state.
+
+        Parameters:
+            model: The model to publish.
+            name: The name of the shared memory block, or None to generate one.
+        """
+        self._memory = None
+        self._create(name, model.get_dimensions(), 1)
+        self.publish(model)
+
+    def _create(self, name: Optional[str], dimensions: tuple[int, int],
+                sequence: int) -> None:
+        """ Creates the shared memory block for a farm of the given size,
+            starting from the given odd sequence number, which stays odd
+            until the block is first published.
+        """
+        rows, cols = dimensions
+        self._memory = shared_memory.SharedMemory(
+            name=name, create=True, size=_memory_size(rows, cols))
+        _published.add(self._memory.name)
+        self._header, self._tiles, self._plants, self._stages = \
+            _layout(self._memory.buf, rows, cols)
+        self._header[:] = 0
+        self._header[0] = sequence
+        # Whether the grids may not match the last model published, so that
+        # the next publish must rewrite them in full
+        self._stale = True
+        self._header[HEADER_FIELDS.index('rows')] = rows
+        self._header[HEADER_FIELDS.index('cols')] = cols
+
+    def _replace(self, dimensions: tuple[int, int]) -> None:
+        """ Replaces the shared memory block with one for a farm of another
+            size, under the same name. Readers of the old block see that it
+            was replaced and attach to the new one.
+        """
+        name = self._memory.name
+        header = self._header
+        header[0] += 1
+        header[HEADER_FIELDS.index('replaced')] = 1
+        header[0] += 1
+        # Sequence numbers carry on, so readers never mistake the new block's
+        # first frame for one they have seen
+        sequence = int(header[0]) + 1
+        header = None
+        self._free()
+        self._create(name, dimensions, sequence)
+
+    def get_name(self) -> str:
+        """ Returns the name readers use to attach to the shared memory. """
+        return self._memory.name
+
+    def publish(self, model: 'FarmModel',
+                delta: Optional['StateDelta'] = None) -> None:
+        """ Copies the model's current state into shared memory.
+
+        Parameters:
+            model: The model to publish, with fewer than MAX_SPECIES species.
+                   If its dimensions differ from the last model published,
+                   the shared memory is replaced.
+            delta: The changes to the model since it was last published, if
+                   known. Only the cells they change are then written.
+        """
+        if len(SPECIES_REGISTRY) >= MAX_SPECIES:
+            raise ValueError(f'Cannot publish more than {MAX_SPECIES - 1} '
+                             f'species')
+        if model.get_dimensions() != self._tiles.shape:
+            self._replace(model.get_dimensions())
+        header = self._header
+        player = model.get_player()
+
+        # A new block is already odd, as it has never been published
+        header[0] |= 1
+        if delta is None or self._stale:
+            self._stale = True
+            self._write_all(model)
+        else:
+            self._write_changes(delta)
+        self._stale = False
+        header[3:9] = (model.get_days_elapsed(), player.get_energy(),
+                      player.get_money(), *player.get_position(),
+                      DIRECTIONS.index(player.get_direction()))
+        header[0] += 1
+
+    def _write_all(self, model: 'FarmModel') -> None:
+        """ Writes every tile and plant of the model. """
+        row_bytes = ''.join(model.get_map()).encode()
+        plants = model.get_plants()
+        self._tiles.reshape(-1)[:] = _TILE_LOOKUP[
+            np.frombuffer(row_bytes, dtype=np.uint8)]
+        self._plants[:] = 0
+        if plants:
+            positions = np.array(list(plants.keys()))
+            self._plants[positions[:, 0], positions[:, 1]] = [
+                plant.get_species_id() + 1 for plant in plants.values()]
+            self._stages[positions[:, 0], positions[:, 1]] = [
+                plant.get_stage() for plant in plants.values()]
+
+    def _write_changes(self, delta: 'StateDelta') -> None:
+        """ Writes only the tiles and plants that the delta changes. """
+        if delta.tiles:
+            rows, cols, tiles = zip(*delta.tiles)
+            self._tiles[rows, cols] = _TILE_LOOKUP[
+                np.frombuffer(''.join(tiles).encode(), dtype=np.uint8)]
+        if delta.removed_plants:
+            positions = np.array(delta.removed_plants)
+            self._plants[positions[:, 0], positions[:, 1]] = 0
+        for states in (delta.added_plants, delta.changed_plants):
+            if not states:
+                continue
+            positions = np.array(list(states))
+            # Plant states start with the species id and stage
+            self._plants[positions[:, 0], positions[:, 1]] = [
+                state[0] + 1 for state in states.values()]
+            self._stages[positions[:, 0], positions[:, 1]] = [
+                state[1] for state in states.values()]
+
+    def close(self) -> None:
+        """ Stops publishing and frees the shared memory. Attached readers
+            keep their mapping until they close it.
+        """
+        _published.discard(self._memory.name)
+        self._free()
+
+    def _free(self) -> None:
+        """ Frees the current shared memory block. """
+        self._header = self._tiles = self._plants = self._stages = None
+        self._memory.close()
+        self._memory.unlink()
+
+
+class SharedFrame:
+    """ One consistent frame of a published farm. The arrays are views of the
+        shared memory and are only valid inside SharedFarmReader.read.
+    """
+
+    def __init__(self, header: np.ndarray, tiles: np.ndarray,
+                 plants: np.ndarray, stages: np.ndarray) -> None:
+        """ Constructor for the frame.
+
+        Parameters:
+            header: The header values, in HEADER_FIELDS order.
+            tiles: The tile code of each cell.
+            plants: The species id + 1 of the plant in each cell, or 0.
+            stages: The stage of the plant in each cell.
+        """
+        (_, _, _, self.day, self.energy, self.money, row, col,
+         direction, _) = header.tolist()
+        self.position = (row, col)
+        self.direction = DIRECTIONS[direction]
+        self.tiles = tiles
+        self.plants = plants
+        self.stages = stages
+
+    def get_map(self) -> list[str]:
+        """ Returns the tiles as map rows, as for FarmModel.get_map. """
+        tile_bytes = np.frombuffer(''.join(TILES_BY_CODE).encode(),
+                                   dtype=np.uint8)
+        return [tile_bytes[row].tobytes().decode() for row in self.tiles]
+
+    def get_plants(self) -> dict[tuple[int, int], tuple[str, int]]:
+        """ Returns the (species name, stage) of each plant by position. """
+        rows, cols = np.nonzero(self.plants)
+        return {
+            (row, col): (SPECIES_REGISTRY.get_name(species - 1), stage)
+            for row, col, species, stage in zip(
+                rows.tolist(), cols.tolist(),
+                self.plants[rows, cols].tolist(),
+                self.stages[rows, cols].tolist())
+        }
+
+
+class SharedFarmReader:
+    """ Reads frames of a farm published by a FarmPublisher. """
+
+    def __init__(self, name: str) -> None:
+        """ Constructor for the reader. Attaches to the shared memory.
+
+        Parameters:
+            name: The name of the publisher's shared memory block.
+        """
+        self._name = name
+        self._memory = None
+        self._attach()
+
+    def _attach(self) -> None:
+        """ Attaches to the publisher's current block, waiting while it is
+            being replaced.
+        """
+        if self._memory is not None:
+            self._header = self._tiles = self._plants = self._stages = None
+            self._memory.close()
+        while True:
+            try:
+                self._memory = shared_memory.SharedMemory(name=self._name)
+                break
+            except (FileNotFoundError, ValueError):
+                # Between replacing its block and sizing the new one, the
+                # publisher leaves no block, or an empty one, under the name
+                time.sleep(0)
+        # Readers in other processes must not free the publisher's memory
+        # when they exit. A publisher in this process shares their tracker,
+        # which must keep the block to unlink it
+        if self._memory.name not in _published:
+            resource_tracker.unregister(self._memory._name, 'shared_memory')
+        header = np.ndarray(len(HEADER_FIELDS), dtype=np.int64,
+                            buffer=self._memory.buf)
+        # A new block's size is written just after it is created
+        while not header[HEADER_FIELDS.index('cols')]:
+            time.sleep(0)
+        rows = int(header[HEADER_FIELDS.index('rows')])
+        cols = int(header[HEADER_FIELDS.index('cols')])
+        self._header, self._tiles, self._plants, self._stages = \
+            _layout(self._memory.buf, rows, cols)
+
+    def get_dimensions(self) -> tuple[int, int]:
+        """ Returns the dimensions of the published farm, as of the last
+            read.
+        """
+        return self._tiles.shape
+
+    def get_sequence(self) -> int:
+        """ Returns the current sequence number, which changes whenever a new
+            frame is published.
+        """
+        return int(self._header[0])
+
+    def read(self, render: Callable[[SharedFrame], object]):
+        """ Calls render with a consistent frame, retrying if the publisher
+            changed the frame while render was reading it.
+
+        Parameters:
+            render: Reads whatever it needs from the frame. It may be called
+                    more than once and should not keep references to the
+                    frame's arrays.
+
+        Returns:
+            The result of the successful call to render.
+        """
+        header = self._header
+        while True:
+            sequence = int(header[0])
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            if header[HEADER_FIELDS.index('replaced')]:
+                # The old block can only be closed once nothing views it
+                header = None
+                self._attach()
+                header = self._header
+                continue
+            result = render(SharedFrame(header.copy(), self._tiles,
+                                        self._plants, self._stages))
+            if int(header[0]) == sequence:
+                return result
+
+    def close(self) -> None:
+        """ Detaches from the shared memory. """
+        self._header = self._tiles = self._plants = self._stages = None
+        self._memory.close()
+
+
+def serve(map_file: str, name: str, interval: float) -> None:
+    """ Simulates a farm with the GreedyBot, publishing it after every action,
+        and advancing one day per interval.
+    """
+    from model import FarmModel
+    from bot import GreedyBot
+
+    model = FarmModel(map_file)
+    publisher = FarmPublisher(model, name)
+    bot = GreedyBot()
+    print(f'Publishing {map_file} as {publisher.get_name()}')
+    published = model.snapshot()
+
+    def publish() -> None:
+        nonlocal published
+        publisher.publish(model, model.diff(published))
+        published = model.snapshot()
+
+    try:
+        while True:
+            start = time.perf_counter()
+            for action, argument in bot.play_day(model):
+                model.apply_action(action, argument)
+                publish()
+            model.new_day()
+            publish()
+            time.sleep(max(interval - (time.perf_counter() - start), 0))
+    finally:
+        publisher.close()
+
+
+def view(name: str) -> None:
+    """ Opens a window showing a published farm, redrawn whenever it changes.
+    """
+    import tkinter as tk
+    from a3 import FarmView, InfoBar
+    from overview import ChunkOverview
+    from tiles import make_tile_rows
+    from worker import PlantSnapshot
+
+    reader = SharedFarmReader(name)
+    root = tk.Tk()
+    root.title(f'Farm Viewer - {name}')
+    info_bar = InfoBar(root)
+    overview = ChunkOverview()
+    farm_view = FarmView(root, reader.get_dimensions(),
+                         (FARM_WIDTH, FARM_WIDTH), overview)
+    last_sequence = None
+
+    def copy_frame(frame: SharedFrame) -> tuple:
+        return (frame.get_map(), frame.get_plants(), frame.position,
+                frame.direction, frame.day, frame.money, frame.energy)
+
+    def poll() -> None:
+        nonlocal last_sequence
+        if reader.get_sequence() != last_sequence:
+            last_sequence = reader.get_sequence()
+            (ground, plants, position, direction, day, money,
+             energy) = reader.read(copy_frame)
+            ground = make_tile_rows(ground)
+            plants = {cell: PlantSnapshot(species, stage)
+                      for cell, (species, stage) in plants.items()}
+            overview.update(ground, plants, None)
+            # The farm may have been replaced by one of another size
+            farm_view.set_dimensions(reader.get_dimensions())
+            farm_view.redraw(ground, plants, position, direction)
+            info_bar.redraw(day, money, energy)
+        root.after(POLL_INTERVAL, poll)
+
+    poll()
+    root.mainloop()
+    reader.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Share a simulated farm with viewer processes.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help='simulate and publish')
+    serve_parser.add_argument('map_file')
+    serve_parser.add_argument('--name', help='shared memory name')
+    serve_parser.add_argument('--interval', type=float, default=1.0,
+                              help='seconds per simulated day')
+    view_parser = commands.add_parser('view', help='show a published farm')
+    view_parser.add_argument('name')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.map_file, args.name, args.interval)
+    else:
+        view(args.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+""" Runs the farm game without a window, for batch and capacity testing.
+
+    Each map file is played for a number of days by the built-in GreedyBot or
+    by a scripted scenario, and one JSON line of metrics is written per map
+    per day. Map files are run in parallel across processes.
+
+    Usage:
+        python simulate.py maps/ --days 30 --jobs 4 --output metrics.jsonl
+        python simulate.py maps/map1.txt --scenario scenario.json
+        python simulate.py maps/ --weather 7
+
+    A scenario file holds a JSON list with one list of [action, argument]
+    pairs per day (see the *_ACTION constants); it repeats if it is shorter
+    than the run. Each day ends after its list, so lists must not contain
+    new_day.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from constants import *
+from model import FarmModel
+from bot import GreedyBot, ScenarioPlayer
+from weather import Weather
+
+# Queue through which worker processes stream metric lines
+_metrics_queue = None
+
+
+def find_maps(paths: list[str]) -> list[str]:
+    """ Returns the map files named by the given paths, expanding directories
+        to the text and binary map files they contain.
+    """
+    map_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            map_files.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.endswith(('.txt', BINARY_MAP_EXTENSION))))
+        else:
+            map_files.append(path)
+    return map_files
+
+
+def run_map(map_file: str, days: int, scenario: Optional[list],
+            emit, weather_seed: Optional[int] = None) -> None:
+    """ Plays one map for the given number of days, passing a dictionary of
+        metrics for each day to emit.
+
+    Parameters:
+        map_file: The path to the map to play.
+        days: The number of days to play.
+        scenario: The scripted actions for each day, or None to use the bot.
+        emit: Called with the metrics of each day as soon as it ends.
+        weather_seed: The seed of the map's weather, or None for no weather.
+    """
+    model = FarmModel(map_file)
+    if weather_seed is not None:
+        model.set_weather(Weather(weather_seed))
+    player = model.get_player()
+    playthrough = ScenarioPlayer(scenario) if scenario is not None \
+        else GreedyBot()
+
+    for _ in range(days):
+        start = time.perf_counter()
+        day = model.get_days_elapsed()
+        actions = 0
+        harvests = {}
+        for action, argument in playthrough.play_day(model):
+            result = model.apply_action(action, argument)
+            actions += 1
+            if result is not None:
+                item_name, amount = result
+                harvests[item_name] = harvests.get(item_name, 0) + amount
+        energy_used = player.START_ENERGY - player.get_energy()
+        money = player.get_money()
+        model.new_day()
+        emit({
+            'map': map_file,
+            'day': day,
+            'money': money,
+            'energy_used': energy_used,
+            'actions': actions,
+            'harvests': harvests,
+            'plants': len(model.get_plants()),
+            'wall_time': time.perf_counter() - start,
+        })
+
+
+def _init_process(metrics_queue) -> None:
+    """ Sets up a worker process to stream its metrics to the given queue. """
+    global _metrics_queue
+    _metrics_queue = metrics_queue
+
+
+def _run_in_process(task: tuple) -> str:
+    """ Runs one map in a worker process. """
+    map_file, days, scenario, weather_seed = task
+    run_map(map_file, days, scenario, _metrics_queue.put, weather_seed)
+    return map_file
+
+
+def run_all(map_files: list[str], days: int, scenario: Optional[list],
+            jobs: int, output, weather_seed: Optional[int] = None) -> None:
+    """ Plays every map, writing each day's metrics to output as a JSON line
+        as soon as it is available.
+
+    Parameters:
+        map_files: The maps to play.
+        days: The number of days to play each map for.
+        scenario: The scripted actions for each day, or None to use the bot.
+        jobs: The number of processes to run maps in.
+        output: The text file to write metrics to.
+        weather_seed: The seed of every map's weather, or None for no weather.
+    """
+    def write(metrics: dict) -> None:
+        output.write(json.dumps(metrics) + '\n')
+        output.flush()
+
+    if jobs <= 1 or len(map_files) <= 1:
+        for map_file in map_files:
+            run_map(map_file, days, scenario, write, weather_seed)
+        return
+
+    metrics_queue = multiprocessing.Queue()
+    with ProcessPoolExecutor(jobs, initializer=_init_process,
+                             initargs=(metrics_queue,)) as pool:
+        futures = [pool.submit(_run_in_process, (map_file, days, scenario,
+                                                 weather_seed))
+                   for map_file in map_files]
+        remaining = len(map_files) * days
+        while remaining > 0:
+            try:
+                write(metrics_queue.get(timeout=0.1))
+                remaining -= 1
+            except queue.Empty:
+                # Stop waiting if a map failed or its process died, which
+                # breaks the pool, re-raising the error
+                failed = [future for future in futures
+                          if future.done() and future.exception() is not None]
+                if failed:
+                    for future in futures:
+                        future.cancel()
+                    raise failed[0].exception()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Run the farm game headless over one or more maps.')
+    parser.add_argument('paths', nargs='+',
+                        help='map files, or directories of .txt and .fmap '
+                             'map files')
+    parser.add_argument('--days', type=int, default=30,
+                        help='number of days to play each map for')
+    parser.add_argument('--scenario',
+                        help='JSON file of scripted actions for each day '
+                             '(default: play with the built-in bot)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='number of maps to run in parallel')
+    parser.add_argument('--output',
+                        help='file to write JSON lines to (default: stdout)')
+    parser.add_argument('--weather', type=int, metavar='SEED',
+                        help='play with seasons and weather from this seed '
+                             '(default: no weather)')
+    args = parser.parse_args()
+
+    scenario = None
+    if args.scenario:
+        with open(args.scenario, 'r') as file:
+            scenario = json.load(file)
+
+    map_files = find_maps(args.paths)
+    if args.output:
+        with open(args.output, 'w') as output:
+            run_all(map_files, args.days, scenario, args.jobs, output,
+                    args.weather)
+    else:
+        run_all(map_files, args.days, scenario, args.jobs, sys.stdout,
+                args.weather)
+
+
+if __name__ == '__main__':
+    main()
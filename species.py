@@ -0,0 +1,163 @@
+import json
+from typing import Optional
+from constants import *
+from items import ITEM_REGISTRY, ItemRegistry
+
+
+class SpeciesRegistry:
+    """ Compiles plant species definitions (see PLANT_SPECIES) into flat lookup
+        tables indexed by species id, so that aging and harvesting any plant is
+        the same handful of table lookups regardless of its species.
+
+        The stage schedules of all species are concatenated into one table;
+        the stage of species s on day d (before maturity) is
+        stage_table[schedule_start[s] + d].
+    """
+
+    def __init__(self, species_data: list[dict],
+                 items: ItemRegistry = ITEM_REGISTRY) -> None:
+        """ Constructor for the species registry.
+
+        Parameters:
+            species_data: One dictionary per species, with the keys 'name',
+                          'seed', 'product', 'yield' and 'days_to_stage', and
+                          optionally 'regrow_stage' and 'regrow_days'.
+            items: The items that can be held, which must include every
+                   species' product.
+        """
+        self._names = []
+        self._ids = {}
+        self._seed_to_id = {}
+        self._seed_names = []
+        self._products = []
+        self._product_ids = []
+        self._yields = []
+        self._stage_table = []
+        self._schedule_start = []
+        self._maturity_day = []
+        self._harvest_stage = []
+        self._regrow_stage = []
+        self._regrow_days = []
+
+        for species in species_data:
+            name = species['name']
+            schedule = list(species['days_to_stage'])
+            if name in self._ids:
+                raise ValueError(f'Duplicate plant species {name!r}')
+            if not schedule:
+                raise ValueError(f'Species {name!r} has an empty schedule')
+
+            species_id = len(self._names)
+            self._names.append(name)
+            self._ids[name] = species_id
+            self._seed_to_id[species['seed']] = species_id
+            self._seed_names.append(species['seed'])
+            self._products.append(species['product'])
+            product_id = items.find_id(species['product'])
+            if product_id is None:
+                raise ValueError(f'Species {name!r} has an unknown product '
+                                 f'{species["product"]!r}')
+            self._product_ids.append(product_id)
+            self._yields.append(species.get('yield', 1))
+            self._schedule_start.append(len(self._stage_table))
+            self._stage_table.extend(schedule)
+            self._maturity_day.append(len(schedule) - 1)
+            self._harvest_stage.append(schedule[-1])
+            # A regrow stage of 0 means the plant is removed on harvest
+            self._regrow_stage.append(species.get('regrow_stage', 0))
+            self._regrow_days.append(species.get('regrow_days', 0))
+
+    def __reduce_ex__(self, protocol):
+        # The shared registry is pickled by name, so that saved games load
+        # with references to it rather than copies
+        if self is SPECIES_REGISTRY:
+            return 'SPECIES_REGISTRY'
+        return super().__reduce_ex__(protocol)
+
+    def __len__(self) -> int:
+        """ Returns the number of species in the registry. """
+        return len(self._names)
+
+    def get_id(self, name: str) -> int:
+        """ Returns the id of the species with the given name. """
+        return self._ids[name]
+
+    def get_name(self, species_id: int) -> str:
+        """ Returns the name of the species with the given id. """
+        return self._names[species_id]
+
+    def get_names(self) -> list[str]:
+        """ Returns the names of all species, in id order. """
+        return self._names
+
+    def find_by_seed(self, seed_name: str) -> Optional[int]:
+        """ Returns the id of the species grown from the given seed, or None if
+            the item is not a seed.
+        """
+        return self._seed_to_id.get(seed_name)
+
+    def get_seed(self, species_id: int) -> str:
+        """ Returns the name of the seed the given species grows from. """
+        return self._seed_names[species_id]
+
+    def get_product(self, species_id: int) -> str:
+        """ Returns the name of the item harvested from the given species. """
+        return self._products[species_id]
+
+    def get_product_id(self, species_id: int) -> int:
+        """ Returns the id of the item harvested from the given species, in
+            the registry's items.
+        """
+        return self._product_ids[species_id]
+
+    def get_yield(self, species_id: int) -> int:
+        """ Returns how many items one harvest of the given species yields. """
+        return self._yields[species_id]
+
+    def get_initial_stage(self, species_id: int) -> int:
+        """ Returns the stage of a newly planted plant of the given species. """
+        return self._stage_table[self._schedule_start[species_id]]
+
+    def get_maturity_day(self, species_id: int) -> int:
+        """ Returns how many days after planting the given species is first
+            ready for harvest.
+        """
+        return self._maturity_day[species_id]
+
+    def get_harvest_stage(self, species_id: int) -> int:
+        """ Returns the stage at which the given species can be harvested. """
+        return self._harvest_stage[species_id]
+
+    def get_regrow_stage(self, species_id: int) -> int:
+        """ Returns the stage the given species drops back to when harvested,
+            or 0 if it is removed on harvest instead.
+        """
+        return self._regrow_stage[species_id]
+
+    def get_tables(self) -> tuple[list[int], ...]:
+        """ Returns the compiled lookup tables, for use in bulk loops:
+            (stage_table, schedule_start, maturity_day, harvest_stage,
+             regrow_stage, regrow_days)
+        """
+        return (self._stage_table, self._schedule_start, self._maturity_day,
+                self._harvest_stage, self._regrow_stage, self._regrow_days)
+
+
+def load_species(species_file: str,
+                 items: ItemRegistry = ITEM_REGISTRY) -> SpeciesRegistry:
+    """ Reads a JSON file holding a list of species definitions in the same
+        format as PLANT_SPECIES, and compiles it into a registry.
+
+    Parameters:
+        species_file: The path to the species file.
+        items: The items that can be held, as for SpeciesRegistry.
+
+    Returns:
+        The compiled species registry.
+    """
+    with open(species_file, 'r') as file:
+        return SpeciesRegistry(json.load(file), items)
+
+
+# Registry for the plant species available in the game
+SPECIES_REGISTRY = SpeciesRegistry(PLANT_SPECIES)
@@ -0,0 +1,162 @@
+import numpy as np
+from constants import *
+
+
+class StateDelta:
+    """ The changes that turn one FarmModel state into another, as produced
+        by diff_states and applied by FarmModel.apply_delta.
+
+        Attributes that did not change are empty, or None for single values.
+        Plant states are (species id, stage, days, days since harvest) tuples,
+        as returned by Plant.get_state.
+    """
+    __slots__ = ('tiles', 'added_plants', 'changed_plants', 'removed_plants',
+                 'inventory', 'money', 'energy', 'day', 'position',
+                 'direction', 'selection_changed', 'selected_item',
+                 'storage', 'machines')
+
+    def __init__(self) -> None:
+        """ Constructor for an empty delta. """
+        # (row, col, new tile) of each changed tile
+        self.tiles = []
+        # New plant states by position
+        self.added_plants = {}
+        self.changed_plants = {}
+        self.removed_plants = []
+        # New amounts of the player's items and the machines' storage, by name
+        self.inventory = {}
+        self.money = None
+        self.energy = None
+        self.day = None
+        self.position = None
+        self.direction = None
+        # The selection may change to None, so it has a flag of its own
+        self.selection_changed = False
+        self.selected_item = None
+        self.storage = {}
+        # Every machine, if any machine changed, as from MachineSet.get_machines
+        self.machines = None
+
+    def is_empty(self) -> bool:
+        """ Returns True iff the two states were identical. """
+        return not (self.tiles or self.added_plants or self.changed_plants
+                    or self.removed_plants or self.inventory or self.storage
+                    or self.machines is not None or self.selection_changed
+                    or any(getattr(self, name) is not None for name in (
+                        'money', 'energy', 'day', 'position', 'direction')))
+
+    def get_dirty_rows(self) -> set[int]:
+        """ Returns the rows with a changed tile or plant, e.g. for redrawing
+            only the parts of a view that changed.
+        """
+        rows = {row for row, _, _ in self.tiles}
+        for positions in (self.added_plants, self.changed_plants,
+                          self.removed_plants):
+            rows.update(row for row, _ in positions)
+        return rows
+
+
+def _diff_tiles(old_rows, new_rows, delta: StateDelta) -> None:
+    """ Adds the tiles that differ between two maps to the delta. Chunks that
+        both maps still share are skipped without looking at their rows.
+    """
+    chunk_size = new_rows.get_chunk_size()
+    for chunk in range(new_rows.get_chunk_count()):
+        old_chunk = old_rows.get_chunk(chunk)
+        new_chunk = new_rows.get_chunk(chunk)
+        if old_chunk is new_chunk:
+            continue
+        for offset, (old_row, new_row) in enumerate(zip(old_chunk,
+                                                        new_chunk)):
+            if old_row is new_row or old_row == new_row:
+                continue
+            row = chunk * chunk_size + offset
+            # Rows may be stored other than as strings, e.g. as runs
+            new_bytes = str(new_row).encode()
+            changed = np.flatnonzero(
+                np.frombuffer(str(old_row).encode(), dtype=np.uint8)
+                != np.frombuffer(new_bytes, dtype=np.uint8))
+            delta.tiles.extend((row, col, chr(new_bytes[col]))
+                               for col in changed.tolist())
+
+
+def _diff_plants(old_plants, new_plants, delta: StateDelta) -> None:
+    """ Adds the plants that differ between two plant maps to the delta.
+        Blocks, and plants, that both maps still share are skipped.
+    """
+    old_blocks = old_plants.get_blocks()
+    new_blocks = new_plants.get_blocks()
+    if old_blocks is new_blocks:
+        return
+    for key in old_blocks.keys() | new_blocks.keys():
+        old_block = old_blocks.get(key, {})
+        new_block = new_blocks.get(key, {})
+        if old_block is new_block:
+            continue
+        for position in old_block.keys() - new_block.keys():
+            delta.removed_plants.append(position)
+        for position, plant in new_block.items():
+            old_plant = old_block.get(position)
+            if old_plant is None:
+                delta.added_plants[position] = plant.get_state()
+            elif old_plant is not plant:
+                state = plant.get_state()
+                if state != old_plant.get_state():
+                    delta.changed_plants[position] = state
+
+
+def _diff_amounts(old: np.ndarray, new: np.ndarray,
+                  names: list[str]) -> dict[str, int]:
+    """ Returns the new amounts of the items whose amounts differ. """
+    return {names[item_id]: int(new[item_id])
+            for item_id in np.flatnonzero(old != new).tolist()}
+
+
+def diff_states(old: 'FarmModel', new: 'FarmModel') -> StateDelta:
+    """ Returns the changes from one state of a farm to another.
+
+        The map and plants are compared chunk by chunk and block by block.
+        Forks and snapshots share every chunk, block and plant that neither
+        side has changed since, so the cost depends on how much changed,
+        not on the size of the farm.
+
+    Parameters:
+        old: The earlier state, e.g. a snapshot of the farm.
+        new: The later state. It must have the same dimensions.
+
+    Returns:
+        The delta that FarmModel.apply_delta needs to turn old into new.
+    """
+    if old.get_dimensions() != new.get_dimensions():
+        raise ValueError('Cannot diff farms of different dimensions')
+    delta = StateDelta()
+    _diff_tiles(old.get_map(), new.get_map(), delta)
+    _diff_plants(old.get_plants(), new.get_plants(), delta)
+
+    old_player, new_player = old.get_player(), new.get_player()
+    names = new_player.get_registry().get_names()
+    delta.inventory = _diff_amounts(old_player.get_inventory_array(),
+                                    new_player.get_inventory_array(), names)
+    for name, old_value, new_value in (
+            ('money', old_player.get_money(), new_player.get_money()),
+            ('energy', old_player.get_energy(), new_player.get_energy()),
+            ('day', old.get_days_elapsed(), new.get_days_elapsed()),
+            ('position', old_player.get_position(),
+             new_player.get_position()),
+            ('direction', old_player.get_direction(),
+             new_player.get_direction())):
+        if old_value != new_value:
+            setattr(delta, name, new_value)
+    if old_player.get_selected_item() != new_player.get_selected_item():
+        delta.selection_changed = True
+        delta.selected_item = new_player.get_selected_item()
+
+    old_machines, new_machines = old.get_machines(), new.get_machines()
+    delta.storage = _diff_amounts(old_machines.get_storage_array(),
+                                  new_machines.get_storage_array(), names)
+    # Equal versions mean the machines are unchanged, the usual case
+    if new_machines.get_version() != old_machines.get_version():
+        machines = new_machines.get_machines()
+        if machines != old_machines.get_machines():
+            delta.machines = machines
+    return delta
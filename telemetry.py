@@ -0,0 +1,240 @@
+from typing import Iterable, Optional
+import numpy as np
+from constants import *
+from items import ITEM_REGISTRY, ItemRegistry
+from species import SPECIES_REGISTRY, SpeciesRegistry
+
+
+class Telemetry:
+    """ Records per-day metrics of a FarmModel for capacity planning.
+
+        The history of the last `capacity` days is kept in ring buffers that
+        are allocated up front, and the totals of the day in progress in
+        accumulators that are cleared when the day ends, so recording never
+        grows memory however long the game runs.
+
+        The recorder can be rewound to a mark taken earlier, so that undoing
+        actions or days in the game also undoes what was recorded of them.
+
+        Series (each with one entry per recorded day):
+            day: The day that ended.
+            money: The player's money at the end of the day.
+            energy: Energy spent on each of ACTIONS.
+            plants: Plants on the farm at the end of the day, by species and
+                    stage.
+            harvests: Amount harvested, by item id.
+            trades: Number of units traded by the player.
+            trade_value: Money spent and received by the player in trades.
+            wall_time: Seconds the day transition took.
+    """
+    ACTIONS = (MOVE_ACTION, TILL_ACTION, UNTILL_ACTION, PLANT_ACTION,
+               HARVEST_ACTION, REMOVE_ACTION)
+    SERIES = ('day', 'money', 'energy', 'plants', 'harvests', 'trades',
+              'trade_value', 'wall_time')
+
+    def __init__(
+            self,
+            capacity: int = TELEMETRY_DAYS,
+            items: ItemRegistry = ITEM_REGISTRY,
+            species: SpeciesRegistry = SPECIES_REGISTRY
+        ) -> None:
+        """ Constructor for the recorder.
+
+        Parameters:
+            capacity: The number of days of history to keep.
+            items: The items that can be harvested.
+            species: The plant species that can be on the farm.
+        """
+        self._items = items
+        self._species = species
+        self._capacity = capacity
+        self._count = 0
+        # The first day whose slot has not been overwritten since, which is
+        # only past the oldest day of the history after rewinding
+        self._first_kept = 0
+        self._action_index = {action: i for i, action in
+                              enumerate(self.ACTIONS)}
+        num_stages = max(species.get_tables()[0]) + 1
+        self._num_stages = num_stages
+
+        self._series = {
+            'day': np.zeros(capacity, dtype=np.int64),
+            'money': np.zeros(capacity, dtype=np.int64),
+            'energy': np.zeros((capacity, len(self.ACTIONS)), dtype=np.int64),
+            'plants': np.zeros((capacity, len(species), num_stages),
+                               dtype=np.int64),
+            'harvests': np.zeros((capacity, len(items)), dtype=np.int64),
+            'trades': np.zeros(capacity, dtype=np.int64),
+            'trade_value': np.zeros(capacity, dtype=np.int64),
+            'wall_time': np.zeros(capacity, dtype=np.float64),
+        }
+        self._energy = np.zeros(len(self.ACTIONS), dtype=np.int64)
+        self._harvests = np.zeros(len(items), dtype=np.int64)
+        self._trades = 0
+        self._trade_value = 0
+
+    def __len__(self) -> int:
+        """ Returns the number of days of history held. """
+        return min(self._count - self._first_kept, self._capacity)
+
+    def get_capacity(self) -> int:
+        """ Returns the number of days of history kept. """
+        return self._capacity
+
+    def get_days_recorded(self) -> int:
+        """ Returns the number of days recorded, including any overwritten. """
+        return self._count
+
+    def record_action(self, action: str, energy: int) -> None:
+        """ Records the energy spent on one player action of the day.
+
+        Parameters:
+            action: The action performed. Actions not in ACTIONS are ignored.
+            energy: The energy the action used.
+        """
+        index = self._action_index.get(action)
+        if index is not None:
+            self._energy[index] += energy
+
+    def record_harvest(self, item_name: str, amount: int) -> None:
+        """ Records a harvest of the day. """
+        self.record_harvest_id(self._items.get_id(item_name), amount)
+
+    def record_harvest_id(self, item_id: int, amount: int) -> None:
+        """ Records a harvest of the day, of the item with the given id. """
+        self._harvests[item_id] += amount
+
+    def record_trade(self, quantity: int, value: int) -> None:
+        """ Records one of the player's trades of the day.
+
+        Parameters:
+            quantity: The number of units traded.
+            value: The money that changed hands.
+        """
+        self._trades += quantity
+        self._trade_value += value
+
+    def get_mark(self) -> tuple:
+        """ Returns the current point of the recording, to pass to rewind()
+            later.
+        """
+        return (self._count, self._energy.copy(), self._harvests.copy(),
+                self._trades, self._trade_value)
+
+    def rewind(self, mark: tuple) -> None:
+        """ Returns the recording to a mark from get_mark(), e.g. when the
+            game is restored to the state it was in then. Days that ended
+            after the mark are forgotten, and the totals of the day in
+            progress are those at the mark. Returning to a later mark, e.g.
+            to redo, brings back the days recorded before it, as long as no
+            day has been recorded since leaving it.
+        """
+        count, energy, harvests, trades, trade_value = mark
+        # Days recorded since the mark may have overwritten older ones
+        self._first_kept = min(max(self._first_kept,
+                                   self._count - self._capacity), count)
+        self._count = count
+        self._energy[:] = energy
+        self._harvests[:] = harvests
+        self._trades = trades
+        self._trade_value = trade_value
+
+    def end_day(self, day: int, money: int,
+                plants: Iterable[tuple[tuple[int, int, int, int], int]],
+                wall_time: float) -> None:
+        """ Stores the metrics of the day that just ended, overwriting the
+            oldest day if the history is full, and starts a new day.
+
+        Parameters:
+            day: The day that ended.
+            money: The player's money at the end of the day.
+            plants: (state, number of plants) for each state of the plants
+                    on the farm, with states starting (species id, stage, ...)
+                    as from PlantCensus.get_items. Counting by state keeps
+                    this independent of the size of the farm.
+            wall_time: Seconds the day transition took.
+        """
+        series = self._series
+        slot = self._count % self._capacity
+
+        # Counted straight into the day's slot
+        plant_counts = series['plants'][slot]
+        plant_counts.fill(0)
+        for state, count in plants:
+            plant_counts[state[0], state[1]] += count
+
+        series['day'][slot] = day
+        series['money'][slot] = money
+        series['energy'][slot] = self._energy
+        series['harvests'][slot] = self._harvests
+        series['trades'][slot] = self._trades
+        series['trade_value'][slot] = self._trade_value
+        series['wall_time'][slot] = wall_time
+        self._count += 1
+
+        self._energy.fill(0)
+        self._harvests.fill(0)
+        self._trades = 0
+        self._trade_value = 0
+
+    def get_series(self, name: str, days: Optional[int] = None) -> np.ndarray:
+        """ Returns a copy of one series, oldest day first.
+
+        Parameters:
+            name: One of SERIES.
+            days: If given, only the most recent number of days.
+        """
+        held = len(self)
+        days = held if days is None else min(days, held)
+        # Slots run oldest to newest, ending just before the next slot written
+        end = self._count % self._capacity
+        return self._series[name][np.arange(end - days, end) % self._capacity]
+
+    def get_sparklines(self, days: int = SPARKLINE_DAYS
+                       ) -> dict[str, np.ndarray]:
+        """ Returns the recent totals shown by the game's sparkline panel:
+            money, plants, harvests and day time (ms), oldest day first.
+        """
+        return {
+            'Money': self.get_series('money', days),
+            'Plants': self.get_series('plants', days).sum(axis=(1, 2)),
+            'Harvest': self.get_series('harvests', days).sum(axis=1),
+            'Day ms': self.get_series('wall_time', days) * 1000,
+        }
+
+    def _columns(self) -> tuple[list[str], np.ndarray]:
+        """ Returns the names and values of every column of the history, one
+            column per scalar series and per entry of the other series.
+        """
+        names = ['day', 'money', 'trades', 'trade_value', 'wall_time']
+        columns = [self.get_series(name) for name in names]
+        for action, values in zip(self.ACTIONS,
+                                  self.get_series('energy').T):
+            names.append(f'energy_{action}')
+            columns.append(values)
+        harvests = self.get_series('harvests')
+        for item_id, item_name in enumerate(self._items.get_names()):
+            names.append(f'harvest_{item_name}')
+            columns.append(harvests[:, item_id])
+        plants = self.get_series('plants')
+        for species_id, species_name in enumerate(self._species.get_names()):
+            for stage in range(self._num_stages):
+                names.append(f'plants_{species_name}_{stage}')
+                columns.append(plants[:, species_id, stage])
+        return names, np.column_stack(columns)
+
+    def export_csv(self, path: str) -> None:
+        """ Writes the history to a CSV file, one row per day. """
+        names, table = self._columns()
+        formats = ['%d'] * len(names)
+        formats[names.index('wall_time')] = '%.6f'
+        np.savetxt(path, table, fmt=formats, delimiter=',',
+                   header=','.join(names), comments='')
+
+    def export_npz(self, path: str) -> None:
+        """ Writes the history to a compressed NumPy archive with one array
+            per series, oldest day first.
+        """
+        np.savez_compressed(path, **{name: self.get_series(name)
+                                     for name in self.SERIES})
+
@@ -0,0 +1,307 @@
+import re
+from array import array
+from bisect import bisect_right
+from typing import Iterable, Iterator, Optional, Sequence
+import numpy as np
+from constants import *
+from cow import CowRows
+
+# Matches each run of equal tiles in a map row
+_RUN = re.compile(r'(.)\1*')
+# Translation tables turning a map row into a string of bits, by tile
+_BIT_TABLES = {}
+
+
+class TileRows(CowRows):
+    """ The rows of a farm's map, stored copy-on-write as one string per row.
+
+        Besides the sequence of row strings, tile stores offer single tile
+        lookups and updates and iteration over runs of equal tiles, so that
+        callers need not care how the tiles are stored.
+    """
+    __slots__ = ()
+
+    def get_width(self) -> int:
+        """ Returns the number of columns in the map. """
+        return len(self[0]) if len(self) else 0
+
+    def get_tile(self, row: int, col: int) -> str:
+        """ Returns the tile at the given row and column. """
+        return self[row][col]
+
+    def set_tile(self, row: int, col: int, tile: str) -> None:
+        """ Replaces the tile at the given row and column. """
+        text = self[row]
+        self[row] = text[:col] + tile + text[col + 1:]
+
+    def set_tiles(self, row: int, changes: Iterable[tuple[int, str]]) -> None:
+        """ Replaces several tiles of one row, given as (column, tile). """
+        tiles = bytearray(self[row].encode())
+        for col, tile in changes:
+            tiles[col] = ord(tile)
+        self[row] = tiles.decode()
+
+    def get_tile_bits(self, row: int, tile: str) -> int:
+        """ Returns an int with bit c set iff column c of a row holds the
+            given tile.
+        """
+        table = _BIT_TABLES.get(tile)
+        if table is None:
+            table = _BIT_TABLES[tile] = str.maketrans(
+                {other: '1' if other == tile else '0'
+                 for other in TILE_CODES})
+        return int(self[row].translate(table)[::-1] or '0', 2)
+
+    def get_runs(self, row: int, start: int = 0,
+                 stop: Optional[int] = None) -> Iterator[tuple[int, int, str]]:
+        """ Yields (start, stop, tile) for each run of equal tiles in a row,
+            clipped to the columns from start to stop (exclusive).
+        """
+        text = self[row]
+        stop = len(text) if stop is None else min(stop, len(text))
+        for match in _RUN.finditer(text, start, stop):
+            yield match.start(), match.end(), match.group(1)
+
+    def get_tile_bytes(self, top: int, left: int, bottom: int,
+                       right: int) -> np.ndarray:
+        """ Returns the tiles in the rows from top to bottom and columns from
+            left to right (both exclusive), as a uint8 array of characters.
+        """
+        return np.frombuffer(
+            ''.join(self[row][left:right]
+                    for row in range(top, bottom)).encode(),
+            dtype=np.uint8).reshape(bottom - top, right - left)
+
+
+class RunRow:
+    """ One map row stored as runs of equal tiles: the column just past the
+        end of each run, and the tile of each run. Rows are immutable, so
+        forks of a map can share them.
+    """
+    __slots__ = ('_ends', '_tiles')
+
+    def __init__(self, ends: array, tiles: str) -> None:
+        """ Constructor for the row.
+
+        Parameters:
+            ends: The column after the last of each run, in increasing order.
+            tiles: The tile of each run, one character per run.
+        """
+        self._ends = ends
+        self._tiles = tiles
+
+    @classmethod
+    def from_text(cls, text: str) -> 'RunRow':
+        """ Returns the runs of a row given as a string of tiles. """
+        if not text:
+            return cls(array('i'), '')
+        codes = np.frombuffer(text.encode(), dtype=np.uint8)
+        ends = np.append(np.flatnonzero(codes[1:] != codes[:-1]) + 1,
+                         len(codes))
+        return cls(array('i', ends.tolist()),
+                   codes[ends - 1].tobytes().decode())
+
+    def __len__(self) -> int:
+        return self._ends[-1] if self._ends else 0
+
+    def __getitem__(self, col: int) -> str:
+        if not 0 <= col < len(self):
+            raise IndexError('RunRow index out of range')
+        return self._tiles[bisect_right(self._ends, col)]
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, RunRow) and self._ends == other._ends \
+            and self._tiles == other._tiles
+
+    def __str__(self) -> str:
+        start = 0
+        parts = []
+        for end, tile in zip(self._ends, self._tiles):
+            parts.append(tile * (end - start))
+            start = end
+        return ''.join(parts)
+
+    def get_run_count(self) -> int:
+        """ Returns the number of runs in the row. """
+        return len(self._tiles)
+
+    def runs(self, start: int = 0, stop: Optional[int] = None
+             ) -> Iterator[tuple[int, int, str]]:
+        """ Yields (start, stop, tile) for each run, clipped to the columns
+            from start to stop (exclusive).
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        ends, tiles = self._ends, self._tiles
+        index = bisect_right(ends, start)
+        while start < stop:
+            end = min(ends[index], stop)
+            yield start, end, tiles[index]
+            start = end
+            index += 1
+
+    def with_tile(self, col: int, tile: str) -> 'RunRow':
+        """ Returns this row with the tile at the given column replaced,
+            splitting its run and merging it with equal neighbours.
+        """
+        ends, tiles = self._ends, self._tiles
+        index = bisect_right(ends, col)
+        if tiles[index] == tile:
+            return self
+        # Rebuild the run and its neighbours, the only runs that can change
+        low, high = max(index - 1, 0), min(index + 2, len(tiles))
+        pieces = []
+        for run in range(low, high):
+            if run != index:
+                pieces.append((ends[run], tiles[run]))
+                continue
+            start = ends[run - 1] if run else 0
+            if col > start:
+                pieces.append((col, tiles[run]))
+            pieces.append((col + 1, tile))
+            if ends[run] > col + 1:
+                pieces.append((ends[run], tiles[run]))
+        merged = []
+        for end, piece_tile in pieces:
+            if merged and merged[-1][1] == piece_tile:
+                merged[-1] = (end, piece_tile)
+            else:
+                merged.append((end, piece_tile))
+        return RunRow(
+            ends[:low] + array('i', [end for end, _ in merged]) + ends[high:],
+            tiles[:low] + ''.join(piece_tile for _, piece_tile in merged)
+            + tiles[high:])
+
+    def with_tiles(self, changes: Iterable[tuple[int, str]]) -> 'RunRow':
+        """ Returns this row with several tiles replaced, given as (column,
+            tile), in one pass over the runs and the sorted changes.
+        """
+        changes = sorted(dict(changes).items())
+        if len(changes) <= 1:
+            return self.with_tile(*changes[0]) if changes else self
+        ends, tiles = self._ends, self._tiles
+        new_ends, new_tiles = [], []
+
+        def add(end: int, tile: str) -> None:
+            # Extends the last run if it has the same tile
+            if new_ends and end <= new_ends[-1]:
+                return
+            if new_tiles and new_tiles[-1] == tile:
+                new_ends[-1] = end
+            else:
+                new_ends.append(end)
+                new_tiles.append(tile)
+
+        run = 0
+        for col, tile in changes:
+            while ends[run] <= col:
+                add(ends[run], tiles[run])
+                run += 1
+            add(col, tiles[run])
+            add(col + 1, tile)
+        for rest in range(run, len(tiles)):
+            add(ends[rest], tiles[rest])
+        return RunRow(array('i', new_ends), ''.join(new_tiles))
+
+
+class RunTileRows(TileRows):
+    """ The rows of a farm's map, stored copy-on-write as runs of equal
+        tiles.
+
+        Maps that are mostly large areas of one tile take a small fraction
+        of the memory of one string per row. Looking up a tile takes a binary
+        search of its row's runs, and changing one rebuilds only that row's
+        runs, never its string. Indexing the rows still gives strings, built
+        on demand, so prefer get_tile and get_runs.
+    """
+    __slots__ = ()
+
+    def __init__(self, values: Sequence[str | RunRow],
+                 chunk_size: int = COW_CHUNK_ROWS) -> None:
+        """ Constructor for the rows.
+
+        Parameters:
+            values: The initial rows, as strings of tiles or their runs.
+            chunk_size: How many rows to store per chunk.
+        """
+        super().__init__([value if isinstance(value, RunRow)
+                          else RunRow.from_text(value) for value in values],
+                         chunk_size)
+
+    def __getitem__(self, index: int) -> str:
+        return str(super().__getitem__(index))
+
+    def __setitem__(self, index: int, value: str) -> None:
+        super().__setitem__(index, RunRow.from_text(value))
+
+    def __iter__(self) -> Iterator[str]:
+        for run_row in super().__iter__():
+            yield str(run_row)
+
+    def get_run_row(self, row: int) -> RunRow:
+        """ Returns the runs of a row. """
+        return CowRows.__getitem__(self, row)
+
+    def get_width(self) -> int:
+        return len(self.get_run_row(0)) if len(self) else 0
+
+    def get_tile(self, row: int, col: int) -> str:
+        chunk, offset = divmod(row, self._chunk_size)
+        run_row = self._chunks[chunk][offset]
+        return run_row._tiles[bisect_right(run_row._ends, col)]
+
+    def set_tile(self, row: int, col: int, tile: str) -> None:
+        run_row = self.get_run_row(row)
+        changed = run_row.with_tile(col, tile)
+        if changed is not run_row:
+            CowRows.__setitem__(self, row, changed)
+
+    def set_tiles(self, row: int, changes: Iterable[tuple[int, str]]) -> None:
+        run_row = self.get_run_row(row)
+        changed = run_row.with_tiles(changes)
+        if changed is not run_row:
+            CowRows.__setitem__(self, row, changed)
+
+    def get_tile_bits(self, row: int, tile: str) -> int:
+        bits = 0
+        for start, stop, run_tile in self.get_runs(row):
+            if run_tile == tile:
+                bits |= ((1 << (stop - start)) - 1) << start
+        return bits
+
+    def get_runs(self, row: int, start: int = 0,
+                 stop: Optional[int] = None) -> Iterator[tuple[int, int, str]]:
+        return self.get_run_row(row).runs(start, stop)
+
+    def get_tile_bytes(self, top: int, left: int, bottom: int,
+                       right: int) -> np.ndarray:
+        tiles = np.empty((bottom - top, right - left), dtype=np.uint8)
+        if left >= right:
+            return tiles
+        for row in range(top, bottom):
+            starts, ends, row_tiles = zip(*self.get_runs(row, left, right))
+            tiles[row - top] = np.repeat(
+                np.frombuffer(''.join(row_tiles).encode(), dtype=np.uint8),
+                np.subtract(ends, starts))
+        return tiles
+
+
+def make_tile_rows(rows: Sequence[str], store: str = TILE_STORE) -> TileRows:
+    """ Returns the rows of a map in the given tile store.
+
+    Parameters:
+        rows: The rows of the map, as strings of tiles.
+        store: DENSE_TILES, RUN_TILES, or AUTO_TILES to store them as runs
+               if their runs average at least TILE_RUN_MIN_LENGTH tiles.
+    """
+    if store == AUTO_TILES:
+        run_rows = [RunRow.from_text(text) for text in rows]
+        tiles = sum(map(len, run_rows))
+        runs = sum(run_row.get_run_count() for run_row in run_rows)
+        if runs and tiles / runs >= TILE_RUN_MIN_LENGTH:
+            return RunTileRows(run_rows)
+        store = DENSE_TILES
+    if store == RUN_TILES:
+        return RunTileRows(rows)
+    if store == DENSE_TILES:
+        return TileRows(rows)
+    raise ValueError(f'Unknown tile store: {store}')
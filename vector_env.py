@@ -0,0 +1,299 @@
+import numpy as np
+from constants import *
+from a3_support import read_map
+from items import ITEM_REGISTRY, ItemRegistry
+from species import SPECIES_REGISTRY, SpeciesRegistry
+from model import Player
+
+
+class VectorFarmEnv:
+    """ N copies of one farm, stored as stacked NumPy arrays and stepped
+        together with one action per farm, for training agents.
+
+        The rules are the same as FarmModel.move_player, till_soil,
+        untill_soil, plant_seed, harvest_plant (with the harvest added to the
+        inventory), remove_plant and new_day, but each step applies to every
+        farm at once with array operations. Planting takes the species as
+        part of the action instead of using a selected item.
+
+        Each farm's reward for a step is the value of what it harvested at the
+        store's SELL_PRICES.
+    """
+    NOOP = 0
+    MOVE_UP = 1
+    MOVE_LEFT = 2
+    MOVE_DOWN = 3
+    MOVE_RIGHT = 4
+    TILL = 5
+    UNTILL = 6
+    HARVEST = 7
+    REMOVE = 8
+    NEW_DAY = 9
+    # Planting a plant of species s is action PLANT + s
+    PLANT = 10
+
+    # Row and column deltas for the move actions, in action order
+    _DIRECTIONS = [UP, LEFT, DOWN, RIGHT]
+    _ROW_DELTAS = np.array([MOVE_DELTAS[d][0] for d in _DIRECTIONS])
+    _COL_DELTAS = np.array([MOVE_DELTAS[d][1] for d in _DIRECTIONS])
+
+    def __init__(
+            self,
+            map_file: str,
+            num_farms: int,
+            species: SpeciesRegistry = SPECIES_REGISTRY,
+            items: ItemRegistry = ITEM_REGISTRY
+        ) -> None:
+        """ Constructor for the environment.
+
+        Parameters:
+            map_file: The path to the map every farm starts from.
+            num_farms: The number of farms to step at once.
+            species: The plant species that can be planted.
+            items: The items the players can hold.
+        """
+        rows = read_map(map_file)
+        self._initial_tiles = np.array(
+            [[TILE_CODES[tile] for tile in row] for row in rows],
+            dtype=np.uint8)
+        self._num_farms = num_farms
+        self._initial_inventory = Player(items).get_inventory_array()
+
+        (stage_table, schedule_start, maturity_day, harvest_stage,
+         regrow_stage, regrow_days) = species.get_tables()
+        self._stage_table = np.array(stage_table, dtype=np.int8)
+        self._schedule_start = np.array(schedule_start)
+        self._maturity_day = np.array(maturity_day)
+        self._harvest_stage = np.array(harvest_stage, dtype=np.int8)
+        self._regrow_stage = np.array(regrow_stage, dtype=np.int8)
+        self._regrow_days = np.array(regrow_days)
+        self._seed_ids = np.array([items.get_id(species.get_seed(s))
+                                   for s in range(len(species))])
+        self._product_ids = np.array([items.get_id(species.get_product(s))
+                                      for s in range(len(species))])
+        self._yields = np.array([species.get_yield(s)
+                                 for s in range(len(species))])
+        self._harvest_values = \
+            self._yields * items.get_sell_prices()[self._product_ids]
+        self._num_actions = self.PLANT + len(species)
+        self.reset()
+
+    def get_num_farms(self) -> int:
+        """ Returns the number of farms stepped at once. """
+        return self._num_farms
+
+    def get_num_actions(self) -> int:
+        """ Returns the number of distinct actions. """
+        return self._num_actions
+
+    def reset(self) -> dict[str, np.ndarray]:
+        """ Returns every farm to the start of the game.
+
+        Returns:
+            The observation of the new state, as for get_observation.
+        """
+        n = self._num_farms
+        rows, cols = self._initial_tiles.shape
+        self._farms = np.arange(n)
+        self._tiles = np.broadcast_to(self._initial_tiles,
+                                      (n, rows, cols)).copy()
+        # Species id of the plant in each cell, or -1 for no plant
+        self._species = np.full((n, rows, cols), -1, dtype=np.int16)
+        self._stage = np.zeros((n, rows, cols), dtype=np.int8)
+        self._days = np.zeros((n, rows, cols), dtype=np.int32)
+        self._since_harvest = np.zeros((n, rows, cols), dtype=np.int32)
+        self._energy = np.full(n, Player.START_ENERGY, dtype=np.int64)
+        self._money = np.zeros(n, dtype=np.int64)
+        self._inventory = np.tile(self._initial_inventory, (n, 1))
+        self._row = np.zeros(n, dtype=np.int64)
+        self._col = np.zeros(n, dtype=np.int64)
+        # Index into _DIRECTIONS of the way each player is facing
+        self._direction = np.full(n, self._DIRECTIONS.index(DOWN),
+                                  dtype=np.int8)
+        self._day = np.ones(n, dtype=np.int64)
+        return self.get_observation()
+
+    def get_observation(self) -> dict[str, np.ndarray]:
+        """ Returns the state of every farm. The arrays are the environment's
+            own and are updated in place by step, so copy any that must be
+            kept.
+
+        Returns:
+            A dictionary of arrays with the farm index as their first axis:
+            'tiles' and 'plants' (species id or -1) and 'stage' per cell,
+            'row', 'col', 'direction', 'energy', 'money', 'day' per farm, and
+            'inventory' per farm and item id.
+        """
+        return {
+            'tiles': self._tiles,
+            'plants': self._species,
+            'stage': self._stage,
+            'row': self._row,
+            'col': self._col,
+            'direction': self._direction,
+            'energy': self._energy,
+            'money': self._money,
+            'inventory': self._inventory,
+            'day': self._day,
+        }
+
+    def step(self, actions: np.ndarray) -> tuple[dict[str, np.ndarray],
+                                                 np.ndarray]:
+        """ Applies one action to each farm.
+
+        Parameters:
+            actions: One action per farm, as an integer array.
+
+        Returns:
+            The observation of the new state and each farm's reward.
+        """
+        actions = np.asarray(actions)
+        rewards = np.zeros(self._num_farms, dtype=np.int64)
+        energy = self._energy
+
+        moving = np.flatnonzero((actions >= self.MOVE_UP)
+                                & (actions <= self.MOVE_RIGHT)
+                                & (energy >= MOVE_COST))
+        if moving.size:
+            self._move(moving, actions[moving] - self.MOVE_UP)
+
+        tilling = np.flatnonzero((actions == self.TILL)
+                                 & (energy >= TILL_COST))
+        if tilling.size:
+            cells = (tilling, self._row[tilling], self._col[tilling])
+            done = self._tiles[cells] == TILE_CODES[UNTILLED]
+            self._tiles[tuple(axis[done] for axis in cells)] = \
+                TILE_CODES[SOIL]
+            energy[tilling[done]] -= TILL_COST
+
+        untilling = np.flatnonzero((actions == self.UNTILL)
+                                   & (energy >= UNTILL_COST))
+        if untilling.size:
+            cells = (untilling, self._row[untilling], self._col[untilling])
+            done = (self._tiles[cells] == TILE_CODES[SOIL]) \
+                & (self._species[cells] < 0)
+            self._tiles[tuple(axis[done] for axis in cells)] = \
+                TILE_CODES[UNTILLED]
+            energy[untilling[done]] -= UNTILL_COST
+
+        planting = np.flatnonzero(actions >= self.PLANT)
+        if planting.size:
+            self._plant(planting, actions[planting] - self.PLANT)
+
+        harvesting = np.flatnonzero((actions == self.HARVEST)
+                                    & (energy >= HARVEST_COST))
+        if harvesting.size:
+            self._harvest(harvesting, rewards)
+
+        removing = np.flatnonzero((actions == self.REMOVE)
+                                  & (energy >= REMOVE_COST))
+        if removing.size:
+            cells = (removing, self._row[removing], self._col[removing])
+            done = self._species[cells] >= 0
+            self._clear_cells(tuple(axis[done] for axis in cells))
+            energy[removing[done]] -= REMOVE_COST
+
+        new_day = np.flatnonzero(actions == self.NEW_DAY)
+        if new_day.size:
+            self._new_day(new_day)
+
+        return self.get_observation(), rewards
+
+    def _move(self, farms: np.ndarray, directions: np.ndarray) -> None:
+        """ Moves the players of the given farms, capped at the map edges. """
+        rows, cols = self._initial_tiles.shape
+        old_row, old_col = self._row[farms], self._col[farms]
+        new_row = np.clip(old_row + self._ROW_DELTAS[directions], 0, rows - 1)
+        new_col = np.clip(old_col + self._COL_DELTAS[directions], 0, cols - 1)
+        moved = (new_row != old_row) | (new_col != old_col)
+        self._row[farms] = new_row
+        self._col[farms] = new_col
+        self._direction[farms] = directions
+        self._energy[farms] -= MOVE_COST * moved
+
+    def _plant(self, farms: np.ndarray, species: np.ndarray) -> None:
+        """ Plants the given species under the players of the given farms. As
+            with FarmModel.plant_seed, the seed is used up whenever the player
+            is on soil and has one, even if there is no energy or room for it.
+        """
+        seeds = self._seed_ids[species]
+        cells = (farms, self._row[farms], self._col[farms])
+        usable = (self._tiles[cells] == TILE_CODES[SOIL]) \
+            & (self._inventory[farms, seeds] > 0)
+        farms, species, seeds = farms[usable], species[usable], seeds[usable]
+        cells = tuple(axis[usable] for axis in cells)
+
+        done = (self._energy[farms] >= PLANT_COST) & (self._species[cells] < 0)
+        planted = tuple(axis[done] for axis in cells)
+        self._species[planted] = species[done]
+        self._stage[planted] = self._stage_table[
+            self._schedule_start[species[done]]]
+        self._days[planted] = 0
+        self._since_harvest[planted] = 0
+        self._energy[farms[done]] -= PLANT_COST
+        self._inventory[farms, seeds] -= 1
+
+    def _harvest(self, farms: np.ndarray, rewards: np.ndarray) -> None:
+        """ Harvests ready plants under the players of the given farms into
+            their inventories, recording the value of each harvest.
+        """
+        cells = (farms, self._row[farms], self._col[farms])
+        species = self._species[cells]
+        planted = species >= 0
+        ready = planted.copy()
+        ready[planted] = self._stage[cells][planted] \
+            == self._harvest_stage[species[planted]]
+        farms, species = farms[ready], species[ready]
+        cells = tuple(axis[ready] for axis in cells)
+
+        self._inventory[farms, self._product_ids[species]] += \
+            self._yields[species]
+        rewards[farms] += self._harvest_values[species]
+
+        regrow_stage = self._regrow_stage[species]
+        regrows = regrow_stage > 0
+        regrown = tuple(axis[regrows] for axis in cells)
+        self._stage[regrown] = regrow_stage[regrows]
+        self._since_harvest[regrown] = 0
+
+        # Removing the plant needs energy of its own, checked before the cost
+        # of harvesting is paid
+        removed = ~regrows & (self._energy[farms] >= REMOVE_COST)
+        self._clear_cells(tuple(axis[removed] for axis in cells))
+        self._energy[farms[removed]] -= REMOVE_COST
+        self._energy[farms] -= HARVEST_COST
+
+    def _clear_cells(self, cells: tuple[np.ndarray, ...]) -> None:
+        """ Removes the plants in the given (farm, row, col) cells. """
+        self._species[cells] = -1
+        self._stage[cells] = 0
+        self._days[cells] = 0
+        self._since_harvest[cells] = 0
+
+    def _new_day(self, farms: np.ndarray) -> None:
+        """ Ages every plant on the given farms and restores their players'
+            energy, as in FarmModel.new_day.
+        """
+        species = self._species[farms]
+        planted = species >= 0
+        species = np.where(planted, species, 0)
+        maturity = self._maturity_day[species]
+
+        days = self._days[farms] + planted
+        growing = planted & (days <= maturity)
+        mature = planted & ~growing
+        stage = np.where(
+            growing,
+            self._stage_table[self._schedule_start[species]
+                              + np.minimum(days, maturity)],
+            self._stage[farms])
+        since_harvest = self._since_harvest[farms] + mature
+        stage = np.where(
+            mature & (since_harvest >= self._regrow_days[species]),
+            self._harvest_stage[species], stage)
+
+        self._days[farms] = days
+        self._stage[farms] = stage
+        self._since_harvest[farms] = since_harvest
+        self._energy[farms] = Player.START_ENERGY
+        self._day[farms] += 1
@@ -0,0 +1,92 @@
+import numpy as np
+from constants import *
+from counter_rng import uniform
+
+# Random streams, so that independent choices never share random numbers
+_EVENT_STREAM = 0
+_FROST_STREAM = 1
+
+
+class Weather:
+    """ The seasons and the weather of a farm.
+
+        The farm is split into square regions, and each region has one
+        weather event each day, drawn with the chances of the day's season.
+        Events and frost damage come from counter-based random streams of the
+        seed, day and region or cell, so the weather of any day anywhere can
+        be found directly, and whole grids of regions are drawn at once.
+    """
+
+    def __init__(self, seed: int = 0, region_size: int = WEATHER_REGION,
+                 season_days: int = SEASON_DAYS,
+                 season_weather: dict[str, dict[str, float]] = SEASON_WEATHER,
+                 frost_kill_chance: float = FROST_KILL_CHANCE) -> None:
+        """ Constructor for the weather.
+
+        Parameters:
+            seed: The seed for all random choices.
+            region_size: The width and height of each region, in cells.
+            season_days: The length of each season, in days.
+            season_weather: The chance of each event other than CALM, by
+                            season.
+            frost_kill_chance: The chance that frost kills each plant in its
+                               region.
+        """
+        self._seed = seed
+        self._region_size = region_size
+        self._season_days = season_days
+        self._frost_kill_chance = frost_kill_chance
+        # Upper bounds of a uniform value for each event after CALM
+        self._thresholds = {
+            season: np.cumsum([chances.get(event, 0.0)
+                               for event in WEATHER_EVENTS[1:]])
+            for season, chances in season_weather.items()
+        }
+
+    def get_region_size(self) -> int:
+        """ Returns the width and height of each region, in cells. """
+        return self._region_size
+
+    def get_season(self, day: int) -> str:
+        """ Returns the season of the given day, starting with day 1. """
+        return SEASONS[(day - 1) // self._season_days % len(SEASONS)]
+
+    def get_events(self, day: int, dimensions: tuple[int, int]) -> np.ndarray:
+        """ Returns the event of every region of a farm on the given day.
+
+        Parameters:
+            day: The day.
+            dimensions: The (rows, columns) of the farm.
+
+        Returns:
+            An array with one entry per region, indexing WEATHER_EVENTS.
+        """
+        size = self._region_size
+        rows = np.arange(-(-dimensions[0] // size))[:, None]
+        cols = np.arange(-(-dimensions[1] // size))[None, :]
+        return self._pick_events(day, uniform(self._seed, _EVENT_STREAM, day,
+                                              rows, cols))
+
+    def get_event(self, day: int, position: tuple[int, int]) -> str:
+        """ Returns the event on the given day in the region of a cell. """
+        size = self._region_size
+        return WEATHER_EVENTS[int(self._pick_events(day, uniform(
+            self._seed, _EVENT_STREAM, day, position[0] // size,
+            position[1] // size)))]
+
+    def _pick_events(self, day: int, values: np.ndarray) -> np.ndarray:
+        """ Returns the event, indexing WEATHER_EVENTS, picked by each uniform
+            random value with the chances of the day's season.
+        """
+        index = np.searchsorted(self._thresholds[self.get_season(day)], values,
+                                side='right')
+        # Values beyond every event's chance are CALM, the first event
+        return ((index + 1) % len(WEATHER_EVENTS)).astype(np.int8)
+
+    def get_frost_kills(self, day: int, rows: np.ndarray,
+                        cols: np.ndarray) -> np.ndarray:
+        """ Returns whether frost on the given day kills a plant at each of
+            the given cells, were there frost in their region.
+        """
+        return uniform(self._seed, _FROST_STREAM, day, rows, cols) \
+            < self._frost_kill_chance
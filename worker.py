@@ -0,0 +1,328 @@
+import queue
+import threading
+import traceback
+from typing import Optional
+from constants import *
+from model import FarmModel
+from state_diff import StateDelta
+
+
+class PlantSnapshot:
+    """ An immutable record of a plant's appearance, usable anywhere a Plant is
+        only being drawn (e.g. with get_plant_image_name).
+    """
+    __slots__ = ('_name', '_stage')
+
+    def __init__(self, name: str, stage: int) -> None:
+        """ Constructor for the plant snapshot.
+
+        Parameters:
+            name: The name of the plant.
+            stage: The plant's stage.
+        """
+        self._name = name
+        self._stage = stage
+
+    def get_name(self) -> str:
+        """ Returns the name of the plant. """
+        return self._name
+
+    def get_stage(self) -> int:
+        """ Returns the stage of the plant. """
+        return self._stage
+
+
+class FarmSnapshot:
+    """ An immutable copy of everything the game window draws, taken from a
+        FarmModel after a batch of actions has been applied.
+    """
+    __slots__ = ('map', 'plants', 'position', 'direction', 'day', 'money',
+                 'energy', 'inventory', 'selected_item', 'dimensions',
+                 'sparklines', 'dirty_cells')
+
+    def __init__(self, model: FarmModel,
+                 previous: Optional['FarmSnapshot'] = None,
+                 delta: Optional[StateDelta] = None) -> None:
+        """ Constructor for the snapshot.
+
+        Parameters:
+            model: The model to take the snapshot of.
+            previous: The previous snapshot of the same model, if any.
+            delta: The changes to the model since the previous snapshot. If
+                   given, the previous snapshot's plants are shared or
+                   updated rather than copied.
+        """
+        player = model.get_player()
+        # Forking shares the map's rows, however they are stored
+        self.map = model.get_map().fork()
+        # The cells whose tile or plant looks different from the previous
+        # snapshot, or None if the whole farm may look different
+        self.dirty_cells = None
+        if previous is None or delta is None:
+            self.plants = {
+                position: PlantSnapshot(plant.get_name(), plant.get_stage())
+                for position, plant in model.get_plants().items()
+            }
+        else:
+            self.dirty_cells = {(row, col) for row, col, _ in delta.tiles}
+            self.plants = previous.plants
+            if delta.added_plants or delta.changed_plants \
+                    or delta.removed_plants:
+                self.plants = dict(previous.plants)
+                plants = model.get_plants()
+                for position in (*delta.added_plants, *delta.changed_plants):
+                    plant = plants[position]
+                    shown = self.plants.get(position)
+                    if shown is None or shown.get_name() != plant.get_name() \
+                            or shown.get_stage() != plant.get_stage():
+                        self.plants[position] = PlantSnapshot(
+                            plant.get_name(), plant.get_stage())
+                        self.dirty_cells.add(position)
+                for position in delta.removed_plants:
+                    del self.plants[position]
+                    self.dirty_cells.add(position)
+        self.position = player.get_position()
+        self.direction = player.get_direction()
+        self.day = model.get_days_elapsed()
+        self.money = player.get_money()
+        self.energy = player.get_energy()
+        self.inventory = player.get_inventory()
+        self.selected_item = player.get_selected_item()
+        self.dimensions = model.get_dimensions()
+        # Recent telemetry only changes when a day ends
+        telemetry = model.get_telemetry()
+        if telemetry is None:
+            self.sparklines = None
+        elif previous is not None and previous.day == self.day \
+                and previous.sparklines is not None:
+            self.sparklines = previous.sparklines
+        else:
+            self.sparklines = telemetry.get_sparklines()
+
+
+class UndoHistory:
+    """ Undo and redo stacks of FarmModel snapshots. Snapshots share unchanged
+        state with the model, so recording one per action is cheap.
+
+        A new day changes every plant, though, so its snapshot keeps a copy of
+        all of them. The history counts the plants each snapshot does not
+        share with the next, and forgets the oldest snapshots once those add
+        up to more than its plant limit.
+    """
+
+    def __init__(self, limit: int = UNDO_LIMIT,
+                 plant_limit: int = UNDO_PLANT_LIMIT) -> None:
+        """ Constructor for an empty history.
+
+        Parameters:
+            limit: The maximum number of actions that can be undone.
+            plant_limit: The maximum number of plants kept by the snapshots
+                         that the model does not share. The last action can
+                         always be undone.
+        """
+        self._limit = limit
+        self._plant_limit = plant_limit
+        self._undo = []
+        # The plants each undo snapshot does not share with the next one
+        self._costs = []
+        self._cost = 0
+        self._redo = []
+
+    def record(self, model: FarmModel) -> None:
+        """ Records the state of the model before an action is applied to it.
+            Anything that could have been redone is forgotten.
+        """
+        self._push(model.snapshot())
+        while len(self._undo) > self._limit or (
+                self._cost > self._plant_limit and len(self._undo) > 1):
+            self._undo.pop(0)
+            self._cost -= self._costs.pop(0)
+        self._redo.clear()
+
+    def _push(self, snapshot: FarmModel) -> None:
+        """ Adds a snapshot to the undo stack, counting what the previous
+            one does not share with it.
+        """
+        if self._undo:
+            cost = self._undo[-1].count_unshared_plants(snapshot)
+            self._cost += cost - self._costs[-1]
+            self._costs[-1] = cost
+        self._undo.append(snapshot)
+        self._costs.append(0)
+
+    def _pop(self) -> FarmModel:
+        """ Removes and returns the last snapshot on the undo stack. """
+        self._cost -= self._costs.pop()
+        return self._undo.pop()
+
+    def undo(self, model: FarmModel) -> bool:
+        """ Returns the model to its state before the last recorded action.
+
+        Returns:
+            True if an action was undone, False if there was nothing to undo.
+        """
+        if not self._undo:
+            return False
+        self._redo.append(model.snapshot())
+        model.restore(self._pop())
+        return True
+
+    def redo(self, model: FarmModel) -> bool:
+        """ Re-applies the last undone action to the model.
+
+        Returns:
+            True if an action was redone, False if there was nothing to redo.
+        """
+        if not self._redo:
+            return False
+        self._push(model.snapshot())
+        model.restore(self._redo.pop())
+        return True
+
+
+class SimulationWorker(threading.Thread):
+    """ Runs a FarmModel on a background thread, so that slow work such as a
+        day transition on a large farm never blocks the Tk mainloop.
+
+        The worker owns the model: actions are submitted to it through a queue
+        and applied strictly in order. After each batch of actions it publishes
+        a FarmSnapshot, which the game window polls for with `after`. The
+        worker also keeps the history for UNDO_ACTION and REDO_ACTION.
+
+        An action that raises an exception is skipped and the exception is
+        handed to the window through poll_errors, so the worker keeps running.
+
+        Given a FarmWorld, the worker runs the world's current farm and
+        handles TRAVEL_ACTION, whose argument is the map file of the farm to
+        travel to. History does not extend back past a journey.
+    """
+
+    def __init__(self, model: FarmModel,
+                 publisher: Optional['FarmPublisher'] = None,
+                 world: Optional['FarmWorld'] = None) -> None:
+        """ Constructor for the worker.
+
+        Parameters:
+            model: The model to run. It must not be used by any other thread
+                   once the worker has started.
+            publisher: If given, also publishes the model to shared memory
+                       after each batch of actions, for viewer processes.
+            world: The world the model is the current farm of, if any.
+        """
+        super().__init__(daemon=True)
+        self._model = model
+        self._actions = queue.Queue()
+        self._snapshots = queue.Queue()
+        self._errors = queue.Queue()
+        self._snapshot = FarmSnapshot(model)
+        # The state of the model when the last snapshot was taken
+        self._shown = model.snapshot()
+        self._history = UndoHistory()
+        self._publisher = publisher
+        self._world = world
+
+    def get_initial_snapshot(self) -> FarmSnapshot:
+        """ Returns the snapshot of the model taken before any actions. """
+        return self._snapshot
+
+    def submit(self, action: str, argument: str = None) -> None:
+        """ Queues an action to be applied to the model.
+
+        Parameters:
+            action: One of the *_ACTION constants.
+            argument: The action's argument, as for FarmModel.apply_action.
+        """
+        self._actions.put((action, argument))
+
+    def stop(self) -> None:
+        """ Asks the worker to exit once it has applied the queued actions. """
+        self._actions.put(None)
+
+    def poll(self) -> Optional[FarmSnapshot]:
+        """ Returns the latest snapshot published since the last poll, or None
+            if there is none. Older unread snapshots are discarded, and their
+            dirty cells are added to those of the one returned.
+        """
+        snapshot = None
+        while True:
+            try:
+                newer = self._snapshots.get_nowait()
+            except queue.Empty:
+                return snapshot
+            if snapshot is not None and newer.dirty_cells is not None:
+                if snapshot.dirty_cells is None:
+                    newer.dirty_cells = None
+                else:
+                    newer.dirty_cells |= snapshot.dirty_cells
+            snapshot = newer
+
+    def poll_errors(self) -> list[Exception]:
+        """ Returns the exceptions raised while applying actions or
+            publishing snapshots since the last call, oldest first.
+        """
+        errors = []
+        while True:
+            try:
+                errors.append(self._errors.get_nowait())
+            except queue.Empty:
+                return errors
+
+    def _report(self, error: Exception) -> None:
+        """ Passes an exception on to the window, and prints its traceback.
+        """
+        traceback.print_exc()
+        self._errors.put(error)
+
+    def run(self) -> None:
+        """ Applies queued actions until stopped. """
+        while True:
+            batch = [self._actions.get()]
+            # Apply everything already queued before publishing a snapshot
+            while True:
+                try:
+                    batch.append(self._actions.get_nowait())
+                except queue.Empty:
+                    break
+
+            travelled = False
+            for item in batch:
+                if item is None:
+                    return
+                try:
+                    travelled |= self._apply(*item)
+                except Exception as error:
+                    self._report(error)
+            try:
+                self._publish(travelled)
+            except Exception as error:
+                self._report(error)
+
+    def _apply(self, action: str, argument: Optional[str]) -> bool:
+        """ Applies one action, returning whether it travelled to another
+            farm.
+        """
+        if action == UNDO_ACTION:
+            self._history.undo(self._model)
+        elif action == REDO_ACTION:
+            self._history.redo(self._model)
+        elif action == TRAVEL_ACTION:
+            if self._world is not None:
+                self._model = self._world.travel(argument)
+                self._history = UndoHistory()
+                return True
+        else:
+            if action != SELECT_ACTION:
+                self._history.record(self._model)
+            self._model.apply_action(action, argument)
+        return False
+
+    def _publish(self, travelled: bool) -> None:
+        """ Publishes a snapshot of the model after a batch of actions. """
+        # Only what changed since the last snapshot needs copying. After
+        # travelling the model is another farm, so everything does
+        delta = None if travelled else self._model.diff(self._shown)
+        self._snapshot = FarmSnapshot(self._model, self._snapshot, delta)
+        self._shown = self._model.snapshot()
+        self._snapshots.put(self._snapshot)
+        if self._publisher is not None:
+            self._publisher.publish(self._model, delta)
@@ -0,0 +1,187 @@
+import json
+import os
+import pickle
+from collections import OrderedDict
+from typing import Optional
+from constants import *
+from model import FarmModel
+from telemetry import Telemetry
+from weather import Weather
+
+
+class FarmWorld:
+    """ Many farms, one per map file, sharing one calendar and one player who
+        travels between them.
+
+        Only the most recently visited farms are kept in memory. The least
+        recently used farm beyond the limit is saved to disk, along with the
+        day it was last simulated, and dropped. Farms the player is not on do
+        not change, so when the player arrives at a farm that is behind the
+        world's day it is fast-forwarded to that day in one step instead of
+        being simulated for every day it missed. The world's day is always the
+        day of the farm the player is on.
+
+        The world's telemetry recorder, if any, records whichever farm the
+        player is on, so its history follows the player between farms. The
+        world's weather, if any, is given to each farm the player travels to,
+        before the farm catches up on the days it missed.
+    """
+
+    def __init__(self, map_files: list[str], save_dir: str,
+                 resident_limit: int = WORLD_RESIDENT_FARMS) -> None:
+        """ Constructor for the world. The player starts on the first farm,
+            unless the world is being resumed from earlier saves.
+
+        Parameters:
+            map_files: The map of each farm.
+            save_dir: The directory in which to save evicted farms. Farms
+                      already saved there are resumed.
+            resident_limit: The most farms to keep in memory at once.
+        """
+        if not map_files:
+            raise ValueError('A world needs at least one farm')
+        self._map_files = list(map_files)
+        self._save_dir = save_dir
+        self._resident_limit = max(resident_limit, 1)
+        self._resident = OrderedDict()
+        self._telemetry = None
+        self._weather = None
+        os.makedirs(save_dir, exist_ok=True)
+        self._current = self._map_files[0]
+        day = 1
+        state_path = os.path.join(save_dir, WORLD_STATE_FILE)
+        if os.path.exists(state_path):
+            with open(state_path) as file:
+                state = json.load(file)
+            if state['current'] in self._map_files:
+                self._current = state['current']
+            day = state['day']
+        farm = self._load(self._current)
+        farm.fast_forward(day - farm.get_days_elapsed())
+        self._resident[self._current] = farm
+
+    def get_map_files(self) -> list[str]:
+        """ Returns the map file of every farm in the world. """
+        return list(self._map_files)
+
+    def get_resident(self) -> list[str]:
+        """ Returns the map files of the farms in memory, least recently used
+            first.
+        """
+        return list(self._resident)
+
+    def get_day(self) -> int:
+        """ Returns the current day of the world. """
+        return self.get_current().get_days_elapsed()
+
+    def get_current_name(self) -> str:
+        """ Returns the map file of the farm the player is on. """
+        return self._current
+
+    def get_current(self) -> FarmModel:
+        """ Returns the farm the player is on. """
+        return self._resident[self._current]
+
+    def get_telemetry(self) -> Optional[Telemetry]:
+        """ Returns the world's telemetry recorder, if it has one. """
+        return self._telemetry
+
+    def set_telemetry(self, telemetry: Optional[Telemetry]) -> None:
+        """ Starts recording the metrics of the farm the player is on, and
+            of each farm they travel to, with the given recorder, or stops
+            recording if it is None.
+        """
+        self._telemetry = telemetry
+        self.get_current().set_telemetry(telemetry)
+
+    def get_weather(self) -> Optional[Weather]:
+        """ Returns the weather of the world, if it has any. """
+        return self._weather
+
+    def set_weather(self, weather: Optional[Weather]) -> None:
+        """ Lets the given weather affect the farm the player is on from the
+            next day on, and each farm they travel to, or stops weather if it
+            is None.
+        """
+        self._weather = weather
+        self.get_current().set_weather(weather)
+
+    def new_day(self) -> None:
+        """ Advances the world by one day. Only the farm the player is on is
+            simulated now; the others catch up when next visited.
+        """
+        self.get_current().new_day()
+
+    def travel(self, map_file: str) -> FarmModel:
+        """ Moves the player, with their items, money and energy, to another
+            farm, which is brought up to the world's day.
+
+        Parameters:
+            map_file: The map file of the farm to travel to.
+
+        Returns:
+            The farm the player is now on.
+        """
+        if map_file not in self._map_files:
+            raise ValueError(f'{map_file} is not a farm in this world')
+        if map_file == self._current:
+            return self.get_current()
+
+        traveller = self.get_current().get_player()
+        farm = self._resident.pop(map_file, None)
+        if farm is None:
+            farm = self._load(map_file)
+        self._resident[map_file] = farm
+        farm.set_weather(self._weather)
+        farm.fast_forward(self.get_day() - farm.get_days_elapsed())
+
+        # The player arrives where they last stood on this farm
+        player = traveller.copy()
+        player.set_position(farm.get_player().get_position())
+        player.set_direction(farm.get_player().get_direction())
+        farm.set_player(player)
+        self.get_current().set_telemetry(None)
+        farm.set_telemetry(self._telemetry)
+        self._current = map_file
+
+        while len(self._resident) > self._resident_limit:
+            evicted, evicted_farm = self._resident.popitem(last=False)
+            self._save(evicted, evicted_farm)
+        return farm
+
+    def save(self) -> None:
+        """ Saves every farm in memory and the world's day, e.g. before
+            quitting.
+        """
+        for map_file, farm in self._resident.items():
+            self._save(map_file, farm)
+        with open(os.path.join(self._save_dir, WORLD_STATE_FILE), 'w') as file:
+            json.dump({'day': self.get_day(), 'current': self._current}, file)
+
+    def _save_path(self, map_file: str) -> str:
+        """ Returns where the farm with the given map is saved. """
+        index = self._map_files.index(map_file)
+        name = os.path.splitext(os.path.basename(map_file))[0]
+        return os.path.join(self._save_dir,
+                            f'{index:04d}_{name}{FARM_SAVE_EXTENSION}')
+
+    def _save(self, map_file: str, farm: FarmModel) -> None:
+        """ Writes a farm to its save file, replacing any earlier save.
+            Saves leave out the farm's market and telemetry, so its resting
+            orders are cancelled first, returning their escrow.
+        """
+        farm.get_market().cancel_all()
+        path = self._save_path(map_file)
+        with open(path + '.tmp', 'wb') as file:
+            pickle.dump(farm, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+
+    def _load(self, map_file: str) -> FarmModel:
+        """ Returns the saved farm with the given map, or a new farm if it has
+            never been saved.
+        """
+        path = self._save_path(map_file)
+        if not os.path.exists(path):
+            return FarmModel(map_file)
+        with open(path, 'rb') as file:
+            return pickle.load(file)